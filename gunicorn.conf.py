@@ -0,0 +1,65 @@
+"""
+Gunicorn configuration for production (read from the working directory):
+
+    DJANGO_SETTINGS_MODULE=jobboard.settings_production gunicorn
+
+serves jobboard.wsgi with threaded workers, or jobboard.asgi with uvicorn
+workers when JOBS_ASYNC_VIEWS is on. One worker per CPU plus one keeps
+every core busy with Python while a request waits on the database; threads
+(WSGI) or the event loop (ASGI) overlap the waits within a worker. Each
+thread holds its own database connection, so plan for up to
+WEB_CONCURRENCY x GUNICORN_THREADS of them per instance, or with a pool
+(?pool=1 on DATABASE_URL) WEB_CONCURRENCY x pool_max_size.
+
+The application is loaded, and warmed by jobs.preload, in the master
+before it forks, so workers share its memory and start serving at once.
+More than one worker needs a shared response cache (see
+jobboard.settings_production); the master refuses to start without.
+Workers are replaced after max_requests (with jitter, so not all at once)
+to bound the growth of anything that leaks.
+"""
+import gc
+import multiprocessing
+import os
+
+ASYNC = os.getenv('JOBS_ASYNC_VIEWS', '0') == '1'
+
+wsgi_app = 'jobboard.asgi:application' if ASYNC else 'jobboard.wsgi:application'
+worker_class = 'uvicorn_worker.UvicornWorker' if ASYNC else 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY') or multiprocessing.cpu_count() + 1)
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '5000'))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    # See jobs.preload
+    gc.disable()
+
+
+def when_ready(server):
+    # The application is loaded by now; the first worker is forked after this
+    from jobs.preload import check_shared_state, preload
+
+    check_shared_state(server.cfg.workers)
+    preload()
+
+
+def pre_fork(server, worker):
+    # Close anything the master opened since (it serves no requests)
+    from jobs.preload import close_connections
+
+    close_connections()
+
+
+def post_fork(server, worker):
+    gc.enable()
@@ -0,0 +1,67 @@
+"""
+Production profile: jobboard.settings with DEBUG off, persistent (or
+pooled) database connections and logs on the console. Select it with
+DJANGO_SETTINGS_MODULE=jobboard.settings_production and serve with
+gunicorn (see gunicorn.conf.py).
+
+Requires DJANGO_SECRET_KEY, REDIS_URL, and ALLOWED_HOSTS as
+comma-separated names.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, JOBS_ASYNC_VIEWS, JOBS_RESPONSE_CACHE
+
+# Besides leaking internals in error pages, DEBUG keeps every query of a
+# process in memory
+DEBUG = False
+
+try:
+    SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+except KeyError:
+    raise ImproperlyConfigured("Set DJANGO_SECRET_KEY") from None
+ALLOWED_HOSTS = [host.strip() for host in os.getenv('ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+# Every worker, and the run_worker process, must see the same cached
+# responses and invalidations, so the response cache (and everything else
+# using the default cache) lives in Redis rather than in each process.
+# gunicorn.conf.py refuses to start several workers on a process-local one.
+try:
+    REDIS_URL = os.environ['REDIS_URL']
+except KeyError:
+    raise ImproperlyConfigured("Set REDIS_URL, e.g. redis://redis:6379/0") from None
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    },
+}
+JOBS_RESPONSE_CACHE = {
+    **JOBS_RESPONSE_CACHE,
+    'BACKEND': os.getenv('JOBS_RESPONSE_CACHE_BACKEND', 'jobs.cache.DjangoCacheBackend'),
+}
+
+# Each thread keeps its connection for DATABASE_CONN_MAX_AGE seconds instead
+# of connecting for every request, checked before reuse by the first query
+# of a request. Under ASGI, requests run their queries on changing threads
+# whose connections would never be reused nor closed, so they are not kept:
+# pool them instead (?pool=1, see database_from_url). Pooled connections are
+# returned to the pool after each request, and checked on the way out of it.
+CONN_MAX_AGE = 0 if JOBS_ASYNC_VIEWS else int(os.getenv('DATABASE_CONN_MAX_AGE', '600'))
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = 0 if database.get('OPTIONS', {}).get('pool') else CONN_MAX_AGE
+    database['CONN_HEALTH_CHECKS'] = True
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': os.getenv('LOG_LEVEL', 'INFO'),
+    },
+}
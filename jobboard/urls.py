@@ -1,5 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
+from jobs.metrics import metrics_view
+from jobs.views import LogoutView
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -11,5 +13,7 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
+    path('api/token/logout/', LogoutView.as_view(), name='token_logout'),
     path('api/v1/', include('jobs.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
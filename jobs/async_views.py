@@ -0,0 +1,177 @@
+"""
+Async-native read path for the public job and employer views.
+
+Each view here wraps one of the DRF views in ``jobs.views`` and reuses its
+configuration (authentication, permissions, queryset, serializer, paginator,
+response cache). GETs run on the event loop with the async ORM, so under an
+ASGI server a slow client holds a coroutine rather than a thread. Other
+methods are handed to the wrapped sync view unchanged.
+
+The views are routed in place of the sync ones when ``JOBS_ASYNC_VIEWS`` is
+on; serve the project with an ASGI server (``uvicorn jobboard.asgi:application``)
+to benefit.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.mixins import ListModelMixin
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from . import views
+from .cache import CachedReadMixin
+from .facets import FacetedListMixin
+from .fastpath import FastPathListMixin
+from .pagination import KeysetPagination
+
+
+async def aserialize(serializer, chunk_size=50):
+    """
+    Return ``serializer.data`` for instances whose relations were loaded up
+    front by the views' eager loading, yielding to the event loop every
+    ``chunk_size`` rows so a large page does not stall other requests. A
+    relation that was not preloaded raises SynchronousOnlyOperation instead
+    of silently blocking the loop on a query.
+    """
+    if not isinstance(serializer, ListSerializer):
+        return serializer.data
+    child = serializer.child
+    data = []
+    for index, instance in enumerate(serializer.instance):
+        if index and index % chunk_size == 0:
+            await asyncio.sleep(0)
+        data.append(child.to_representation(instance))
+    return ReturnList(data, serializer=serializer)
+
+
+def _render(response):
+    # Render here rather than leave it to the handler, which would do it
+    # in a thread
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    return response
+
+
+class AsyncReadView(View):
+    """Serves GET asynchronously on behalf of the DRF view ``sync_view_class``."""
+    sync_view_class = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.sync_view_class = cls.sync_view_class
+        # Authentication is by token, as on the wrapped DRF view
+        return csrf_exempt(view)
+
+    @classmethod
+    def get_sync_view(cls):
+        if '_sync_view' not in cls.__dict__:
+            cls._sync_view = cls.sync_view_class.as_view()
+        return cls._sync_view
+
+    async def forward(self, request, *args, **kwargs):
+        def call():
+            return _render(self.get_sync_view()(request, *args, **kwargs))
+        return await sync_to_async(call)()
+
+    post = put = patch = delete = forward
+
+    async def get(self, request, *args, **kwargs):
+        view = self.sync_view_class()
+        view.setup(request, *args, **kwargs)
+        view.format_kwarg = None
+        view.headers = view.default_response_headers
+        drf_request = view.initialize_request(request, *args, **kwargs)
+        view.request = drf_request
+
+        try:
+            # Authentication and permission checks may query the database
+            await sync_to_async(view.initial)(drf_request, *args, **kwargs)
+            if not isinstance(drf_request.accepted_renderer, JSONRenderer):
+                # Only JSON is rendered on the event loop
+                return await self.forward(request, *args, **kwargs)
+            response = await self.handle(view, drf_request)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+
+        return _render(view.finalize_response(drf_request, response, *args, **kwargs))
+
+    async def handle(self, view, request):
+        raise NotImplementedError
+
+    async def get_queryset(self, view):
+        # Building the queryset can touch the database (e.g. to load the
+        # caller's profile or an in-process search index)
+        return await sync_to_async(lambda: view.filter_queryset(view.get_queryset()))()
+
+    async def cached(self, view, request, render):
+        if isinstance(view, CachedReadMixin):
+            return await view.acached_response(request, render)
+        return await render()
+
+
+class AsyncListView(AsyncReadView):
+    async def handle(self, view, request):
+        return await self.cached(view, request, lambda: self.render_list(view, request))
+
+    async def render_list(self, view, request):
+        if not isinstance(view, FacetedListMixin):
+            return await self.render_page(view, request)
+        names = view.get_facet_names()
+        response = await self.render_page(view, request)
+        return await sync_to_async(view.add_facets)(response, names)
+
+    async def render_page(self, view, request):
+        paginator = view.paginator
+        if not isinstance(paginator, KeysetPagination):
+            # Page-number pagination needs a COUNT and slicing from the sync
+            # paginator; run the plain DRF list in a thread
+            return await sync_to_async(ListModelMixin.list)(view, request)
+
+        queryset = await self.get_queryset(view)
+        compiled = view.get_compiled_serializer() if isinstance(view, FastPathListMixin) else None
+        if compiled is not None:
+            queryset = view.get_fast_path_queryset(compiled, queryset)
+        page = await paginator.apaginate_queryset(queryset, request, view)
+        if compiled is not None:
+            return paginator.get_paginated_response(view.get_fast_path_data(compiled, page))
+        serializer = view.get_serializer(page, many=True)
+        return paginator.get_paginated_response(await aserialize(serializer))
+
+
+class AsyncDetailView(AsyncReadView):
+    async def handle(self, view, request):
+        return await self.cached(view, request, lambda: self.render_detail(view, request))
+
+    async def render_detail(self, view, request):
+        queryset = await self.get_queryset(view)
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        try:
+            instance = await queryset.aget(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, ValueError, TypeError):
+            # Same message as get_object_or_404 in the sync view
+            raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+        view.check_object_permissions(request, instance)
+        serializer = view.get_serializer(instance)
+        return Response(await aserialize(serializer))
+
+
+class JobList(AsyncListView):
+    sync_view_class = views.JobListCreate
+
+
+class JobDetail(AsyncDetailView):
+    sync_view_class = views.JobRetrieveUpdateDestroy
+
+
+class EmployerPublic(AsyncDetailView):
+    sync_view_class = views.EmployerPublicView
+
+
+# The async view standing in for each DRF view
+ASYNC_VIEWS = {view.sync_view_class: view for view in (JobList, JobDetail, EmployerPublic)}
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import permissions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .revocation import revocation_cache
+
+# Claims added at issue time by RoleTokenObtainPairSerializer
+ROLE_CLAIM = 'role'
+EMPLOYER_ID_CLAIM = 'employer_id'
+APPLICANT_ID_CLAIM = 'applicant_id'
+
+
+class ProfileJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that loads the user's Employer/Applicant profile in the
+    same query as the user, so ``jobs.roles.get_roles`` needs no query of its
+    own. Tokens logged out (see ``revocation_cache``) are rejected too.
+    """
+
+    def get_user(self, validated_token):
+        if revocation_cache.is_revoked(validated_token):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        try:
+            user = self.user_model.objects.select_related('employer', 'applicant').get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+class StatelessJWTAuthentication(ProfileJWTAuthentication):
+    """
+    Builds the request principal from token claims alone (a TokenUser plus
+    the role claims read by ``jobs.roles``), skipping the user lookup.
+
+    Revocation is checked against ``revocation_cache`` instead of the user's
+    current password hash. Tokens issued before role claims existed fall
+    back to the database lookup.
+    """
+
+    def get_user(self, validated_token):
+        if ROLE_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if revocation_cache.is_revoked(validated_token):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+        return api_settings.TOKEN_USER_CLASS(validated_token)
+
+
+class StatelessReadAuthenticationMixin:
+    """
+    Opt-in for read-heavy views: when ``JOBS_STATELESS_JWT`` is on, safe
+    requests authenticate with StatelessJWTAuthentication. Writes always load
+    the user.
+    """
+
+    def get_authenticators(self):
+        if getattr(settings, 'JOBS_STATELESS_JWT', False) and self.request.method in permissions.SAFE_METHODS:
+            return [StatelessJWTAuthentication()]
+        return super().get_authenticators()
@@ -0,0 +1,236 @@
+import json
+import math
+import uuid
+from collections import namedtuple
+
+from django.contrib.auth.models import User
+from django.db.models import Count, Q
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import urls
+from .models import Application, Employer, Job, ResumeUpload
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of already sorted ``values``."""
+    if not values:
+        return None
+    rank = max(math.ceil(fraction * len(values)), 1)
+    return values[rank - 1]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Throughput and latency percentiles (in milliseconds) of a run."""
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': _ms(percentile(latencies, 0.50)),
+        'p95_ms': _ms(percentile(latencies, 0.95)),
+        'p99_ms': _ms(percentile(latencies, 0.99)),
+        'max_ms': _ms(latencies[-1] if latencies else None),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+# API benchmark (manage.py benchmark_api)
+
+class Fixtures:
+    """
+    Rows the benchmarked requests are about, picked from whatever data the
+    database holds (see ``manage.py seed_data``): the employer with the
+    most jobs, its published job with the most applications, and one of
+    that job's applicants.
+    """
+
+    def __init__(self):
+        self.employer = Employer.objects.select_related('user').annotate(job_count=Count('jobs')).order_by('-job_count').first()
+        self.job = (
+            Job.objects.filter(employer=self.employer, status='PUBLISHED')
+            .annotate(application_count=Count('applications')).order_by('-application_count').first()
+        )
+        self.application = Application.objects.select_related('applicant').filter(job=self.job).order_by('pk').first()
+        if self.employer is None or self.job is None or self.application is None:
+            raise ValueError("Benchmarks need an employer with a published job that has applications; run seed_data")
+        self.applicant = self.application.applicant
+        self.upload, _ = ResumeUpload.objects.get_or_create(
+            user=self.applicant, filename='benchmark.pdf', defaults={'content_type': 'application/pdf', 'size': 1024},
+        )
+        self.application_ids = list(
+            Application.objects.filter(job=self.job).order_by('pk').values_list('pk', flat=True)[:20]
+        )
+        self._tokens = {}
+        self._vacancies = None
+
+    def token(self, user):
+        if user.pk not in self._tokens:
+            self._tokens[user.pk] = str(AccessToken.for_user(user))
+        return self._tokens[user.pk]
+
+    def vacancy(self, number):
+        """The ``number``-th open job and applicant who has not applied to it."""
+        if self._vacancies is None:
+            jobs = list(
+                Job.objects.filter(status='PUBLISHED')
+                .filter(Q(deadline__isnull=True) | Q(deadline__gte=timezone.now().date()))
+                .order_by('pk').values_list('pk', flat=True)[:100]
+            )
+            users = list(User.objects.filter(applicant__isnull=False).order_by('pk')[:100])
+            applied = set(Application.objects.filter(job_id__in=jobs, applicant__in=users).values_list('job_id', 'applicant_id'))
+            self._vacancies = [(job, user) for user in users for job in jobs if (job, user.pk) not in applied]
+            if not self._vacancies:
+                raise ValueError("Every applicant has applied to every open job")
+        return self._vacancies[number % len(self._vacancies)]
+
+
+BenchmarkRequest = namedtuple('BenchmarkRequest', 'method path user body content_type')
+
+
+class Endpoint:
+    """
+    A request made again and again. ``url_kwargs``, ``body`` and ``user``
+    may be functions of ``(fixtures, number)``, number counting the
+    requests made, for writes that must differ each time; ``user`` may also
+    be 'employer' or 'applicant'.
+    """
+
+    def __init__(self, name, url_name, method='GET', user=None, url_kwargs=None, query='', body=None,
+                 content_type='application/json', expect=(200,)):
+        self.name = f'{method} {name}'
+        self.url_name = url_name
+        self.method = method
+        self.user = user
+        self.url_kwargs = url_kwargs
+        self.query = query
+        self.body = body
+        self.content_type = content_type
+        self.expect = expect
+
+    def request(self, fixtures, number):
+        def resolve(value):
+            return value(fixtures, number) if callable(value) else value
+
+        path = reverse(self.url_name, kwargs=resolve(self.url_kwargs))
+        if self.query:
+            path = f'{path}?{self.query}'
+        user = resolve(self.user)
+        if user == 'employer':
+            user = fixtures.employer.user
+        elif user == 'applicant':
+            user = fixtures.applicant
+        body = resolve(self.body)
+        if body is not None and not isinstance(body, str):
+            body = json.dumps(body)
+        return BenchmarkRequest(self.method, path, user, body, self.content_type if body is not None else None)
+
+
+def _job(fixtures, number):
+    return {'pk': fixtures.job.pk}
+
+
+def _job_pk(fixtures, number):
+    return {'job_pk': fixtures.job.pk}
+
+
+def _new_job(fixtures, number):
+    return {
+        'employer_id': fixtures.employer.pk, 'title': f'Benchmark Engineer {number}', 'description': 'Benchmarks',
+        'location': 'Yangon', 'salary_min': '1500.00', 'status': 'PUBLISHED',
+    }
+
+
+def _import(fixtures, number):
+    row = {'title': f'Imported {number}', 'description': 'Benchmarks', 'location': 'Mandalay', 'salary_min': '900'}
+    return '\n'.join(json.dumps(row) for _ in range(10))
+
+
+def _alternate_status(number):
+    return 'REVIEWED' if number % 2 else 'PENDING'
+
+
+ENDPOINTS = [
+    Endpoint('employer-public', 'employer-public', url_kwargs=lambda fixtures, number: {'pk': fixtures.employer.pk}),
+    Endpoint('employer-profile', 'employer-profile', user='employer'),
+    Endpoint('employer-profile', 'employer-profile', 'PATCH', user='employer', body={'description': 'Benchmarked'}),
+    Endpoint('employer-dashboard', 'employer-dashboard', user='employer'),
+    Endpoint('job-list', 'job-list'),
+    Endpoint('job-list facets', 'job-list', query='facets=job_type,location,salary'),
+    Endpoint('job-list filtered', 'job-list', query='job_type=FULL_TIME&salary_gte=1000&ordering=-salary_min'),
+    Endpoint('job-list search', 'job-list', query='q=python'),
+    Endpoint('job-list near', 'job-list', query='near=Yangon&radius=50'),
+    Endpoint('job-list', 'job-list', 'POST', user='employer', body=_new_job, expect=(201,)),
+    Endpoint('job-import', 'job-import', 'POST', user='employer', body=_import,
+             content_type='application/x-ndjson', expect=(201,)),
+    Endpoint('job-export', 'job-export', user='employer'),
+    Endpoint('job-detail', 'job-detail', url_kwargs=_job),
+    Endpoint('job-detail employer', 'job-detail', user='employer', url_kwargs=_job),
+    Endpoint('job-detail', 'job-detail', 'PATCH', user='employer', url_kwargs=_job,
+             body=lambda fixtures, number: {'title': fixtures.job.title}),
+    Endpoint('job-recommended-candidates', 'job-recommended-candidates', user='employer', url_kwargs=_job_pk),
+    Endpoint('user-applications', 'user-applications', user='applicant'),
+    Endpoint('user-applications employer', 'user-applications', user='employer'),
+    Endpoint('application-list', 'application-list', user='employer', url_kwargs=_job_pk),
+    Endpoint('application-list', 'application-list', 'POST',
+             user=lambda fixtures, number: fixtures.vacancy(number)[1],
+             url_kwargs=lambda fixtures, number: {'job_pk': fixtures.vacancy(number)[0]},
+             body={'cover_letter': 'Benchmark application'}, expect=(201,)),
+    Endpoint('application-bulk-status', 'application-bulk-status', 'POST', user='employer', url_kwargs=_job_pk,
+             body=lambda fixtures, number: {'updates': [
+                 {'id': pk, 'status': _alternate_status(number)} for pk in fixtures.application_ids
+             ]}),
+    Endpoint('application-detail', 'application-detail', user='employer',
+             url_kwargs=lambda fixtures, number: {'job_pk': fixtures.job.pk, 'pk': fixtures.application.pk}),
+    Endpoint('application-detail', 'application-detail', 'PATCH', user='employer',
+             url_kwargs=lambda fixtures, number: {'job_pk': fixtures.job.pk, 'pk': fixtures.application.pk},
+             body=lambda fixtures, number: {'status': _alternate_status(number)}),
+    Endpoint('user-registration', 'user-registration', 'POST', expect=(201,),
+             body=lambda fixtures, number: {
+                 'username': f'benchmark-{uuid.uuid4().hex[:16]}', 'password': 'benchmark-password',
+                 'user_type': 'APPLICANT',
+             }),
+    Endpoint('applicant-list', 'applicant-list', user='employer'),
+    Endpoint('applicant-profile', 'applicant-profile', user='applicant'),
+    Endpoint('applicant-profile', 'applicant-profile', 'PATCH', user='applicant',
+             body={'skills': 'python, django, postgresql'}),
+    Endpoint('applicant-recommended-jobs', 'applicant-recommended-jobs', user='applicant'),
+    Endpoint('resume-upload-create', 'resume-upload-create', 'POST', user='applicant', expect=(201,),
+             body={'filename': 'resume.pdf', 'content_type': 'application/pdf', 'size': 2048}),
+    Endpoint('resume-upload-detail', 'resume-upload-detail', user='applicant',
+             url_kwargs=lambda fixtures, number: {'pk': fixtures.upload.pk}),
+]
+
+
+def uncovered_urls(endpoints=ENDPOINTS):
+    """Names of the ``jobs.urls`` patterns no endpoint requests."""
+    covered = {endpoint.url_name for endpoint in endpoints}
+    return [pattern.name for pattern in urls.urlpatterns if pattern.name not in covered]
+
+
+def compare(baseline, current, threshold=0.2, query_threshold=0, min_ms=1.0, metric='p95_ms'):
+    """
+    Rows of ``(endpoint, measure, before, after, regressed)`` for the
+    endpoints of both results. Latency regresses when ``metric`` grows by
+    more than ``threshold`` (a fraction) and ``min_ms``; query counts when
+    they grow by more than ``query_threshold``; errors whenever they grow.
+    """
+    rows = []
+    for name, after in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            continue
+        if before.get(metric) is not None and after.get(metric) is not None:
+            grown = after[metric] - before[metric]
+            rows.append((name, metric, before[metric], after[metric],
+                         grown > min_ms and after[metric] > before[metric] * (1 + threshold)))
+        if before.get('queries') is not None and after.get('queries') is not None:
+            rows.append((name, 'queries', before['queries'], after['queries'],
+                         after['queries'] > before['queries'] + query_threshold))
+        rows.append((name, 'errors', before['errors'], after['errors'], after['errors'] > before['errors']))
+    return rows
@@ -0,0 +1,195 @@
+import csv
+import io
+import json
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from rest_framework import serializers
+
+from . import facets, geo, matching
+from .cache import invalidate_jobs
+from .models import Job
+from .search import get_search_backend
+from .serializers import JobImportSerializer
+
+FORMATS = ('csv', 'ndjson')
+
+EXPORT_FIELDS = [
+    'id', 'title', 'description', 'requirements', 'location', 'salary_min', 'salary_max',
+    'job_type', 'status', 'deadline', 'publish_at', 'created_at', 'updated_at',
+]
+
+
+def guess_format(name=None, content_type=None):
+    if content_type:
+        content_type = content_type.split(';')[0].strip().lower()
+        if content_type in ('text/csv', 'application/csv'):
+            return 'csv'
+        if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+            return 'ndjson'
+    if name:
+        name = name.lower()
+        if name.endswith('.csv'):
+            return 'csv'
+        if name.endswith(('.ndjson', '.jsonl')):
+            return 'ndjson'
+    return None
+
+
+class _RawStream(io.RawIOBase):
+    """Adapts anything with read(n), such as an HttpRequest body, to io."""
+
+    def __init__(self, source):
+        self.source = source
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.source.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def read_rows(stream, fmt):
+    """
+    Yield ``(row_number, row)`` from a binary stream without reading it all
+    into memory. A row that cannot be parsed is yielded as an exception.
+    """
+    if stream is None:
+        stream = io.BytesIO()
+    elif not hasattr(stream, 'readable'):
+        stream = io.BufferedReader(_RawStream(stream))
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(text), start=1):
+            # An empty cell means "not given", so optional columns fall back
+            # to their defaults and required ones are reported missing
+            yield number, {key: value for key, value in row.items() if key and value not in ('', None)}
+    elif fmt == 'ndjson':
+        number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError("Each line must be a JSON object")
+            except ValueError as exc:
+                yield number, exc
+            else:
+                yield number, row
+    else:
+        raise ValueError(f"Unsupported format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+def import_jobs(rows, employer, batch_size=None):
+    """
+    Validate ``(row_number, row)`` pairs in batches and insert the valid ones
+    with bulk_create. Invalid rows are reported and skipped; they never abort
+    the rest of the import.
+    """
+    batch_size = batch_size or getattr(settings, 'JOBS_BULK_BATCH_SIZE', 500)
+    report = {'rows': 0, 'created': 0, 'errors': []}
+    rows = iter(rows)
+
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        report['rows'] += len(batch)
+
+        # One serializer per batch; its child validates each row so the
+        # field set is built once rather than per row
+        child = JobImportSerializer(many=True).child
+        valid = []
+        for number, row in batch:
+            if isinstance(row, Exception):
+                report['errors'].append({'row': number, 'errors': {'non_field_errors': [str(row)]}})
+                continue
+            try:
+                valid.append((number, child.run_validation(row)))
+            except serializers.ValidationError as exc:
+                report['errors'].append({'row': number, 'errors': exc.detail})
+
+        created = _insert(valid, employer, report)
+        report['created'] += len(created)
+        after_insert(created)
+
+    report['errors'].sort(key=lambda error: error['row'])
+    return report
+
+
+def _insert(valid, employer, report):
+    jobs = [Job(employer=employer, **data) for _, data in valid]
+    # bulk_create skips the pre_save geocoding too
+    for job in jobs:
+        geo.locate(job)
+    try:
+        with transaction.atomic():
+            return Job.objects.bulk_create(jobs)
+    except DatabaseError:
+        pass
+
+    # Find the offending rows one at a time, keeping the rest
+    created = []
+    for (number, _), job in zip(valid, jobs):
+        job.pk = None
+        try:
+            with transaction.atomic():
+                created += Job.objects.bulk_create([job])
+        except DatabaseError as exc:
+            report['errors'].append({'row': number, 'errors': {'non_field_errors': [str(exc)]}})
+    return created
+
+
+def after_insert(jobs):
+    """
+    Index, count and invalidate jobs created with bulk_create, which sends
+    no post_save, as the signal handlers would have.
+    """
+    if not jobs:
+        return
+    job_ids = [job.pk for job in jobs]
+    get_search_backend().index_jobs(job_ids)
+    facets.adjust(Counter(facets.job_key(job) for job in jobs))
+    listed = any(job.status == 'PUBLISHED' for job in jobs)
+    transaction.on_commit(lambda: matching.job_index.index(job_ids))
+    transaction.on_commit(lambda: invalidate_jobs(job_ids, listings=listed))
+
+
+class _Echo:
+    """File-like object whose write() hands the value back, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (int, str)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def export_jobs(queryset, fmt, chunk_size=None):
+    """
+    Yield the jobs in ``queryset`` as CSV or NDJSON, fetching rows from the
+    database in chunks so a full dump never sits in memory.
+    """
+    chunk_size = chunk_size or getattr(settings, 'JOBS_BULK_BATCH_SIZE', 500)
+    rows = queryset.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow(['' if value is None else _jsonable(value) for value in row])
+    elif fmt == 'ndjson':
+        for row in rows:
+            yield json.dumps(dict(zip(EXPORT_FIELDS, map(_jsonable, row))), ensure_ascii=False) + '\n'
+    else:
+        raise ValueError(f"Unsupported format {fmt!r}; expected one of {', '.join(FORMATS)}")
@@ -0,0 +1,309 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
+from django.utils.http import http_date, quote_etag
+from django.utils.module_loading import import_string
+from rest_framework.response import Response
+
+DEFAULTS = {
+    'BACKEND': 'jobs.cache.LRUCacheBackend',
+    'CACHE_ALIAS': 'default',
+    'MAX_ENTRIES': 2048,
+    'TIMEOUT': 300,
+}
+
+LIST_VERSION = 'list'
+
+
+def get_cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'JOBS_RESPONSE_CACHE', {})}
+
+
+class LRUCacheBackend:
+    """
+    Per-process cache holding at most ``MAX_ENTRIES`` responses, evicting the
+    least recently used. Versions live outside the LRU so they never reset.
+    Invalidations only reach the process making them, so it suits a single
+    process (development, tests) only.
+    """
+    shared = False
+
+    def __init__(self, options):
+        self.max_entries = options['MAX_ENTRIES']
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        expires = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self, name):
+        return self._versions.get(name, 0)
+
+    def bump_version(self, name):
+        with self._lock:
+            self._versions[name] = time.time_ns()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+class DjangoCacheBackend:
+    """
+    Shared cache from ``settings.CACHES`` (e.g. Redis or Memcached), so every
+    worker sees the same entries and invalidations.
+    """
+    prefix = 'jobs:response'
+
+    def __init__(self, options):
+        self.cache = caches[options['CACHE_ALIAS']]
+
+    @property
+    def shared(self):
+        return not isinstance(self.cache, LocMemCache)
+
+    def get(self, key):
+        return self.cache.get(f'{self.prefix}:{key}')
+
+    def set(self, key, value, timeout):
+        self.cache.set(f'{self.prefix}:{key}', value, timeout)
+
+    def get_version(self, name):
+        return self.cache.get(f'{self.prefix}:version:{name}', 0)
+
+    def bump_version(self, name):
+        self.cache.set(f'{self.prefix}:version:{name}', time.time_ns(), None)
+
+    def clear(self):
+        self.cache.clear()
+
+    async def aget(self, key):
+        return await self.cache.aget(f'{self.prefix}:{key}')
+
+    async def aset(self, key, value, timeout):
+        await self.cache.aset(f'{self.prefix}:{key}', value, timeout)
+
+    async def aget_version(self, name):
+        return await self.cache.aget(f'{self.prefix}:version:{name}', 0)
+
+
+class NullCacheBackend:
+    """Caches nothing; useful to switch the response cache off."""
+    shared = True
+
+    def __init__(self, options):
+        pass
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout):
+        pass
+
+    def get_version(self, name):
+        return 0
+
+    def bump_version(self, name):
+        pass
+
+    def clear(self):
+        pass
+
+
+async def _acall(backend, name, *args):
+    # Backends doing I/O provide async variants (``aget``...); in-process ones
+    # are cheap enough to call from the event loop directly
+    method = getattr(backend, f'a{name}', None)
+    if method is not None:
+        return await method(*args)
+    return getattr(backend, name)(*args)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_cache_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                options = get_cache_settings()
+                _backend = import_string(options['BACKEND'])(options)
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_cache_backend(*, setting=None, **kwargs):
+    global _backend
+    if setting in (None, 'JOBS_RESPONSE_CACHE', 'CACHES'):
+        _backend = None
+
+
+def detail_version(pk):
+    return f'job:{pk}'
+
+
+def invalidate_jobs(job_ids, listings=True):
+    """
+    Drop cached responses for the given jobs, and every cached listing unless
+    ``listings`` is false.
+    """
+    backend = get_cache_backend()
+    for pk in job_ids:
+        backend.bump_version(detail_version(pk))
+    if listings:
+        backend.bump_version(LIST_VERSION)
+
+
+def normalize_query(request, ignore=()):
+    params = []
+    for key in sorted(request.query_params.keys()):
+        if key in ignore:
+            continue
+        values = sorted(value for value in request.query_params.getlist(key) if value != '')
+        if values:
+            params.append((key, values))
+    return repr(params)
+
+
+class CachedReadMixin:
+    """
+    Serves anonymous GETs from the response cache and answers conditional
+    requests with 304s.
+
+    ``cache_scope`` is ``'list'`` or ``'detail'``. Entries are keyed on the
+    normalized query string (cursor included) and on a version that the
+    ``jobs.signals`` handlers bump when a job or its employer changes.
+    """
+    cache_scope = None
+
+    def is_cacheable(self, request):
+        return request.method == 'GET' and not request.user.is_authenticated
+
+    def get_cache_version_name(self):
+        if self.cache_scope == 'list':
+            return LIST_VERSION
+        return detail_version(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+
+    @cached_property
+    def cache_version(self):
+        return get_cache_backend().get_version(self.get_cache_version_name())
+
+    def get_cache_key(self, request):
+        digest = hashlib.md5(normalize_query(request).encode('utf-8')).hexdigest()
+        if self.cache_scope == 'list':
+            return f'list:{self.cache_version}:{digest}'
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return f'detail:{pk}:{self.cache_version}:{digest}'
+
+    def get_serializer(self, *args, **kwargs):
+        instance = args[0] if args else kwargs.get('instance')
+        if instance is not None:
+            self.note_last_modified(instance if kwargs.get('many') else [instance])
+        return super().get_serializer(*args, **kwargs)
+
+    def note_last_modified(self, rows):
+        """
+        Remember when the rendered job last changed for Last-Modified. Lists
+        go without: deleting, unpublishing or closing a job changes a list
+        without advancing any row's updated_at, so they are validated by
+        their ETag alone, which follows the list version.
+        """
+        if self.cache_scope == 'list':
+            return
+        stamps = [
+            row['updated_at'] if isinstance(row, dict) else getattr(row, 'updated_at', None)
+            for row in rows
+        ]
+        stamps = [stamp for stamp in stamps if stamp is not None]
+        self._cache_last_modified = max(stamps) if stamps else None
+
+    def build_cache_entry(self, key, response):
+        # HTTP dates have one-second resolution
+        last_modified = self._cache_last_modified
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+        return {
+            'data': response.data,
+            'etag': quote_etag(hashlib.md5(f'{key}:{last_modified}'.encode('utf-8')).hexdigest()),
+            'last_modified': last_modified,
+        }
+
+    def cache_entry_response(self, request, entry):
+        response = Response(entry['data'])
+        response['ETag'] = entry['etag']
+        if entry['last_modified'] is not None:
+            response['Last-Modified'] = http_date(entry['last_modified'])
+        not_modified = get_conditional_response(
+            request._request, etag=entry['etag'], last_modified=entry['last_modified'],
+            response=response,
+        )
+        return not_modified if not_modified is not response else response
+
+    def cached_response(self, request, render):
+        if not self.is_cacheable(request):
+            return render()
+
+        backend = get_cache_backend()
+        key = self.get_cache_key(request)
+        entry = backend.get(key)
+        if entry is None:
+            self._cache_last_modified = None
+            response = render()
+            if response.status_code != 200:
+                return response
+            entry = self.build_cache_entry(key, response)
+            backend.set(key, entry, get_cache_settings()['TIMEOUT'])
+        return self.cache_entry_response(request, entry)
+
+    async def acached_response(self, request, render):
+        """``cached_response`` for async views; ``render`` is a coroutine function."""
+        if not self.is_cacheable(request):
+            return await render()
+
+        backend = get_cache_backend()
+        self.cache_version = await _acall(backend, 'get_version', self.get_cache_version_name())
+        key = self.get_cache_key(request)
+        entry = await _acall(backend, 'get', key)
+        if entry is None:
+            self._cache_last_modified = None
+            response = await render()
+            if response.status_code != 200:
+                return response
+            entry = self.build_cache_entry(key, response)
+            await _acall(backend, 'set', key, entry, get_cache_settings()['TIMEOUT'])
+        return self.cache_entry_response(request, entry)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedReadMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedReadMixin, self).retrieve(request, *args, **kwargs))
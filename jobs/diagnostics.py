@@ -0,0 +1,367 @@
+"""
+Query diagnostics: N+1 and slow-query detection per request.
+
+With ``JOBS_QUERY_DIAGNOSTICS`` on, every query of a request is
+fingerprinted (its SQL with literals, placeholders and ``IN`` lists
+normalized, so ``WHERE id = 1`` and ``WHERE id = 2`` match) and timed.
+A fingerprint run ``JOBS_QUERY_REPEAT_THRESHOLD`` times in one request is
+reported as an N+1, typically a nested serializer (``EmployerSerializer``
+under a job, ``UserSerializer`` under an employer) whose relation was not
+loaded with the rows, and a query taking ``JOBS_SLOW_QUERY_MS`` or more as
+slow. Each report names the serializer field being rendered when it ran,
+if any, and the project frames of the stack.
+
+Reports go to the ``jobs.diagnostics`` logger, and a line per request to
+a rotating JSON-lines log that ``manage.py query_report`` summarizes. A
+rotating file cannot be shared between processes, so each writes its own
+next to ``JOBS_QUERY_LOG``, named after its pid (``queries.1234.jsonl``),
+and the report reads them all. In strict mode
+(``JOBS_QUERY_DIAGNOSTICS_STRICT``, or ``diagnose(strict=True)``) a report
+raises QueryProblem instead, failing the test that caused it.
+"""
+import glob
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+from rest_framework import serializers
+
+from .metrics import route_of
+
+logger = logging.getLogger(__name__)
+
+# Queries of the request (or diagnose() block) being inspected, if any
+_current = ContextVar('jobs_query_diagnostics', default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_VALUES = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+# Frames of these (and of query wrappers) are left out of reported stacks, as
+# are those outside the project
+_SKIPPED_PATHS = (
+    'site-packages', 'dist-packages', os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics.py'),
+)
+
+
+class QueryProblem(AssertionError):
+    """An N+1 or slow query, raised in strict mode."""
+
+
+def enabled():
+    return getattr(settings, 'JOBS_QUERY_DIAGNOSTICS', False)
+
+
+def fingerprint(sql):
+    """``sql`` with literals and placeholders as ``?`` and value lists as ``(...)``."""
+    sql = _STRING.sub('?', sql).replace('%s', '?')
+    sql = _NUMBER.sub('?', sql)
+    sql = _VALUES.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def serializer_field():
+    """
+    ``Serializer.field`` being rendered by the calling code, e.g.
+    ``JobSerializer.employer > EmployerSerializer.user``, or None.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_name == 'to_representation':
+            field = frame.f_locals.get('field')
+            if isinstance(frame.f_locals.get('self'), serializers.Serializer) and isinstance(field, serializers.Field):
+                return _field_path(field)
+        frame = frame.f_back
+    return None
+
+
+def _field_path(field):
+    path = []
+    while field is not None and field.parent is not None:
+        parent = field.parent
+        if field.field_name:
+            path.append(f'{type(parent).__name__}.{field.field_name}')
+        field = parent
+    return ' > '.join(reversed(path)) or None
+
+
+def project_stack(limit=8):
+    """The innermost ``limit`` frames of the caller in the project, as text."""
+    root = os.path.join(str(settings.BASE_DIR), '')
+    frames = [
+        frame for frame in traceback.extract_stack(sys._getframe(1))
+        if frame.filename.startswith(root) and not any(part in frame.filename for part in _SKIPPED_PATHS)
+    ]
+    return [f'{frame.filename}:{frame.lineno} in {frame.name}' for frame in frames[-limit:]]
+
+
+class QueryLog:
+    """The queries of one request, by fingerprint, and what looked wrong."""
+
+    def __init__(self, label=None):
+        self.label = label
+        self.repeat_threshold = getattr(settings, 'JOBS_QUERY_REPEAT_THRESHOLD', 5)
+        self.slow_seconds = getattr(settings, 'JOBS_SLOW_QUERY_MS', 100) / 1000
+        self.queries = 0
+        self.seconds = 0.0
+        # fingerprint -> [count, seconds]
+        self.fingerprints = {}
+        # fingerprint -> {'field': ..., 'stack': [...]} where it reached the threshold
+        self.repeated = {}
+        self.slow = []
+
+    def add(self, sql, seconds):
+        key = fingerprint(sql)
+        counts = self.fingerprints.setdefault(key, [0, 0.0])
+        counts[0] += 1
+        counts[1] += seconds
+        self.queries += 1
+        self.seconds += seconds
+        if counts[0] == self.repeat_threshold:
+            self.repeated[key] = {'field': serializer_field(), 'stack': project_stack()}
+        if seconds >= self.slow_seconds:
+            self.slow.append({
+                'fingerprint': key, 'ms': round(seconds * 1000, 2),
+                'field': serializer_field(), 'stack': project_stack(),
+            })
+
+    def problems(self):
+        """``(repeated, slow)``: lists of dicts ready for the log."""
+        repeated = [
+            {
+                'fingerprint': key, 'count': self.fingerprints[key][0],
+                'ms': round(self.fingerprints[key][1] * 1000, 2), **where,
+            }
+            for key, where in self.repeated.items()
+        ]
+        return repeated, self.slow
+
+    def entry(self, **extra):
+        repeated, slow = self.problems()
+        return {
+            'at': timezone.now().isoformat(), 'route': self.label, **extra,
+            'queries': self.queries, 'db_ms': round(self.seconds * 1000, 2),
+            'repeated': repeated, 'slow': slow,
+        }
+
+
+def inspect_query(execute, sql, params, many, context):
+    """``execute_wrapper`` adding each query of an inspected request to its QueryLog."""
+    log = _current.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        log.add(sql, time.perf_counter() - started)
+
+
+def report(log, strict=None, **extra):
+    """Log what ``log`` found, append it to JOBS_QUERY_LOG, and in strict mode raise."""
+    entry = log.entry(**extra)
+    where = log.label or 'queries'
+    messages = []
+    for problem in entry['repeated']:
+        messages.append(
+            f"N+1 in {where}: ran {problem['count']} times ({problem['ms']} ms) "
+            f"from {problem['field'] or 'outside a serializer field'}: {problem['fingerprint']}"
+        )
+    for problem in entry['slow']:
+        messages.append(
+            f"Slow query in {where}: {problem['ms']} ms "
+            f"from {problem['field'] or 'outside a serializer field'}: {problem['fingerprint']}"
+        )
+    if log.label is not None:
+        _write(entry)
+    for message, problem in zip(messages, entry['repeated'] + entry['slow']):
+        logger.warning("%s\n  %s", message, '\n  '.join(problem['stack']))
+    if strict is None:
+        strict = getattr(settings, 'JOBS_QUERY_DIAGNOSTICS_STRICT', False)
+    if strict and messages:
+        raise QueryProblem('\n'.join(messages))
+    return entry
+
+
+@contextmanager
+def diagnose(label=None, strict=None):
+    """
+    Inspect the queries of the block. Only labelled blocks are written to
+    the log; with ``strict=True`` a problem raises QueryProblem at the end.
+    """
+    log = QueryLog(label)
+    token = _current.set(log)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+    report(log, strict)
+
+
+# The rolling log
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def log_path():
+    return str(getattr(settings, 'JOBS_QUERY_LOG', os.path.join(settings.BASE_DIR, 'logs', 'queries.jsonl')))
+
+
+def process_log_path(path=None, pid=None):
+    """The log of process ``pid`` (this one by default): ``queries.jsonl`` becomes ``queries.1234.jsonl``."""
+    root, extension = os.path.splitext(path or log_path())
+    return f'{root}.{pid or os.getpid()}{extension}'
+
+
+def log_files(path=None):
+    """
+    The logs of every process written next to ``path``, ``path`` itself and
+    their rotated predecessors that exist, oldest first.
+    """
+    path = path or log_path()
+    root, extension = os.path.splitext(path)
+    name = re.compile(rf'{re.escape(root)}(\.\d+)?{re.escape(extension)}(\.\d+)?')
+    files = [
+        candidate for candidate in glob.glob(f'{glob.escape(root)}*{glob.escape(extension)}*')
+        if name.fullmatch(candidate)
+    ]
+    return sorted(files, key=os.path.getmtime)
+
+
+def prune_logs(path=None, now=None):
+    """Remove the logs of other processes not written to for JOBS_QUERY_LOG_MAX_AGE_DAYS."""
+    own = process_log_path(path)
+    oldest = (now or time.time()) - getattr(settings, 'JOBS_QUERY_LOG_MAX_AGE_DAYS', 7) * 24 * 3600
+    for name in log_files(path):
+        if not name.startswith(own) and os.path.getmtime(name) < oldest:
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                # Pruned by another process meanwhile
+                pass
+
+
+def _write(entry):
+    global _handler
+    path = os.path.abspath(process_log_path())
+    record = logging.makeLogRecord({'msg': json.dumps(entry), 'levelno': logging.INFO})
+    with _handler_lock:
+        # A forked process has a pid of its own, so opens a log of its own
+        if _handler is None or _handler.baseFilename != path:
+            if _handler is not None:
+                _handler.close()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            prune_logs()
+            _handler = RotatingFileHandler(
+                path, maxBytes=getattr(settings, 'JOBS_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+                backupCount=getattr(settings, 'JOBS_QUERY_LOG_BACKUPS', 5), encoding='utf-8', delay=True,
+            )
+        _handler.handle(record)
+
+
+def read_log(path=None):
+    """Entries of every process's log and their rotated predecessors, skipping lines cut short."""
+    for name in log_files(path):
+        with open(name, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarize(entries):
+    """
+    Per ``(route, method)``: requests, query counts and database time, and
+    the N+1 and slow queries seen, worst first within each.
+    """
+    views = {}
+    for entry in entries:
+        view = views.setdefault((entry['route'], entry.get('method')), {
+            'route': entry['route'], 'method': entry.get('method'),
+            'requests': 0, 'queries': [], 'db_ms': [], 'problems': {},
+        })
+        view['requests'] += 1
+        view['queries'].append(entry['queries'])
+        view['db_ms'].append(entry['db_ms'])
+        for kind, found in (('repeated', entry['repeated']), ('slow', entry['slow'])):
+            for problem in found:
+                seen = view['problems'].setdefault((kind, problem['fingerprint']), {
+                    'kind': kind, 'fingerprint': problem['fingerprint'], 'requests': 0,
+                    'max_count': 0, 'max_ms': 0, 'field': problem['field'], 'stack': problem['stack'],
+                })
+                seen['requests'] += 1
+                seen['max_count'] = max(seen['max_count'], problem.get('count', 1))
+                seen['max_ms'] = max(seen['max_ms'], problem['ms'])
+
+    from .benchmarking import percentile
+
+    summaries = []
+    for view in views.values():
+        queries, db_ms = sorted(view['queries']), sorted(view['db_ms'])
+        problems = sorted(view['problems'].values(), key=lambda problem: (-problem['requests'], -problem['max_ms']))
+        summaries.append({
+            'route': view['route'], 'method': view['method'], 'requests': view['requests'],
+            'mean_queries': round(sum(queries) / len(queries), 1), 'max_queries': queries[-1],
+            'mean_db_ms': round(sum(db_ms) / len(db_ms), 2), 'p95_db_ms': percentile(db_ms, 0.95),
+            'repeated': sum(1 for problem in problems if problem['kind'] == 'repeated'),
+            'slow': sum(1 for problem in problems if problem['kind'] == 'slow'),
+            'problems': problems,
+        })
+    return summaries
+
+
+class QueryDiagnosticsMiddleware:
+    """Inspects the queries of every request (see the module docstring)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        log = QueryLog()
+        token = _current.set(log)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, log)
+        return response
+
+    async def __acall__(self, request):
+        log = QueryLog()
+        token = _current.set(log)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        # Writes the log file
+        await sync_to_async(self.finish)(request, response, log)
+        return response
+
+    def finish(self, request, response, log):
+        log.label = route_of(request)
+        report(log, method=request.method, status=response.status_code)
@@ -0,0 +1,127 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import permissions, serializers
+
+
+class EagerLoadingMixin:
+    """
+    Serializer mixin declaring the relations the serializer reads.
+
+    ``select_related_fields`` and ``prefetch_related_fields`` are lookups
+    relative to the serializer's own model. Nested serializers that use the
+    mixin contribute their own lookups, prefixed with the nesting field's
+    source, so each serializer only has to state what it touches directly.
+
+    The lookups and the columns loaded follow the fields of the serializer
+    instance, so a serializer narrowed with ``fields=`` (see
+    ``jobs.fieldsets``) fetches no more than it renders.
+    ``always_load_fields`` are loaded regardless, e.g. fields the view
+    orders or caches on.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+    always_load_fields = ()
+
+    def _eager_fields(self):
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            many = isinstance(field, serializers.ListSerializer)
+            yield name, field, field.child if many else field, many
+
+    def _is_rendered(self, lookup):
+        # A declared lookup named after a field that has been dropped is not needed
+        name = lookup.split('__')[0]
+        return name in self.fields or name not in self._declared_fields
+
+    def get_related_lookups(self):
+        select_related = [lookup for lookup in self.select_related_fields if self._is_rendered(lookup)]
+        prefetch_related = [lookup for lookup in self.prefetch_related_fields if self._is_rendered(lookup)]
+
+        for name, field, nested, many in self._eager_fields():
+            if not isinstance(nested, EagerLoadingMixin):
+                continue
+            source = field.source or name
+            if source == '*':
+                continue
+            prefix = source.replace('.', '__') + '__'
+            nested_select, nested_prefetch = nested.get_related_lookups()
+            if many:
+                prefetch_related.append(source.replace('.', '__'))
+                prefetch_related += [prefix + lookup for lookup in nested_select + nested_prefetch]
+            else:
+                select_related += [prefix + lookup for lookup in nested_select]
+                prefetch_related += [prefix + lookup for lookup in nested_prefetch]
+
+        return select_related, prefetch_related
+
+    def get_load_fields(self):
+        """
+        The model fields this serializer renders, as ``only()`` lookups, or
+        None if they cannot be worked out (a method field, a property...) and
+        every column has to be loaded.
+        """
+        opts = self.Meta.model._meta
+        names = {opts.pk.name, *self.always_load_fields}
+        for name, field, nested, many in self._eager_fields():
+            if field.source == '*' or len(field.source_attrs) != 1:
+                return None
+            try:
+                model_field = opts.get_field(field.source_attrs[0])
+            except FieldDoesNotExist:
+                return None
+            if many:
+                # Prefetched with a query of its own
+                continue
+            if not model_field.concrete:
+                return None
+            names.add(model_field.name)
+            if isinstance(nested, serializers.BaseSerializer):
+                nested_names = nested.get_load_fields() if isinstance(nested, EagerLoadingMixin) else None
+                if nested_names is not None:
+                    names.update(f'{model_field.name}__{nested_name}' for nested_name in nested_names)
+        return sorted(names)
+
+    def setup_eager_loading(self, queryset, narrow=True, also_load=()):
+        """
+        ``queryset`` with the relations the serializer reads, and if
+        ``narrow``, only the columns it renders plus ``also_load``.
+        """
+        select_related, prefetch_related = self.get_related_lookups()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        load_fields = self.get_load_fields() if narrow else None
+        if load_fields is not None:
+            queryset = queryset.only(*load_fields, *also_load)
+        return queryset
+
+
+class EagerLoadingViewMixin:
+    """
+    Generic view mixin applying the serializer's declared relations to the
+    view's queryset, for both list and detail lookups. Reads also load only
+    the columns the serializer renders, and those the paginator orders and
+    seeks on; writes load whole rows, since the instance is saved and signal
+    handlers may inspect any field.
+    """
+
+    def get_ordering_fields(self, queryset):
+        """The fields the paginator orders the page by, if it says."""
+        get_ordering = getattr(self.paginator, 'get_ordering', None)
+        if get_ordering is None:
+            return []
+        return [name.lstrip('-') for name in get_ordering(self.request, queryset, self) or ()]
+
+    def eager_load(self, queryset):
+        serializer = self.get_serializer()
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        if isinstance(serializer, EagerLoadingMixin):
+            narrow = self.request.method in permissions.SAFE_METHODS
+            also_load = self.get_ordering_fields(queryset) if narrow else ()
+            queryset = serializer.setup_eager_loading(queryset, narrow=narrow, also_load=also_load)
+        return queryset
+
+    def filter_queryset(self, queryset):
+        return self.eager_load(super().filter_queryset(queryset))
@@ -0,0 +1,336 @@
+"""
+Facet counts for the job list: ``?facets=job_type,location,salary`` adds
+how many jobs have each job type, location and salary band to the page.
+The facets' own filters are ``?job_type=``, ``?location=`` and the
+``?salary_gte=``/``?salary_lte=`` range.
+
+Counts are disjunctive. Each facet counts the jobs matching every active
+filter but its own, so a client can show what choosing another value would
+return. All of them come from one query grouping the listing, without its
+facet filters, by the facets asked for; each facet then sums the groups
+matching the other facets' filters. Listings narrowed by no more than
+job type and location group the ``JobFacetCount`` summary of published
+jobs instead, which the ``jobs.signals`` handlers keep current, less the
+expired jobs still published.
+"""
+import bisect
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .filters import parse_param
+from .models import Job, JobFacetCount
+
+# The summary key of a job whose facet fields were not all loaded
+UNKNOWN = object()
+
+
+def salary_bounds():
+    """Lowest salary of each band but the first."""
+    return sorted(getattr(settings, 'JOBS_SALARY_BANDS', [500, 1000, 2000, 5000]))
+
+
+def salary_band(salary_min):
+    return bisect.bisect_right(salary_bounds(), salary_min)
+
+
+def salary_band_expression():
+    """``salary_band`` in SQL, for a queryset of jobs."""
+    bounds = salary_bounds()
+    return Case(
+        *[When(salary_min__lt=bound, then=Value(band)) for band, bound in enumerate(bounds)],
+        default=Value(len(bounds)),
+    )
+
+
+class Facet:
+    """
+    A facet grouped by the column or annotation ``field``, filtered by
+    ``?<param>=``. Its selection is the parsed filter, or None.
+    """
+
+    def __init__(self, name, field, param=None):
+        self.name = name
+        self.field = field
+        self.param = param
+
+    def selected(self, params):
+        return (params.get(self.param) or None) if self.param else None
+
+    def filter(self, queryset, selection):
+        return queryset.filter(**{self.field: selection})
+
+    def prepare(self, queryset, selection):
+        """``queryset`` with ``field`` available to group by."""
+        return queryset
+
+    def matches(self, value, selection):
+        """Whether the jobs grouped under ``value`` pass the filter."""
+        return value == selection
+
+    def represent(self, counts, selection):
+        return [{'value': value, 'count': count} for value, count in counts.items() if count]
+
+
+class ChoiceFacet(Facet):
+    """Every choice of a field, in order, zero counts included."""
+
+    def __init__(self, name, field, choices, param=None):
+        super().__init__(name, field, param)
+        self.choices = choices
+
+    def represent(self, counts, selection):
+        return [{'value': value, 'count': counts.get(value, 0)} for value, _ in self.choices]
+
+
+class TermFacet(Facet):
+    """The most common values of a free-text field."""
+
+    def represent(self, counts, selection):
+        top = sorted((item for item in counts.items() if item[1]), key=lambda item: (-item[1], item[0]))
+        limit = getattr(settings, 'JOBS_FACET_MAX_VALUES', 20)
+        return [{'value': value, 'count': count} for value, count in top[:limit]]
+
+
+class SalaryFacet(Facet):
+    """
+    Jobs per band of minimum salary, as ``min``/``max`` bounds, filtered by
+    ``?salary_gte=`` and ``?salary_lte=`` on the minimum salary.
+
+    Jobs are grouped into slots: the bands, cut again at the filter's
+    bounds, so that every slot is wholly inside or outside the filter.
+    """
+
+    def selected(self, params):
+        field = serializers.DecimalField(max_digits=10, decimal_places=2)
+        low = parse_param(params, 'salary_gte', field)
+        high = parse_param(params, 'salary_lte', field)
+        if low is None and high is None:
+            return None
+        if low is not None and high is not None and low > high:
+            raise ValidationError({'salary_lte': "Must not be below salary_gte"})
+        return low, high
+
+    def filter(self, queryset, selection):
+        low, high = selection
+        if low is not None:
+            queryset = queryset.filter(salary_min__gte=low)
+        if high is not None:
+            queryset = queryset.filter(salary_min__lte=high)
+        return queryset
+
+    def slots(self, selection):
+        """
+        ``(lookup, value)`` tests on the minimum salary, in order, and for
+        each slot its band and whether it is selected. A job's slot is the
+        first test it passes, or the last slot if it passes none.
+        """
+        low, high = selection or (None, None)
+        tests = [('lt', bound, 'band') for bound in salary_bounds()]
+        if low is not None:
+            tests.append(('lt', low, 'low'))
+        if high is not None:
+            tests.append(('lte', high, 'high'))
+        tests.sort(key=lambda test: (test[1], test[0] == 'lte'))
+        kinds = [kind for _, _, kind in tests]
+        slots = [
+            (
+                kinds[:slot].count('band'),
+                ('low' not in kinds or kinds.index('low') < slot) and ('high' not in kinds or kinds.index('high') >= slot),
+            )
+            for slot in range(len(tests) + 1)
+        ]
+        return [(lookup, value) for lookup, value, _ in tests], slots
+
+    def prepare(self, queryset, selection):
+        if queryset.model is JobFacetCount:
+            # Slots of the summary are the bands
+            return queryset
+        tests, _ = self.slots(selection)
+        return queryset.annotate(**{self.field: Case(
+            *[When(**{f'salary_min__{lookup}': value}, then=Value(slot)) for slot, (lookup, value) in enumerate(tests)],
+            default=Value(len(tests)),
+        )})
+
+    def matches(self, value, selection):
+        return self.slots(selection)[1][value][1]
+
+    def represent(self, counts, selection):
+        _, slots = self.slots(selection)
+        bands = {}
+        for slot, count in counts.items():
+            band = slots[slot][0]
+            bands[band] = bands.get(band, 0) + count
+        bounds = [None, *salary_bounds(), None]
+        return [
+            {'min': bounds[band], 'max': bounds[band + 1], 'count': bands.get(band, 0)}
+            for band in range(len(bounds) - 1)
+        ]
+
+
+FACETS = {
+    facet.name: facet for facet in [
+        ChoiceFacet('job_type', 'job_type', Job.JOB_TYPE_CHOICES, param='job_type'),
+        TermFacet('location', 'location', param='location'),
+        SalaryFacet('salary', 'salary_band'),
+    ]
+}
+
+
+def parse_facets(value):
+    """The facets named in a comma-separated ``?facets=`` value."""
+    names = list(dict.fromkeys(name.strip() for name in (value or '').split(',') if name.strip()))
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise ValidationError({'facets': f"Unknown facets {', '.join(unknown)}; choose from {', '.join(FACETS)}"})
+    return names
+
+
+def filter_queryset(queryset, params, facets=None):
+    """Narrow ``queryset`` by the filters of ``facets`` (default: all of them)."""
+    for facet in FACETS.values() if facets is None else facets:
+        selection = facet.selected(params)
+        if selection is not None:
+            queryset = facet.filter(queryset, selection)
+    return queryset
+
+
+def count_facets(queryset, params, names, summary=False, excess=None):
+    """
+    ``{facet: [{'value': ..., 'count': ...}, ...]}`` for the facets named,
+    over ``queryset`` (the listing without facet filters) narrowed by the
+    facet filters in ``params``, in one query. With ``summary`` the counts
+    come from ``JobFacetCount`` less those of the jobs in ``excess``, which
+    together must stand for ``queryset``.
+    """
+    facets = [FACETS[name] for name in names]
+    selections = [facet.selected(params) for facet in facets]
+    if summary:
+        sources = [(JobFacetCount.objects.all(), Sum('count'), 1)]
+        if excess is not None:
+            sources.append((excess, Count('pk'), -1))
+    else:
+        sources = [(queryset, Count('pk'), 1)]
+
+    counts = [{} for _ in facets]
+    for source, total, sign in sources:
+        # Filters of facets not counted narrow every count, so belong in SQL
+        source = filter_queryset(source, params, [facet for facet in FACETS.values() if facet not in facets])
+        for facet, selection in zip(facets, selections):
+            source = facet.prepare(source, selection)
+        rows = source.order_by().values(*[facet.field for facet in facets]).annotate(facet_count=total)
+        for row in rows:
+            values = [row[facet.field] for facet in facets]
+            misses = [
+                selection is not None and not facet.matches(value, selection)
+                for facet, value, selection in zip(facets, values, selections)
+            ]
+            missed = sum(misses)
+            for index, value in enumerate(values):
+                # A group counts towards a facet if only that facet's own
+                # filter (or none) rules it out
+                if missed - misses[index] == 0:
+                    counts[index][value] = counts[index].get(value, 0) + sign * (row['facet_count'] or 0)
+    return {
+        facet.name: facet.represent(facet_counts, selection)
+        for facet, facet_counts, selection in zip(facets, counts, selections)
+    }
+
+
+class FacetedListMixin:
+    """
+    List view mixin adding ``facets`` to the paginated response for
+    ``?facets=``. Views provide ``get_facet_queryset(paged)``, their
+    listing without facet filters (``paged=False`` when it is counted
+    whole), and say in ``use_facet_summary()`` when that is every
+    published job but those of ``get_facet_summary_excess()``. Put it
+    after CachedReadMixin so the counts are cached with the page.
+    """
+    facets_query_param = 'facets'
+
+    def get_facet_names(self):
+        return parse_facets(self.request.query_params.get(self.facets_query_param))
+
+    def get_facet_queryset(self, paged=True):
+        raise NotImplementedError
+
+    def use_facet_summary(self):
+        return False
+
+    def get_facet_summary_excess(self):
+        return None
+
+    def add_facets(self, response, names=None):
+        if names is None:
+            names = self.get_facet_names()
+        if names and response.status_code == 200 and isinstance(response.data, dict):
+            summary = getattr(settings, 'JOBS_FACET_SUMMARY', True) and self.use_facet_summary()
+            response.data['facets'] = count_facets(
+                self.get_facet_queryset(paged=False), self.request.query_params, names,
+                summary=summary, excess=self.get_facet_summary_excess() if summary else None,
+            )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        # Reject unknown facets before paging
+        names = self.get_facet_names()
+        return self.add_facets(super().list(request, *args, **kwargs), names)
+
+
+# Summary table
+
+def job_key(job):
+    """
+    The summary group a job counts towards as loaded: None unless it is
+    published, UNKNOWN if any of the fields involved were deferred.
+    """
+    values = job.__dict__
+    if any(field not in values for field in ('status', 'job_type', 'location', 'salary_min')):
+        return UNKNOWN
+    if values['status'] != 'PUBLISHED':
+        return None
+    return values['job_type'], values['location'], salary_band(values['salary_min'])
+
+
+def stored_key(pk):
+    """``job_key`` of a job as stored."""
+    job = Job.objects.filter(pk=pk).only('status', 'job_type', 'location', 'salary_min').first()
+    return None if job is None else job_key(job)
+
+
+def adjust(changes):
+    """
+    Add ``{key: change}`` to the summary counts, one UPDATE per group. Run
+    it in the transaction that changed the jobs.
+    """
+    for key, change in changes.items():
+        if key is None or not change:
+            continue
+        job_type, location, band = key
+        group = JobFacetCount.objects.filter(job_type=job_type, location=location, salary_band=band)
+        if not group.update(count=F('count') + change):
+            # The group's first job
+            JobFacetCount.objects.get_or_create(job_type=job_type, location=location, salary_band=band)
+            group.update(count=F('count') + change)
+
+
+def move(old_key, new_key):
+    """Adjust the summary for one job going from one group to another."""
+    if old_key != new_key:
+        adjust({old_key: -1, new_key: 1})
+
+
+def rebuild_counts(batch_size=500):
+    """Recount the summary from the published jobs. Returns the number of groups."""
+    rows = (
+        Job.objects.filter(status='PUBLISHED')
+        .annotate(salary_band=salary_band_expression())
+        .order_by().values('job_type', 'location', 'salary_band').annotate(count=Count('pk'))
+    )
+    with transaction.atomic():
+        JobFacetCount.objects.all().delete()
+        created = JobFacetCount.objects.bulk_create([JobFacetCount(**row) for row in rows], batch_size=batch_size)
+    return len(created)
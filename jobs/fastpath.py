@@ -0,0 +1,265 @@
+"""
+High-throughput output path for read-only list endpoints.
+
+``compile_serializer`` turns a ModelSerializer, as narrowed by ``?fields=``
+and ``?expand=``, into the ``values_list()`` lookups it reads and a row
+builder generated as Python source. A page is then rendered from plain
+tuples without instantiating models or walking serializer fields per row.
+
+Only fields whose output can be reproduced exactly from a column value are
+compiled: model fields, forward relations (as primary keys or nested model
+serializers) and files. Method fields, properties, many-relations and
+custom attribute lookups make a serializer uncompilable, and the view
+falls back to DRF.
+
+``FastPathListMixin`` puts a list view on this path, rendered with
+``jobs.renderers.FastJSONRenderer``. The views named in ``JOBS_FAST_PATH``
+use it; the ``benchmark_fastpath`` command checks that both paths return
+the same bytes.
+"""
+import copy
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils import timezone
+from rest_framework import ISO_8601, fields, permissions, relations, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .renderers import FastJSONRenderer
+
+# Serializer fields returning the column value unchanged, with the model
+# fields whose values they are given
+IDENTITY_FIELDS = {
+    fields.CharField.to_representation: (models.CharField, models.TextField),
+    fields.IntegerField.to_representation: (models.IntegerField,),
+    fields.BooleanField.to_representation: (models.BooleanField,),
+    fields.ChoiceField.to_representation: (models.CharField, models.IntegerField),
+    fields.ReadOnlyField.to_representation: (models.Field,),
+}
+
+MAX_COMPILED = 256
+
+
+class NotCompilable(Exception):
+    pass
+
+
+class CompiledSerializer:
+    """The columns a serializer reads and a function building its output from them."""
+
+    def __init__(self, lookups, build, source):
+        self.lookups = lookups
+        self.build = build
+        self.source = source
+
+    def values(self, queryset, extra=()):
+        """
+        ``queryset`` as named rows of the serializer's columns, plus ``extra``
+        columns (e.g. the paginator's ordering) that are not rendered.
+        """
+        extra = [lookup for lookup in extra if lookup not in self.lookups]
+        return queryset.values_list(*self.lookups, *extra, named=True)
+
+    def render(self, rows, request=None):
+        absolute = request.build_absolute_uri if request is not None else str
+        # What DateTimeField.default_timezone() returns, looked up once
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        build = self.build
+        return [build(row, absolute, tz) for row in rows]
+
+
+def render_datetime(value, tz, fallback):
+    """DateTimeField.to_representation for ISO 8601 output in the default timezone."""
+    if tz is None or value.tzinfo is None:
+        return fallback(value)
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+_compiled = {}
+
+
+def compile_serializer(serializer):
+    """
+    The CompiledSerializer of a serializer instance, or None if it cannot be
+    compiled. Plans are cached by serializer class and rendered fields.
+    """
+    try:
+        signature = _signature(serializer)
+    except NotCompilable:
+        return None
+    compiled = _compiled.get(signature)
+    if compiled is None:
+        try:
+            compiled = _compile(serializer)
+        except NotCompilable:
+            compiled = False
+        if len(_compiled) >= MAX_COMPILED:
+            _compiled.clear()
+        _compiled[signature] = compiled
+    return compiled or None
+
+
+def _signature(serializer):
+    _check_serializer(serializer)
+    parts = [type(serializer)]
+    for field in serializer._readable_fields:
+        if isinstance(field, serializers.BaseSerializer):
+            parts.append((field.field_name, _signature(field)))
+        else:
+            parts.append((field.field_name, type(field), field.source))
+    return tuple(parts)
+
+
+def _check_serializer(serializer):
+    if not isinstance(serializer, serializers.ModelSerializer):
+        raise NotCompilable(f"{type(serializer).__name__} is not a model serializer")
+    if type(serializer).to_representation is not serializers.Serializer.to_representation:
+        raise NotCompilable(f"{type(serializer).__name__} overrides to_representation")
+
+
+def _compile(serializer):
+    columns = {}
+    namespace = {}
+
+    def column(lookup):
+        return f'row[{columns.setdefault(lookup, len(columns))}]'
+
+    def constant(value):
+        name = f'_c{len(namespace)}'
+        namespace[name] = value
+        return name
+
+    source = f'def build(row, absolute, tz):\n    return {_dict_source(serializer, "", column, constant)}\n'
+    exec(compile(source, f'<compiled {type(serializer).__name__}>', 'exec'), namespace)
+    return CompiledSerializer(list(columns), namespace['build'], source)
+
+
+def _dict_source(serializer, prefix, column, constant):
+    opts = serializer.Meta.model._meta
+    items = []
+    for field in serializer._readable_fields:
+        model_field = _model_field(opts, field)
+        lookup = prefix + model_field.name
+        value = column(lookup)
+
+        if isinstance(field, serializers.BaseSerializer):
+            # A forward relation rendered by a nested serializer; None when unset
+            _check_serializer(field)
+            nested = _dict_source(field, lookup + '__', column, constant)
+            expression = f'None if {value} is None else {nested}'
+        elif model_field.is_relation:
+            if type(field) is not relations.PrimaryKeyRelatedField or field.pk_field is not None:
+                raise NotCompilable(f"{field.field_name} is not rendered as a primary key")
+            expression = value
+        elif isinstance(field, fields.FileField) and type(field).to_representation is fields.FileField.to_representation:
+            # The column holds the file name; an empty one renders as None
+            if getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+                url = constant(model_field.storage.url)
+                expression = f'absolute({url}({value})) if {value} else None'
+            else:
+                expression = f'{value} or None'
+        elif type(field).get_attribute is not fields.Field.get_attribute:
+            raise NotCompilable(f"{field.field_name} has its own get_attribute")
+        elif _is_identity(field, model_field):
+            expression = value
+        else:
+            # As Serializer.to_representation, None is never converted. The
+            # copy is unbound, so the cached plan holds no serializer context
+            convert = constant(copy.deepcopy(field).to_representation)
+            if _is_default_datetime(field):
+                convert = f'{constant(render_datetime)}({value}, tz, {convert})'
+            else:
+                convert = f'{convert}({value})'
+            expression = f'None if {value} is None else {convert}'
+        items.append(f'{field.field_name!r}: {expression}')
+    return '{' + ', '.join(items) + '}'
+
+
+def _is_identity(field, model_field):
+    if isinstance(field, fields.BigIntegerField) and type(field).to_representation is fields.BigIntegerField.to_representation:
+        if getattr(field, 'coerce_to_string', api_settings.COERCE_BIGINT_TO_STRING):
+            return False
+        return isinstance(model_field, models.IntegerField)
+    return isinstance(model_field, IDENTITY_FIELDS.get(type(field).to_representation, ()))
+
+
+def _is_default_datetime(field):
+    return (
+        type(field).to_representation is fields.DateTimeField.to_representation
+        and type(field).enforce_timezone is fields.DateTimeField.enforce_timezone
+        and not hasattr(field, 'timezone')
+        and str(getattr(field, 'format', api_settings.DATETIME_FORMAT)).lower() == ISO_8601
+    )
+
+
+def _model_field(opts, field):
+    if field.source == '*' or len(field.source_attrs) != 1:
+        raise NotCompilable(f"{field.field_name} is not read from a single attribute")
+    try:
+        model_field = opts.get_field(field.source_attrs[0])
+    except FieldDoesNotExist:
+        raise NotCompilable(f"{field.field_name} is not a model field")
+    if not model_field.concrete or model_field.many_to_many:
+        raise NotCompilable(f"{field.field_name} is not a column")
+    return model_field
+
+
+class FastPathListMixin:
+    """
+    List view mixin rendering GETs from ``values_list()`` rows with the
+    compiled form of the view's serializer, when the view is named in
+    ``JOBS_FAST_PATH``. Responses are the same bytes as the DRF path.
+    """
+
+    def use_fast_path(self):
+        return type(self).__name__ in getattr(settings, 'JOBS_FAST_PATH', ())
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if self.use_fast_path():
+            renderers = [
+                FastJSONRenderer() if type(renderer) is JSONRenderer else renderer
+                for renderer in renderers
+            ]
+        return renderers
+
+    def get_compiled_serializer(self):
+        if not self.use_fast_path() or self.request.method not in permissions.SAFE_METHODS:
+            return None
+        serializer = self.get_serializer()
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        return compile_serializer(serializer)
+
+    def get_fast_path_queryset(self, compiled, queryset):
+        # Columns the paginator seeks on and the response cache reads,
+        # whether rendered or not
+        serializer_class = self.get_serializer_class()
+        extra = [queryset.model._meta.pk.name, *getattr(serializer_class, 'always_load_fields', ())]
+        get_ordering = getattr(self.paginator, 'get_ordering', None)
+        ordering = get_ordering(self.request, queryset, self) if get_ordering else None
+        extra += [name.lstrip('-') for name in ordering or ()]
+        return compiled.values(queryset, extra)
+
+    def get_fast_path_data(self, compiled, rows):
+        note_last_modified = getattr(self, 'note_last_modified', None)
+        if note_last_modified is not None:
+            note_last_modified(rows)
+        return compiled.render(rows, self.request)
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.get_fast_path_queryset(compiled, self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_fast_path_data(compiled, page))
+        return Response(self.get_fast_path_data(compiled, list(queryset)))
@@ -0,0 +1,88 @@
+from rest_framework import permissions, serializers
+from rest_framework.exceptions import ValidationError
+
+
+def parse_fieldset(value):
+    """
+    Split ``"id,title,employer.company_name"`` into
+    ``{'id': [], 'title': [], 'employer': ['company_name']}``.
+    """
+    fieldset = {}
+    for path in (value or '').split(','):
+        path = path.strip()
+        if not path:
+            continue
+        name, _, rest = path.partition('.')
+        nested = fieldset.setdefault(name, [])
+        if rest:
+            nested.append(rest)
+    return fieldset
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin taking ``fields`` and ``expand`` keyword arguments.
+
+    ``fields`` keeps only the named fields; a dotted name (``employer.company_name``)
+    narrows a nested serializer. ``expand`` swaps the compact nested
+    serializer of a relation for the fuller one in ``expandable_fields``.
+    Both accept the comma-separated strings clients send as query parameters.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if expand:
+            self.expand_fields(parse_fieldset(expand) if isinstance(expand, str) else expand)
+        if fields:
+            self.select_fields(parse_fieldset(fields) if isinstance(fields, str) else fields)
+
+    def expand_fields(self, expand):
+        for name, nested in expand.items():
+            if name in self.expandable_fields:
+                current = self.fields[name]
+                options = {'read_only': True}
+                if current.source != name:
+                    options['source'] = current.source
+                self.fields[name] = self.expandable_fields[name](**options)
+            elif not isinstance(_nested(self.fields.get(name)), serializers.BaseSerializer):
+                # A relation that is already rendered in full needs no expanding
+                choices = ', '.join(sorted(self.expandable_fields)) or 'nothing'
+                raise ValidationError({'expand': f"{name!r} cannot be expanded; choose from {choices}"})
+            serializer = _nested(self.fields[name])
+            if nested and isinstance(serializer, SparseFieldsetMixin):
+                serializer.expand_fields(parse_fieldset(','.join(nested)))
+
+    def select_fields(self, fields):
+        unknown = set(fields) - set(self.fields)
+        if unknown:
+            raise ValidationError({'fields': f"Unknown field(s): {', '.join(sorted(unknown))}"})
+        for name in list(self.fields):
+            if name not in fields:
+                self.fields.pop(name)
+        for name, nested in fields.items():
+            if nested:
+                serializer = _nested(self.fields[name])
+                if not isinstance(serializer, SparseFieldsetMixin):
+                    raise ValidationError({'fields': f"{name!r} has no fields to choose from"})
+                serializer.select_fields(parse_fieldset(','.join(nested)))
+
+
+def _nested(field):
+    return field.child if isinstance(field, serializers.ListSerializer) else field
+
+
+class SparseFieldsetViewMixin:
+    """
+    Generic view mixin passing the ``?fields=`` and ``?expand=`` query
+    parameters of reads on to serializers that accept them.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, SparseFieldsetMixin) and self.request.method in permissions.SAFE_METHODS:
+            kwargs.setdefault('fields', self.request.query_params.get(self.fields_query_param))
+            kwargs.setdefault('expand', self.request.query_params.get(self.expand_query_param))
+        return super().get_serializer(*args, **kwargs)
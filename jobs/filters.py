@@ -0,0 +1,53 @@
+"""
+Job list filters on deadlines, and parsing of filter query parameters.
+
+The listing shows open jobs only: those without a deadline, or whose
+deadline is today or later (the same test ``ApplicationListCreate`` applies
+to new applications). ``?include_expired=true`` shows the rest too.
+"""
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def parse_param(params, name, field):
+    """``?<name>=`` converted by a serializer field, or None if absent."""
+    value = params.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return field.to_internal_value(value)
+    except ValidationError as exc:
+        raise ValidationError({name: exc.detail})
+
+
+def include_expired(params):
+    return bool(parse_param(params, 'include_expired', serializers.BooleanField()))
+
+
+def open_on(params):
+    """The date listed jobs must still be open on, or None to list them all."""
+    after = parse_param(params, 'deadline_after', serializers.DateField())
+    if not include_expired(params):
+        today = timezone.now().date()
+        after = max(after, today) if after else today
+    return after
+
+
+def filter_queryset(queryset, params):
+    """
+    Hide expired jobs, and with ``?deadline_after=`` jobs that close before
+    that date.
+    """
+    after = open_on(params)
+    if after is not None:
+        queryset = queryset.filter(Q(deadline__gte=after) | Q(deadline__isnull=True))
+    return queryset
+
+
+def expired(queryset, params):
+    """The jobs of ``queryset`` that ``filter_queryset`` hides by default."""
+    if include_expired(params):
+        return queryset.none()
+    return queryset.filter(deadline__lt=timezone.now().date())
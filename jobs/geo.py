@@ -0,0 +1,326 @@
+"""
+Geocoding and "jobs near me" search without PostGIS.
+
+Jobs are geocoded from their location text (``JOBS_GEOCODER``, by default
+a bundled city gazetteer that needs no network) into latitude/longitude and
+a geohash. A geohash interleaves the bits of both coordinates, so points in
+the same cell share a prefix and every cell is a contiguous range of a
+plain B-tree index. A radius or bounding-box search becomes a few range
+scans over the cells covering the area, refined by the exact box and
+great-circle distance on the rows those scans return.
+"""
+import csv
+import math
+import re
+import unicodedata
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import ValidationError
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Stored geohashes are ~3.7cm x 1.9cm cells
+PRECISION = 12
+# Most cells a search may scan; it picks the finest cells within this budget
+MAX_CELLS = 32
+# More jobs than this in the cells covering a search area make it dense
+DENSE_CANDIDATES = 1000
+EARTH_RADIUS_KM = 6371.0088
+COORDINATES_RE = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+
+
+# Geohashes
+
+def _bits(precision):
+    # Longitude takes the first bit, and the extra one when the count is odd
+    bits = precision * 5
+    return bits // 2, bits - bits // 2
+
+
+def _index(value, low, span, bits):
+    index = int((value - low) / span * (1 << bits))
+    return min(max(index, 0), (1 << bits) - 1)
+
+
+def _cell_code(lat_index, lon_index, precision):
+    lat_bits, lon_bits = _bits(precision)
+    code = 0
+    for position in range(precision * 5):
+        if position % 2 == 0:
+            lon_bits -= 1
+            bit = lon_index >> lon_bits & 1
+        else:
+            lat_bits -= 1
+            bit = lat_index >> lat_bits & 1
+        code = code << 1 | bit
+    return code
+
+
+def _code_hash(code, precision):
+    return ''.join(BASE32[code >> shift & 31] for shift in range(precision * 5 - 5, -1, -5))
+
+
+def _cell_indexes(latitude, longitude, precision):
+    lat_bits, lon_bits = _bits(precision)
+    return _index(latitude, -90.0, 180.0, lat_bits), _index(longitude, -180.0, 360.0, lon_bits)
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    """The geohash of a point."""
+    lat_index, lon_index = _cell_indexes(float(latitude), float(longitude), precision)
+    return _code_hash(_cell_code(lat_index, lon_index, precision), precision)
+
+
+def covering_ranges(south, west, north, east, max_cells=MAX_CELLS):
+    """
+    Inclusive ``(low, high)`` ranges of stored geohashes covering a box, from
+    the finest cells that need no more than ``max_cells`` of them. A box with
+    ``west > east`` crosses the antimeridian.
+    """
+    spans = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+    for precision in range(PRECISION, 0, -1):
+        south_index, _ = _cell_indexes(south, 0.0, precision)
+        north_index, _ = _cell_indexes(north, 0.0, precision)
+        columns = [
+            (_cell_indexes(0.0, low, precision)[1], _cell_indexes(0.0, high, precision)[1])
+            for low, high in spans
+        ]
+        count = (north_index - south_index + 1) * sum(high - low + 1 for low, high in columns)
+        if count <= max_cells or precision == 1:
+            break
+
+    codes = sorted(
+        _cell_code(lat_index, lon_index, precision)
+        for lat_index in range(south_index, north_index + 1)
+        for low, high in columns
+        for lon_index in range(low, high + 1)
+    )
+    # Cells adjacent in geohash order are one range
+    ranges = []
+    for code in codes:
+        if ranges and ranges[-1][1] == code - 1:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+    padding = PRECISION - precision
+    return [
+        (_code_hash(low, precision) + '0' * padding, _code_hash(high, precision) + 'z' * padding)
+        for low, high in ranges
+    ]
+
+
+# Distances
+
+def radius_box(latitude, longitude, radius_km):
+    """``(south, west, north, east)`` of the box around a circle on the sphere."""
+    angle = radius_km / EARTH_RADIUS_KM
+    south = latitude - math.degrees(angle)
+    north = latitude + math.degrees(angle)
+    if south <= -90.0 or north >= 90.0 or math.sin(angle) >= math.cos(math.radians(latitude)):
+        # The circle takes in a pole: every longitude
+        return max(south, -90.0), -180.0, min(north, 90.0), 180.0
+    delta = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(latitude))))
+    west, east = longitude - delta, longitude + delta
+    if west < -180.0:
+        west += 360.0
+    if east > 180.0:
+        east -= 360.0
+    return south, west, north, east
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def distance_km(latitude, longitude):
+    """Great-circle distance from a point to each row's coordinates, in SQL."""
+    row_lat = Radians(Cast(F('latitude'), FloatField()))
+    row_lon = Radians(Cast(F('longitude'), FloatField()))
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    a = (
+        Power(Sin((row_lat - lat) / 2), 2)
+        + math.cos(lat) * Cos(row_lat) * Power(Sin((row_lon - lon) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a), output_field=FloatField())
+
+
+def within_box(queryset, south, west, north, east, paged=True):
+    """
+    Narrow ``queryset`` to a box. Where the cells covering it hold few jobs,
+    the query starts from those (a range scan per run of cells); where they
+    hold many, scanning the listing in its own order finds a page of
+    matches sooner than collecting and sorting them all, so the database is
+    left to do that. Querysets read whole rather than a page at a time
+    (``paged=False``, e.g. counted) always start from the cells.
+    """
+    cells = Q()
+    for low, high in covering_ranges(south, west, north, east):
+        cells |= Q(geohash__range=(low, high))
+    box = Q(latitude__range=(south, north))
+    if west <= east:
+        box &= Q(longitude__range=(west, east))
+    else:
+        box &= Q(longitude__gte=west) | Q(longitude__lte=east)
+
+    # Counted off the geohash index alone, so stops early and never reads rows
+    candidates = queryset.model._default_manager.filter(cells).order_by()
+    if paged and candidates.values('geohash')[:DENSE_CANDIDATES + 1].count() > DENSE_CANDIDATES:
+        return queryset.filter(box)
+    return queryset.filter(box, pk__in=candidates.values('pk'))
+
+
+def near(queryset, latitude, longitude, radius_km, paged=True):
+    return (
+        within_box(queryset, *radius_box(latitude, longitude, radius_km), paged=paged)
+        .alias(distance=distance_km(latitude, longitude))
+        .filter(distance__lte=radius_km)
+    )
+
+
+# Query parameters
+
+def _floats(value, count, name):
+    try:
+        numbers = [float(part) for part in value.split(',')]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(math.isfinite(number) for number in numbers):
+        raise ValidationError({name: f"Expected {count} comma-separated numbers"})
+    return numbers
+
+
+def _check_point(latitude, longitude, name):
+    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+        raise ValidationError({name: "Latitude must be within ±90 and longitude within ±180"})
+
+
+def filter_queryset(queryset, params, paged=True):
+    """
+    Narrow jobs by ``?near=`` (``lat,lon`` or a place the geocoder knows)
+    within ``?radius=`` kilometres, and by ``?bbox=west,south,east,north``.
+    """
+    if params.get('near'):
+        text = params['near']
+        point = parse_coordinates(text)
+        if point is None:
+            point = get_geocoder().geocode(text)
+            if point is None:
+                raise ValidationError({'near': f"Unknown place {text!r}; send lat,lon instead"})
+        latitude, longitude = map(float, point)
+        _check_point(latitude, longitude, 'near')
+
+        radius = getattr(settings, 'JOBS_GEO_DEFAULT_RADIUS_KM', 25)
+        if params.get('radius'):
+            radius, = _floats(params['radius'], 1, 'radius')
+        max_radius = getattr(settings, 'JOBS_GEO_MAX_RADIUS_KM', 500)
+        if not 0 < radius <= max_radius:
+            raise ValidationError({'radius': f"Must be more than 0 and at most {max_radius} km"})
+        queryset = near(queryset, latitude, longitude, radius, paged)
+
+    if params.get('bbox'):
+        west, south, east, north = _floats(params['bbox'], 4, 'bbox')
+        _check_point(south, west, 'bbox')
+        _check_point(north, east, 'bbox')
+        if south > north:
+            raise ValidationError({'bbox': "South must not be above north"})
+        queryset = within_box(queryset, south, west, north, east, paged)
+    return queryset
+
+
+# Geocoding
+
+def parse_coordinates(text):
+    match = COORDINATES_RE.match(text or '')
+    if match is None:
+        return None
+    return float(match.group(1)), float(match.group(2))
+
+
+def normalize_place(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    return ' '.join(re.sub(r'[^\w]+', ' ', text).split())
+
+
+class GazetteerGeocoder:
+    """
+    Looks places up in a CSV of ``name,country,latitude,longitude,aliases``
+    (aliases separated by ``|``), by default the cities bundled in
+    ``jobs/data/gazetteer.csv``. Names match without case or accents, alone
+    or followed by the country; "Downtown, Yangon" falls back to its
+    comma-separated parts in turn.
+    """
+    default_path = Path(__file__).resolve().parent / 'data' / 'gazetteer.csv'
+
+    def __init__(self, path=None):
+        self.places = {}
+        with open(path or self.default_path, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                point = (Decimal(row['latitude']), Decimal(row['longitude']))
+                names = [row['name'], *filter(None, (row.get('aliases') or '').split('|'))]
+                for name in names:
+                    self.places.setdefault(normalize_place(name), point)
+                    self.places.setdefault(normalize_place(f"{name} {row['country']}"), point)
+
+    def geocode(self, text):
+        """``(latitude, longitude)`` of a place, or None if it is not known."""
+        candidates = [text, *(text or '').split(',')]
+        for candidate in candidates:
+            point = self.places.get(normalize_place(candidate))
+            if point is not None:
+                return point
+        return None
+
+
+_geocoder = None
+
+
+def get_geocoder():
+    global _geocoder
+    if _geocoder is None:
+        geocoder_class = import_string(getattr(settings, 'JOBS_GEOCODER', 'jobs.geo.GazetteerGeocoder'))
+        _geocoder = geocoder_class(**getattr(settings, 'JOBS_GEOCODER_OPTIONS', {}))
+    return _geocoder
+
+
+@receiver(setting_changed)
+def reset_geocoder(*, setting=None, **kwargs):
+    global _geocoder
+    if setting in (None, 'JOBS_GEOCODER', 'JOBS_GEOCODER_OPTIONS'):
+        _geocoder = None
+
+
+def locate(job):
+    """Set a job's coordinates and geohash from its location text."""
+    point = parse_coordinates(job.location) or get_geocoder().geocode(job.location)
+    if point is not None and not (-90 <= point[0] <= 90 and -180 <= point[1] <= 180):
+        point = None
+    if point is None:
+        job.latitude = job.longitude = job.geohash = None
+        return
+    job.latitude, job.longitude = (Decimal(str(round(float(value), 6))) for value in point)
+    job.geohash = encode(job.latitude, job.longitude)
+
+
+def geocode_jobs(queryset, batch_size=500):
+    """Geocode the jobs in ``queryset`` again, in batches. Returns how many were located."""
+    located = 0
+    batch = []
+    for job in queryset.only('pk', 'location').order_by('pk').iterator(chunk_size=batch_size):
+        locate(job)
+        located += job.geohash is not None
+        batch.append(job)
+        if len(batch) == batch_size:
+            queryset.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+            batch = []
+    if batch:
+        queryset.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+    return located
@@ -0,0 +1,120 @@
+"""
+Scheduled job status changes: drafts are published once their
+``publish_at`` comes, and published jobs are closed once their deadline
+has passed.
+
+Both are made in batches of UPDATEs, each followed by what the Job signal
+handlers would do for a save (facet summary, matching index, response
+cache), as UPDATEs send no signals. A run changes only the jobs still due,
+so running it again, or late, is harmless. On PostgreSQL every batch takes
+a transaction-level advisory lock, and a node that finds it held leaves
+the run to the node holding it.
+
+``run_lifecycle()`` is called by the task worker every
+``JOBS_LIFECYCLE_SECONDS`` and by ``manage.py run_lifecycle``, processes
+apart from the web workers: its invalidations only reach them through a
+shared response cache (see jobboard.settings_production). Other processes
+pick up the matching index changes by ``updated_at``.
+"""
+import logging
+import zlib
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import facets, matching
+from .cache import get_cache_backend, invalidate_jobs
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock held by the batch in progress on any node
+LOCK_KEY = zlib.crc32(b'jobs.lifecycle')
+
+
+def _batch_size():
+    return getattr(settings, 'JOBS_LIFECYCLE_BATCH_SIZE', 500)
+
+
+def _try_lock():
+    """Take the lifecycle lock for the current transaction, if no other node holds it."""
+    if connection.vendor != 'postgresql':
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [LOCK_KEY])
+        return cursor.fetchone()[0]
+
+
+def _lock_rows(queryset):
+    if connection.features.has_select_for_update_skip_locked:
+        return queryset.select_for_update(skip_locked=True)
+    return queryset
+
+
+def _after_commit(job_ids):
+    matching.job_index.index(job_ids)
+    invalidate_jobs(job_ids)
+
+
+def check_cache():
+    """Warn when the changes made here would not reach the response cache of the web processes."""
+    if not get_cache_backend().shared:
+        logger.warning(
+            "The response cache is per process: web processes will serve jobs published or closed "
+            "by the lifecycle as they were until their cached responses expire"
+        )
+
+
+def transition(queryset, batch_size=None, **changes):
+    """
+    Apply ``changes`` (``status`` among them) to the jobs in ``queryset``,
+    ``batch_size`` at a time, until none is left. Returns how many changed.
+    """
+    batch_size = batch_size or _batch_size()
+    changed = 0
+    while True:
+        with transaction.atomic():
+            if not _try_lock():
+                logger.info("Job lifecycle is running on another node")
+                break
+            rows = queryset.order_by('pk').only('pk', 'status', 'job_type', 'location', 'salary_min')
+            jobs = list(_lock_rows(rows)[:batch_size])
+            if not jobs:
+                break
+            job_ids = [job.pk for job in jobs]
+            Job.objects.filter(pk__in=job_ids).update(updated_at=timezone.now(), **changes)
+
+            moves = Counter()
+            for job in jobs:
+                moves[facets.job_key(job)] -= 1
+                job.status = changes['status']
+                moves[facets.job_key(job)] += 1
+            facets.adjust(moves)
+            transaction.on_commit(lambda job_ids=job_ids: _after_commit(job_ids))
+        changed += len(jobs)
+    return changed
+
+
+def publish_scheduled(now=None, batch_size=None):
+    """Publish the drafts whose ``publish_at`` has come. Returns how many."""
+    now = now or timezone.now()
+    due = Job.objects.filter(status='DRAFT', publish_at__lte=now)
+    return transition(due, batch_size, status='PUBLISHED', publish_at=None)
+
+
+def close_expired(today=None, batch_size=None):
+    """Close the published jobs whose deadline has passed. Returns how many."""
+    today = today or timezone.now().date()
+    expired = Job.objects.filter(status='PUBLISHED', deadline__lt=today)
+    return transition(expired, batch_size, status='CLOSED')
+
+
+def run_lifecycle(batch_size=None):
+    """Publish due drafts, then close expired jobs (scheduled ones included)."""
+    published = publish_scheduled(batch_size=batch_size)
+    closed = close_expired(batch_size=batch_size)
+    if published or closed:
+        logger.info("Published %s scheduled jobs and closed %s expired ones", published, closed)
+    return {'published': published, 'closed': closed}
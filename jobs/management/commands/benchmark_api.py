@@ -0,0 +1,226 @@
+import asyncio
+import json
+import time
+from contextlib import ExitStack
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from jobs import matching
+from jobs.benchmarking import ENDPOINTS, Fixtures, compare, summarize, uncovered_urls
+from jobs.models import Applicant, Application, Employer, Job
+
+# The response cache would answer every read after the first
+NO_CACHE = {'BACKEND': 'jobs.cache.NullCacheBackend'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every endpoint of jobs.urls against the data in the database (see seed_data): "
+        "through the test client, one request at a time with query counts, or with --target over "
+        "HTTP with --concurrency requests in flight. Results go to --output as JSON; with --compare "
+        "the command fails if latency or query counts regressed from an earlier result."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help="Requests per endpoint")
+        parser.add_argument('--warmup', type=int, default=3, help="Unmeasured requests per endpoint first")
+        parser.add_argument(
+            '--target',
+            help="Base URL of a running server on the same database, e.g. http://127.0.0.1:8000. "
+                 "Its own settings apply, the response cache among them.",
+        )
+        parser.add_argument('--concurrency', type=int, default=10, help="Requests in flight at once over HTTP")
+        parser.add_argument('--only', action='append', default=[], help="Endpoints whose name contains this (repeatable)")
+        parser.add_argument(
+            '--commit', action='store_true',
+            help="Keep what write requests change. Through the test client they are rolled back by "
+                 "default so runs see the same data; over HTTP they always commit.",
+        )
+        parser.add_argument('--response-cache', action='store_true', help="Leave the response cache on")
+        parser.add_argument('--output', help="Write the results to this JSON file")
+        parser.add_argument('--compare', metavar='BASELINE', help="JSON results of an earlier run to compare with")
+        parser.add_argument('--metric', default='p95_ms', choices=['p50_ms', 'p95_ms', 'p99_ms'])
+        parser.add_argument('--threshold', type=float, default=0.2, help="Latency growth that fails --compare, as a fraction")
+        parser.add_argument('--min-ms', type=float, default=1.0, help="Latency growth below this never fails --compare")
+        parser.add_argument('--query-threshold', type=int, default=0, help="Extra queries per request that fail --compare")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        endpoints = [
+            endpoint for endpoint in ENDPOINTS
+            if not options['only'] or any(part in endpoint.name for part in options['only'])
+        ]
+        if not endpoints:
+            raise CommandError("No endpoint matches --only")
+        missing = uncovered_urls()
+        if missing and not options['only']:
+            raise CommandError(f"No benchmark requests {', '.join(missing)}; add them to jobs.benchmarking.ENDPOINTS")
+        baseline = self.load(options['compare']) if options['compare'] else None
+        try:
+            fixtures = Fixtures()
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if not options['target']:
+            # As a server does at startup, or recommendations would answer 503
+            matching.build_indexes()
+
+        results = {'meta': self.meta(options), 'endpoints': {}}
+        with override_settings(**({} if options['response_cache'] else {'JOBS_RESPONSE_CACHE': NO_CACHE})):
+            for endpoint in endpoints:
+                if options['target']:
+                    summary = self.run_http(endpoint, fixtures, options)
+                else:
+                    summary = self.run_client(endpoint, fixtures, options)
+                results['endpoints'][endpoint.name] = summary
+                if options['verbosity'] > 1:
+                    self.stderr.write(f"{endpoint.name}: {summary}")
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.write_table(results)
+
+        failures = [name for name, summary in results['endpoints'].items() if summary['errors']]
+        if failures:
+            self.stderr.write(self.style.WARNING(f"Unexpected responses from {', '.join(failures)}"))
+        if baseline is not None:
+            self.check_regressions(baseline, results, options)
+
+    def load(self, path):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+
+    def meta(self, options):
+        return {
+            'mode': 'http' if options['target'] else 'client',
+            'target': options['target'],
+            'requests': options['requests'],
+            'concurrency': options['concurrency'] if options['target'] else 1,
+            'database': connection.vendor,
+            'rows': {
+                'employers': Employer.objects.count(), 'jobs': Job.objects.count(),
+                'applicants': Applicant.objects.count(), 'applications': Application.objects.count(),
+            },
+            'started_at': timezone.now().isoformat(),
+        }
+
+    # Test client
+
+    def call(self, client, request, fixtures):
+        headers = {}
+        if request.user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {fixtures.token(request.user)}'
+        response = client.generic(
+            request.method, request.path, data=request.body or '',
+            content_type=request.content_type, **headers,
+        )
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response.status_code
+
+    def run_client(self, endpoint, fixtures, options):
+        client = APIClient()
+        rollback = endpoint.method != 'GET' and not options['commit']
+        latencies, errors, queries = [], 0, 0
+        started = time.perf_counter()
+        for number in range(options['warmup'] + options['requests']):
+            request = endpoint.request(fixtures, number)
+            with ExitStack() as stack:
+                if rollback:
+                    stack.enter_context(transaction.atomic())
+                captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+                call_started = time.perf_counter()
+                status = self.call(client, request, fixtures)
+                latency = time.perf_counter() - call_started
+                if rollback:
+                    transaction.set_rollback(True)
+            if number < options['warmup']:
+                started = time.perf_counter()
+                continue
+            if status in endpoint.expect:
+                latencies.append(latency)
+            else:
+                errors += 1
+            queries = max(queries, sum(len(capture) for capture in captured))
+        return {**summarize(latencies, time.perf_counter() - started, errors), 'queries': queries}
+
+    # Over HTTP
+
+    def run_http(self, endpoint, fixtures, options):
+        parts = urlsplit(options['target'])
+        if parts.scheme != 'http':
+            raise CommandError("Only http:// targets are supported")
+        requests = [
+            self.encode(endpoint.request(fixtures, number), parts.netloc, fixtures)
+            for number in range(options['warmup'] + options['requests'])
+        ]
+        host, port = parts.hostname, parts.port or 80
+        return asyncio.run(self.drive(host, port, requests, endpoint, options))
+
+    def encode(self, request, netloc, fixtures):
+        body = (request.body or '').encode('utf-8')
+        lines = [f'{request.method} {request.path} HTTP/1.1', f'Host: {netloc}', 'Accept: application/json', 'Connection: close']
+        if request.user is not None:
+            lines.append(f'Authorization: Bearer {fixtures.token(request.user)}')
+        if body:
+            lines += [f'Content-Type: {request.content_type}', f'Content-Length: {len(body)}']
+        return '\r\n'.join(lines).encode('latin-1') + b'\r\n\r\n' + body
+
+    async def drive(self, host, port, requests, endpoint, options):
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def send(raw):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    reader, writer = await asyncio.open_connection(host, port)
+                    writer.write(raw)
+                    await writer.drain()
+                    response = await reader.read()
+                    writer.close()
+                    status = int(response.split(b' ', 2)[1])
+                except (OSError, ValueError, IndexError):
+                    status = None
+                return time.perf_counter() - started, status
+
+        for raw in requests[:options['warmup']]:
+            await send(raw)
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(send(raw) for raw in requests[options['warmup']:]))
+        elapsed = time.perf_counter() - started
+        latencies = [latency for latency, status in outcomes if status in endpoint.expect]
+        return {**summarize(latencies, elapsed, errors=len(outcomes) - len(latencies)), 'queries': None}
+
+    # Reporting
+
+    def write_table(self, results):
+        columns = ['requests', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries']
+        width = max(len(name) for name in results['endpoints']) + 2
+        self.stdout.write(f"{'':{width}}" + ''.join(f'{column:>10}' for column in columns))
+        for name, summary in results['endpoints'].items():
+            self.stdout.write(f'{name:{width}}' + ''.join(f'{str(summary[column]):>10}' for column in columns))
+
+    def check_regressions(self, baseline, results, options):
+        rows = compare(
+            baseline, results, threshold=options['threshold'], query_threshold=options['query_threshold'],
+            min_ms=options['min_ms'], metric=options['metric'],
+        )
+        regressions = [row for row in rows if row[4]]
+        for name, measure, before, after, _ in regressions:
+            self.stderr.write(self.style.ERROR(f"{name}: {measure} went from {before} to {after}"))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regressions against {options['compare']}")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']} ({len(rows)} measures compared)"))
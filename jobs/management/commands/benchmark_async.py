@@ -0,0 +1,162 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncRequestFactory, RequestFactory
+from django.urls import Resolver404, resolve
+
+from jobs.async_views import ASYNC_VIEWS
+from jobs.benchmarking import summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync (WSGI) and async (ASGI) read paths. By default both views are "
+        "called in-process; with --target, running servers are benchmarked over HTTP."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/v1/jobs/', help="Path to request (a job or employer read view)")
+        parser.add_argument('--requests', type=int, default=500, help="Requests per run")
+        parser.add_argument('--concurrency', type=int, default=100, help="Clients in flight at once")
+        parser.add_argument('--threads', type=int, default=8, help="Threads serving the sync view in-process")
+        parser.add_argument(
+            '--slow', type=float, default=0.0,
+            help="Seconds each client takes to send its request. In-process, the serving thread or "
+                 "coroutine waits this long, as a WSGI worker blocked on a slow socket would.",
+        )
+        parser.add_argument(
+            '--target', action='append', default=[], metavar='NAME=URL',
+            help="Benchmark a running server, e.g. wsgi=http://127.0.0.1:8000 (repeatable)",
+        )
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        if options['target']:
+            results = {}
+            for target in options['target']:
+                name, _, url = target.partition('=')
+                if not url:
+                    raise CommandError(f"--target must look like NAME=URL, not {target!r}")
+                results[name] = asyncio.run(self.run_http(url.rstrip('/') + options['path'], options))
+        else:
+            results = self.run_in_process(options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        columns = ['requests', 'errors', 'seconds', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+        self.stdout.write(f"{'':8}" + ''.join(f'{column:>10}' for column in columns))
+        for name, summary in results.items():
+            self.stdout.write(f'{name:8}' + ''.join(f'{str(summary[column]):>10}' for column in columns))
+
+    # In-process
+
+    def run_in_process(self, options):
+        path = options['path']
+        try:
+            match = resolve(path.split('?')[0])
+        except Resolver404:
+            raise CommandError(f"{path} does not resolve to a view")
+        sync_class = getattr(match.func, 'sync_view_class', None) or getattr(match.func, 'view_class', None)
+        if sync_class not in ASYNC_VIEWS:
+            raise CommandError(f"{path} is not one of the views with an async read path")
+        sync_view = sync_class.as_view()
+        async_view = ASYNC_VIEWS[sync_class].as_view()
+
+        # Both paths must produce the same response
+        sync_body = self.call_sync(sync_view, path, match.kwargs, 0)[1]
+        async_body = asyncio.run(self.call_async(async_view, path, match.kwargs, 0))[1]
+        if sync_body != async_body:
+            raise CommandError("The sync and async views returned different responses")
+
+        return {
+            'wsgi': asyncio.run(self.bench_sync(sync_view, path, match.kwargs, options)),
+            'asgi': asyncio.run(self.bench_async(async_view, path, match.kwargs, options)),
+        }
+
+    def call_sync(self, view, path, kwargs, slow):
+        response = view(RequestFactory().get(path), **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if slow:
+            time.sleep(slow)
+        return response.status_code, response.content
+
+    async def call_async(self, view, path, kwargs, slow):
+        response = await view(AsyncRequestFactory().get(path), **kwargs)
+        if slow:
+            await asyncio.sleep(slow)
+        return response.status_code, response.content
+
+    async def drive(self, call, options):
+        """
+        Keep ``--concurrency`` clients in flight until ``--requests`` are done.
+        Latency runs from when a client connects, so time spent waiting for a
+        free thread counts, as it would for a queued WSGI connection.
+        """
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def client():
+            async with semaphore:
+                started = time.perf_counter()
+                status = await call()
+                return time.perf_counter() - started, status
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(client() for _ in range(options['requests'])))
+        return self.summarize(outcomes, time.perf_counter() - started)
+
+    async def bench_sync(self, view, path, kwargs, options):
+        def serve():
+            try:
+                return self.call_sync(view, path, kwargs, options['slow'])[0]
+            finally:
+                connections.close_all()
+
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            return await self.drive(lambda: loop.run_in_executor(pool, serve), options)
+
+    async def bench_async(self, view, path, kwargs, options):
+        async def call():
+            return (await self.call_async(view, path, kwargs, options['slow']))[0]
+
+        return await self.drive(call, options)
+
+    # Over HTTP
+
+    async def run_http(self, url, options):
+        parts = urlsplit(url)
+        if parts.scheme != 'http':
+            raise CommandError("Only http:// targets are supported")
+        host, port = parts.hostname, parts.port or 80
+        target = parts.path + (f'?{parts.query}' if parts.query else '')
+        request_lines = [f'GET {target} HTTP/1.1', f'Host: {parts.netloc}', 'Accept: application/json', 'Connection: close']
+
+        async def call():
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+                # A slow client trickles its headers in over --slow seconds
+                for line in request_lines:
+                    writer.write(f'{line}\r\n'.encode('latin-1'))
+                    await writer.drain()
+                    if options['slow']:
+                        await asyncio.sleep(options['slow'] / len(request_lines))
+                writer.write(b'\r\n')
+                await writer.drain()
+                response = await reader.read()
+                writer.close()
+                return int(response.split(b' ', 2)[1])
+            except (OSError, ValueError, IndexError):
+                return None
+
+        return await self.drive(call, options)
+
+    def summarize(self, outcomes, elapsed):
+        latencies = [latency for latency, status in outcomes if status == 200]
+        return summarize(latencies, elapsed, errors=len(outcomes) - len(latencies))
@@ -0,0 +1,138 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from django.urls import Resolver404, resolve
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import force_authenticate
+
+from jobs.benchmarking import summarize
+from jobs.fastpath import FastPathListMixin
+from jobs.renderers import FastJSONRenderer
+
+# The response cache would answer every request after the first
+NO_CACHE = {'BACKEND': 'jobs.cache.NullCacheBackend'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare a list view's DRF serializers with its compiled fast path: check that both "
+        "return the same bytes, then time whole requests and serialization alone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/v1/jobs/?page_size=100', help="List path to request")
+        parser.add_argument('--user', help="Username to request as (application lists need one)")
+        parser.add_argument('--iterations', type=int, default=200, help="Runs of each path")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            match = resolve(path.split('?')[0])
+        except Resolver404:
+            raise CommandError(f"{path} does not resolve to a view")
+        view_class = getattr(match.func, 'sync_view_class', None) or getattr(match.func, 'view_class', None)
+        if view_class is None or not issubclass(view_class, FastPathListMixin):
+            raise CommandError(f"{path} is not a list view with a fast path")
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user {options['user']!r}")
+
+        def request():
+            request = RequestFactory().get(path)
+            if user is not None:
+                force_authenticate(request, user)
+            return request
+
+        view = view_class.as_view()
+        fast_views = [view_class.__name__]
+        with override_settings(JOBS_RESPONSE_CACHE=NO_CACHE):
+            # Both paths must produce the same response
+            with override_settings(JOBS_FAST_PATH=[]):
+                drf_body = self.call(view, request, match.kwargs)
+            with override_settings(JOBS_FAST_PATH=fast_views):
+                fast_body = self.call(view, request, match.kwargs)
+            if drf_body != fast_body:
+                raise CommandError("The DRF and fast paths returned different responses")
+
+            with override_settings(JOBS_FAST_PATH=fast_views):
+                drf_serialize, fast_serialize, rows = self.prepare_serialization(view_class, request(), match.kwargs)
+
+            results = {}
+            with override_settings(JOBS_FAST_PATH=[]):
+                results['request_drf'] = self.time(lambda: self.call(view, request, match.kwargs), options)
+            with override_settings(JOBS_FAST_PATH=fast_views):
+                results['request_fast'] = self.time(lambda: self.call(view, request, match.kwargs), options)
+            results['serialize_drf'] = self.time(drf_serialize, options)
+            results['serialize_fast'] = self.time(fast_serialize, options)
+
+        speedup = {
+            kind: round(results[f'{kind}_drf']['p50_ms'] / results[f'{kind}_fast']['p50_ms'], 2)
+            for kind in ('request', 'serialize')
+        }
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'path': path, 'bytes': len(fast_body), 'rows': rows, 'identical': True,
+                'results': results, 'speedup_p50': speedup,
+            }, indent=2))
+            return
+
+        self.stdout.write(f"{path}: {len(fast_body)} identical bytes from both paths, {rows} rows serialized")
+        columns = ['requests', 'seconds', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+        self.stdout.write(f"{'':16}" + ''.join(f'{column:>10}' for column in columns))
+        for name, summary in results.items():
+            self.stdout.write(f'{name:16}' + ''.join(f'{str(summary[column]):>10}' for column in columns))
+        for kind, factor in speedup.items():
+            self.stdout.write(f"{kind} speedup (p50): {factor}x")
+
+    def call(self, view, request, kwargs):
+        response = view(request(), **kwargs)
+        response.render()
+        if response.status_code != 200:
+            raise CommandError(f"The view answered {response.status_code}: {response.content[:200]!r}")
+        return response.content
+
+    def prepare_serialization(self, view_class, request, kwargs):
+        """
+        Serializing and rendering alone, from rows already fetched: model
+        instances through the view's serializer and JSONRenderer, against
+        value rows through the compiled serializer and FastJSONRenderer.
+        """
+        view = view_class()
+        view.setup(request, **kwargs)
+        view.format_kwarg = None
+        view.request = view.initialize_request(request, **kwargs)
+        view.initial(view.request, **kwargs)
+
+        compiled = view.get_compiled_serializer()
+        if compiled is None:
+            raise CommandError(f"The serializer of {view_class.__name__} cannot be compiled")
+        queryset = view.filter_queryset(view.get_queryset()).order_by('pk')
+        instances = list(queryset)
+        rows = list(view.get_fast_path_queryset(compiled, queryset))
+        drf_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+
+        def drf_serialize():
+            return drf_renderer.render(view.get_serializer(instances, many=True).data)
+
+        def fast_serialize():
+            return fast_renderer.render(view.get_fast_path_data(compiled, rows))
+
+        if drf_serialize() != fast_serialize():
+            raise CommandError("The DRF and compiled serializers rendered different output")
+        return drf_serialize, fast_serialize, len(rows)
+
+    def time(self, call, options):
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(options['iterations']):
+            call_started = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - call_started)
+        return summarize(latencies, time.perf_counter() - started)
@@ -0,0 +1,182 @@
+import gc
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PHASES = ['interpreter', 'setup', 'application', 'preload', 'first_request', 'second_request']
+
+
+def _request(application, path):
+    environ = {'PATH_INFO': path, 'wsgi.input': BytesIO(), 'HTTP_ACCEPT': 'application/json'}
+    setup_testing_defaults(environ)
+    statuses = []
+    body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b''.join(body)
+    body.close()
+    return int(statuses[0].split()[0])
+
+
+def _load(preload):
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+    if preload:
+        from jobs.preload import preload as warm
+
+        warm()
+    return application
+
+
+def _memory():
+    """This process's resident memory by kind, in kB, from /proc (Linux only)."""
+    try:
+        with open('/proc/self/smaps_rollup') as file:
+            fields = dict(line.split(':', 1) for line in file if ':' in line and not line[0].isdigit())
+    except OSError:
+        return None
+    value = lambda name: int(fields.get(name, '0 kB').split()[0])  # noqa: E731
+    return {
+        'rss': value('Rss'), 'pss': value('Pss'),
+        'private': value('Private_Clean') + value('Private_Dirty'),
+        'shared': value('Shared_Clean') + value('Shared_Dirty'),
+    }
+
+
+def cold_start(started, path):
+    """Run in a fresh interpreter: time each phase up to two requests, as wall-clock stamps."""
+    stamps = {'started': started, 'interpreter': time.time()}
+    import django
+
+    django.setup()
+    stamps['setup'] = time.time()
+    application = _load(preload=False)
+    stamps['application'] = time.time()
+    from jobs.preload import preload
+
+    preload()
+    stamps['preload'] = time.time()
+    statuses = [_request(application, path)]
+    stamps['first_request'] = time.time()
+    statuses.append(_request(application, path))
+    stamps['second_request'] = time.time()
+    print(json.dumps({
+        'stamps': stamps, 'statuses': statuses,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }))
+
+
+def forked_workers(workers, requests, path, preload):
+    """
+    Run in a fresh interpreter: fork ``workers`` processes like the server
+    does, with the application loaded before (``preload``) or in each, and
+    have each serve ``requests`` requests and report its memory.
+    """
+    import django
+
+    if preload:
+        gc.disable()
+        django.setup()
+        application = _load(preload=True)
+    children = []
+    for _ in range(workers):
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            gc.enable()
+            if not preload:
+                django.setup()
+                application = _load(preload=False)
+            statuses = {_request(application, path) for _ in range(requests)}
+            with os.fdopen(write, 'w') as pipe:
+                pipe.write(json.dumps({'memory': _memory(), 'statuses': sorted(statuses)}))
+            os._exit(0)
+        os.close(write)
+        children.append((pid, read))
+    reports = []
+    for pid, read in children:
+        with os.fdopen(read) as pipe:
+            reports.append(json.loads(pipe.read() or 'null'))
+        os.waitpid(pid, 0)
+    print(json.dumps({'workers': reports}))
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark server startup: time each phase of a cold start, from a fresh interpreter to its "
+        "second request, and with --workers the memory of forked workers with and without the "
+        "application preloaded in their parent (see jobs.preload and gunicorn.conf.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Cold starts to time")
+        parser.add_argument('--path', default='/api/v1/jobs/', help="What the requests ask for")
+        parser.add_argument('--workers', type=int, default=0, help="Forked workers whose memory to measure")
+        parser.add_argument('--requests', type=int, default=20, help="Requests each forked worker serves")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def run_child(self, call):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        script = (
+            "import time; started = time.time()\n"
+            "from jobs.management.commands import benchmark_startup\n"
+            f"benchmark_startup.{call}\n"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Startup run failed:\n{result.stderr}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        runs = [self.run_child(f"cold_start(started, {options['path']!r})") for _ in range(options['runs'])]
+        phases = {}
+        for run in runs:
+            stamps = run['stamps']
+            previous = stamps['started']
+            for phase in PHASES:
+                phases.setdefault(phase, []).append((stamps[phase] - previous) * 1000)
+                previous = stamps[phase]
+            phases.setdefault('total', []).append((previous - stamps['started']) * 1000)
+        results = {
+            'runs': len(runs),
+            'statuses': sorted({status for run in runs for status in run['statuses']}),
+            'median_ms': {phase: round(statistics.median(values), 1) for phase, values in phases.items()},
+            'max_rss_mb': round(statistics.median(run['max_rss_kb'] for run in runs) / 1024, 1),
+        }
+        if options['workers']:
+            for preload in (True, False):
+                reports = self.run_child(
+                    f"forked_workers({options['workers']}, {options['requests']}, {options['path']!r}, {preload})"
+                )['workers']
+                memories = [report['memory'] for report in reports if report and report['memory']]
+                results['preloaded' if preload else 'not_preloaded'] = {
+                    kind: round(statistics.mean(memory[kind] for memory in memories) / 1024, 1)
+                    for kind in ('rss', 'pss', 'private', 'shared')
+                } if memories else None
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"Cold start, median of {results['runs']} runs (responses: {results['statuses']}):")
+        for phase, value in results['median_ms'].items():
+            self.stdout.write(f"  {phase:16}{value:>10.1f} ms")
+        self.stdout.write(f"  {'max rss':16}{results['max_rss_mb']:>10.1f} MB")
+        for key, label in (('preloaded', "preloaded"), ('not_preloaded', "loaded in each worker")):
+            if results.get(key):
+                memory = results[key]
+                self.stdout.write(
+                    f"Per worker, {label}: {memory['private']} MB private, {memory['shared']} MB shared, "
+                    f"{memory['pss']} MB proportional"
+                )
+        self.stdout.write(self.style.SUCCESS(f"Ready to serve in {results['median_ms']['total']} ms"))
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.matching import applicant_index, job_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the candidate/job matching indexes from the database and write them to "
+        "JOBS_MATCHING_INDEX_DIR, where web processes load them instead of building their own. "
+        "Run it again now and then to recompute term weights."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--index', choices=['applicants', 'jobs'], help="Only this index (default: both)")
+        parser.add_argument('--output', help="Directory to write to (default: JOBS_MATCHING_INDEX_DIR)")
+
+    def handle(self, *args, **options):
+        directory = options['output'] or getattr(settings, 'JOBS_MATCHING_INDEX_DIR', None)
+        if not directory:
+            raise CommandError("Set JOBS_MATCHING_INDEX_DIR or pass --output")
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        for index in (applicant_index, job_index):
+            if options['index'] not in (None, index.name):
+                continue
+            index.rebuild()
+            path = directory / f'{index.name}.npz'
+            index.save(path)
+            self.stdout.write(f"{index.name}: {len(index)} documents")
+        self.stdout.write(self.style.SUCCESS(f"Matching indexes written to {directory}"))
@@ -0,0 +1,141 @@
+import re
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.urls import URLPattern
+from rest_framework.exceptions import APIException
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from jobs import urls as job_urls
+from jobs.pagination import KeysetPagination
+
+SEQUENTIAL_SCAN = {
+    'postgresql': re.compile(r"Seq Scan on (\w+)"),
+    # "SCAN jobs_job" is a full scan; "SCAN jobs_job USING INDEX ..." is not
+    'sqlite': re.compile(r"\bSCAN (\w+)(?! USING)(?:\s*$)", re.MULTILINE),
+}
+# Rows sorted rather than read in the order of an index
+SORT = {
+    'postgresql': re.compile(r"^\s*(?:->\s+)?(Sort)\s+\(", re.MULTILINE),
+    'sqlite': re.compile(r"\bUSE TEMP B-TREE FOR (?:RIGHT PART OF )?(ORDER BY)\b"),
+}
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN on the queryset behind every jobs API view and flag sequential scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Username to make the requests as (default: anonymous)")
+        parser.add_argument('--view', action='append', help="URL name of a view to explain (repeatable; default: all)")
+        parser.add_argument('--pk', type=int, default=1, help="Value for <pk> and <job_pk> URL arguments")
+        parser.add_argument('--query', default='', help="Query string to add to every request, e.g. 'job_type=CONTRACT'")
+        parser.add_argument('--analyze', action='store_true', help="Use EXPLAIN ANALYZE (PostgreSQL only)")
+        parser.add_argument(
+            '--no-seqscan', action='store_true',
+            help="Discourage sequential scans (PostgreSQL only) to check an index can serve each query "
+                 "even on tables small enough that the planner would rather scan them",
+        )
+        parser.add_argument(
+            '--no-sort', action='store_true',
+            help="Also flag queries that sort their rows rather than read them in the order of an index",
+        )
+        parser.add_argument('--fail', action='store_true', help="Exit non-zero if any sequential scan (or sort) is found")
+
+    def handle(self, *args, **options):
+        user = AnonymousUser()
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['user']!r}")
+
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options['analyze'] = True
+        scan_pattern = SEQUENTIAL_SCAN.get(connection.vendor)
+        sort_pattern = SORT.get(connection.vendor) if options['no_sort'] else None
+
+        flagged = []
+        with transaction.atomic():
+            if options['no_seqscan'] and connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for pattern in job_urls.urlpatterns:
+                if options['view'] and getattr(pattern, 'name', None) not in options['view']:
+                    continue
+                queryset = self.get_view_queryset(pattern, user, options)
+                if queryset is None:
+                    continue
+                plan = queryset.explain(**explain_options)
+                scans = scan_pattern.findall(plan) if scan_pattern else []
+
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{pattern.name} ({pattern.pattern})"))
+                self.stdout.write(plan)
+                if scans:
+                    flagged.append(pattern.name)
+                    self.stdout.write(self.style.WARNING(f"  sequential scan on: {', '.join(sorted(set(scans)))}"))
+                if sort_pattern and sort_pattern.search(plan):
+                    flagged.append(pattern.name)
+                    self.stdout.write(self.style.WARNING("  rows sorted outside an index"))
+                self.stdout.write("")
+
+            # EXPLAIN ANALYZE executes the statement; never keep its effects
+            transaction.set_rollback(True)
+
+        if flagged:
+            message = f"Sequential scans{' or sorts' if sort_pattern else ''} in: {', '.join(dict.fromkeys(flagged))}"
+            if options['fail']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS("No sequential scans found"))
+
+    def get_view_queryset(self, pattern, user, options):
+        """
+        Build the queryset a GET on ``pattern`` would run, including the
+        ordering and LIMIT the paginator adds for list views.
+        """
+        if not isinstance(pattern, URLPattern):
+            return None
+        # Async views wrap a DRF view that holds the queryset
+        view_class = getattr(pattern.callback, 'sync_view_class', None) or getattr(pattern.callback, 'view_class', None)
+        if view_class is None or not hasattr(view_class, 'get_queryset'):
+            return None
+
+        kwargs = {name: options['pk'] for name in pattern.pattern.converters}
+        path = '/' + str(pattern.pattern)
+        for name, value in kwargs.items():
+            path = path.replace(f'<int:{name}>', str(value))
+        if options['query']:
+            path += '?' + options['query']
+
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, user=user)
+        view = view_class()
+        view.setup(request, **kwargs)
+        view.request = view.initialize_request(request, **kwargs)
+        view.format_kwarg = None
+
+        lookup = view.lookup_url_kwarg or view.lookup_field
+        if lookup not in kwargs and not hasattr(view, 'list'):
+            # Profile views resolve their object from request.user in get_object
+            return None
+
+        try:
+            view.check_permissions(view.request)
+            queryset = view.filter_queryset(view.get_queryset())
+        except APIException as exc:
+            self.stdout.write(self.style.NOTICE(f"{pattern.name}: skipped ({exc.detail})"))
+            return None
+
+        if lookup in kwargs:
+            return queryset.filter(**{view.lookup_field: kwargs[lookup]})
+
+        paginator = getattr(view, 'paginator', None)
+        if isinstance(paginator, KeysetPagination):
+            return paginator.get_page_queryset(queryset, view.request, view)
+        if paginator is not None:
+            return queryset[:paginator.get_page_size(view.request) or 1]
+        return queryset
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from jobs import bulk
+from jobs.models import Job
+
+from .import_jobs import get_employer
+
+
+class Command(BaseCommand):
+    help = "Stream jobs out as CSV or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employer', help="Employer id or username (default: every job)")
+        parser.add_argument('--format', choices=bulk.FORMATS, default='csv')
+        parser.add_argument('--output', help="File to write (default: stdout)")
+        parser.add_argument('--chunk-size', type=int, help="Rows fetched from the database at a time")
+
+    def handle(self, *args, **options):
+        queryset = Job.objects.all()
+        if options['employer']:
+            queryset = queryset.filter(employer=get_employer(options['employer']))
+
+        chunks = bulk.export_jobs(queryset, options['format'], chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
+        else:
+            self.stdout.writelines(chunks)
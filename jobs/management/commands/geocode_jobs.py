@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from jobs.geo import geocode_jobs
+from jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = "Geocode jobs from their location text again, e.g. after changing the geocoder or gazetteer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_ids', nargs='*', type=int, help="Jobs to geocode (default: all)")
+        parser.add_argument('--missing', action='store_true', help="Only jobs without coordinates")
+        parser.add_argument('--batch-size', type=int, default=500, help="Jobs updated per query")
+
+    def handle(self, *args, **options):
+        queryset = Job.objects.all()
+        if options['job_ids']:
+            queryset = queryset.filter(pk__in=options['job_ids'])
+        if options['missing']:
+            queryset = queryset.filter(geohash__isnull=True)
+        total = queryset.count()
+        located = geocode_jobs(queryset, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Located {located} of {total} jobs"))
@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs import bulk
+from jobs.models import Employer
+
+
+def get_employer(value):
+    lookup = {'pk': value} if value.isdigit() else {'user__username': value}
+    try:
+        return Employer.objects.get(**lookup)
+    except Employer.DoesNotExist:
+        raise CommandError(f"No employer with id or username {value!r}")
+
+
+class Command(BaseCommand):
+    help = "Bulk-create jobs for an employer from a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('employer', help="Employer id or username")
+        parser.add_argument('path', help="File to import, or - for stdin")
+        parser.add_argument('--format', choices=bulk.FORMATS, help="Defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, help="Rows validated and inserted per batch")
+
+    def handle(self, *args, **options):
+        employer = get_employer(options['employer'])
+        fmt = options['format'] or bulk.guess_format(name=options['path'])
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format")
+
+        if options['path'] == '-':
+            report = self.run(sys.stdin.buffer, fmt, employer, options)
+        else:
+            with open(options['path'], 'rb') as stream:
+                report = self.run(stream, fmt, employer, options)
+
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} of {report['rows']} jobs ({len(report['errors'])} rejected)"
+        ))
+
+    def run(self, stream, fmt, employer, options):
+        return bulk.import_jobs(bulk.read_rows(stream, fmt), employer, batch_size=options['batch_size'])
@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.diagnostics import log_files, log_path, read_log, summarize
+
+SORT_KEYS = {
+    'problems': lambda view: (view['repeated'] + view['slow'], view['p95_db_ms']),
+    'queries': lambda view: (view['max_queries'], view['mean_queries']),
+    'db': lambda view: (view['p95_db_ms'], view['mean_db_ms']),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarize the query diagnostics log (see jobs.diagnostics): the views with the most N+1 "
+        "and slow queries, queries per request or database time, and where their problems come from."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help="Log file (default: JOBS_QUERY_LOG); the files of each process and their rotated backups are read")
+        parser.add_argument('--sort', default='problems', choices=sorted(SORT_KEYS), help="What makes a view worse")
+        parser.add_argument('--limit', type=int, default=10, help="Views to show")
+        parser.add_argument('--route', action='append', default=[], help="Only these URL names (repeatable)")
+        parser.add_argument('--stacks', action='store_true', help="Show the stack of each problem")
+        parser.add_argument('--json', action='store_true', help="Print the summaries as JSON")
+
+    def handle(self, *args, **options):
+        path = options['log'] or log_path()
+        if not log_files(path):
+            raise CommandError(f"No query log at {path}; run with JOBS_QUERY_DIAGNOSTICS on first")
+        entries = read_log(path)
+        if options['route']:
+            entries = (entry for entry in entries if entry['route'] in options['route'])
+        views = sorted(summarize(entries), key=SORT_KEYS[options['sort']], reverse=True)[:options['limit']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(views, indent=2))
+            return
+        for view in views:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{view['method']} {view['route']}"))
+            self.stdout.write(
+                f"  {view['requests']} requests, {view['mean_queries']} queries on average ({view['max_queries']} at most), "
+                f"{view['mean_db_ms']} ms in the database on average ({view['p95_db_ms']} ms p95)"
+            )
+            for problem in view['problems']:
+                if problem['kind'] == 'repeated':
+                    what = f"N+1, up to {problem['max_count']} times"
+                else:
+                    what = f"slow, up to {problem['max_ms']} ms"
+                self.stdout.write(self.style.WARNING(
+                    f"  {what} in {problem['requests']} requests, from {problem['field'] or 'outside a serializer field'}:"
+                ))
+                self.stdout.write(f"    {problem['fingerprint']}")
+                if options['stacks']:
+                    for frame in problem['stack']:
+                        self.stdout.write(f"      {frame}")
+        problems = sum(view['repeated'] + view['slow'] for view in views)
+        self.stdout.write(self.style.SUCCESS(f"{len(views)} views shown, with {problems} distinct problem queries"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from jobs.models import Job
+from jobs.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recount the per-job application counters from the applications themselves"
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_ids', nargs='*', type=int, help="Jobs to recount (default: all)")
+        parser.add_argument('--batch-size', type=int, default=500, help="Jobs recounted per query")
+
+    def handle(self, *args, **options):
+        job_ids = None
+        if options['job_ids']:
+            job_ids = list(Job.objects.filter(pk__in=options['job_ids']).values_list('pk', flat=True))
+        count = rebuild_stats(job_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Recounted applications for {count} jobs"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from jobs.facets import rebuild_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the JobFacetCount summary of published jobs per job type, location and salary "
+        "band, e.g. after changing JOBS_SALARY_BANDS"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Groups inserted per query")
+
+    def handle(self, *args, **options):
+        count = rebuild_counts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Counted published jobs in {count} facet groups"))
@@ -0,0 +1,32 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.lifecycle import check_cache, run_lifecycle
+
+
+class Command(BaseCommand):
+    help = "Publish drafts whose publish_at has come and close jobs whose deadline has passed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep running every --interval seconds")
+        parser.add_argument('--interval', type=float, help="Seconds between runs (default: JOBS_LIFECYCLE_SECONDS)")
+        parser.add_argument('--batch-size', type=int, help="Jobs changed per UPDATE (default: JOBS_LIFECYCLE_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or getattr(settings, 'JOBS_LIFECYCLE_SECONDS', 60) or 60
+        stop = threading.Event()
+        # Finish the batch in hand before exiting
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+        check_cache()
+        while not stop.is_set():
+            counts = run_lifecycle(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Published {counts['published']} scheduled jobs and closed {counts['closed']} expired ones"
+            ))
+            if not options['loop']:
+                break
+            stop.wait(interval)
@@ -0,0 +1,22 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from jobs.tasks import Worker
+
+
+class Command(BaseCommand):
+    help = "Run background tasks (such as resume processing) from the database queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help="Tasks run at once (default: JOBS_WORKER_CONCURRENCY)")
+        parser.add_argument('--poll-interval', type=float, help="Seconds to wait when the queue is empty")
+        parser.add_argument('--once', action='store_true', help="Exit once no task is due instead of polling")
+
+    def handle(self, *args, **options):
+        worker = Worker(concurrency=options['concurrency'], poll_interval=options['poll_interval'])
+        # Finish the tasks in hand before exiting
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: worker.stop())
+        self.stdout.write(f"Worker {worker.name} running {worker.concurrency} threads")
+        worker.run(once=options['once'])
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.seeding import DEFAULT_PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic employers, jobs, applicants and applications for "
+        "benchmarks (see jobs.seeding). Users are named <prefix>-employer-N and <prefix>-applicant-N."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employers', type=int, default=100)
+        parser.add_argument('--jobs', type=int, default=5000)
+        parser.add_argument('--applicants', type=int, default=2000)
+        parser.add_argument('--applications', type=int, default=20000)
+        parser.add_argument('--prefix', default='seed', help="Username prefix; must not be in use")
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help="Password of every seeded user")
+        parser.add_argument('--random-seed', type=int, default=0, help="The same seed gives the same data")
+        parser.add_argument('--batch-size', type=int, help="Rows per INSERT (default: JOBS_BULK_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            counts = seed(
+                employers=options['employers'], jobs=options['jobs'],
+                applicants=options['applicants'], applications=options['applications'],
+                prefix=options['prefix'], password=options['password'],
+                random_seed=options['random_seed'], batch_size=options['batch_size'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['employers']} employers, {counts['jobs']} jobs, {counts['applicants']} applicants "
+            f"and {counts['applications']} applications in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,602 @@
+"""
+Candidate–job matching on TF-IDF vectors.
+
+Applicant profiles (skills, experience, education and resume text) and
+published jobs (title, requirements, description) are tokenized as for
+search, weighted by field, and turned into sublinear TF-IDF vectors cut to
+their ``MAX_TERMS`` strongest terms and L2-normalized. A job is matched
+against the applicant index and a profile against the job index by cosine
+similarity.
+
+Each index is a base segment, a compressed sparse column matrix held in
+NumPy arrays, plus a delta of the documents saved since it was built, kept
+as growing arrays of entries. Scoring walks the columns of the query's terms in one
+vectorized pass and takes the top k with a partial sort. Once the delta
+outgrows a fraction of the base the two are merged into a new base, off
+the request path.
+
+Indexes are per process, loaded at startup (see jobs.preload) from the
+snapshots that ``manage.py build_matching_index`` writes to
+``JOBS_MATCHING_INDEX_DIR``, or else built from the database. A process
+that did not preload them builds them in a thread once first queried, and
+answers 503 until they are ready rather than building in a request.
+Saves seen by this process apply at once; those made by other processes
+(the resume worker, other web workers) are picked up by ``updated_at`` at
+most every ``JOBS_MATCHING_REFRESH_SECONDS``.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+from array import array
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import Applicant, Application, Job
+from .search import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Field weights: a skill or requirement counts for more than a word in a
+# resume or description
+APPLICANT_FIELDS = {'skills': 1.0, 'experience': 0.6, 'education': 0.3, 'resume_text': 0.3}
+JOB_FIELDS = {'title': 1.0, 'requirements': 1.0, 'description': 0.3}
+
+# Terms kept per document, strongest first. Pruning drops common words from
+# most documents, which keeps their columns, and so queries, short
+MAX_TERMS = 32
+
+
+def document_terms(values, weights):
+    """Field-weighted counts of the tokens in ``values``."""
+    terms = defaultdict(float)
+    for text, weight in zip(values, weights):
+        for token in tokenize(text):
+            terms[token] += weight
+    return terms
+
+
+def _idf(df, documents):
+    return np.log((1.0 + documents) / (1.0 + df)) + 1.0
+
+
+class Segment:
+    """
+    Documents as a compressed sparse column matrix: for term ``col`` the
+    rows holding it are ``rows[indptr[col]:indptr[col + 1]]``, with their
+    ``weights``. ``ids`` (sorted) are the primary keys of the rows.
+    """
+
+    def __init__(self, ids, indptr, rows, weights):
+        self.ids = ids
+        self.indptr = indptr
+        self.rows = rows
+        self.weights = weights
+
+    @classmethod
+    def from_coo(cls, ids, rows, cols, weights, columns):
+        order = np.argsort(cols, kind='stable')
+        indptr = np.zeros(columns + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=columns), out=indptr[1:])
+        return cls(ids, indptr, rows[order], weights[order])
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros(0, np.int64), np.zeros(1, np.int64), np.zeros(0, np.int32), np.zeros(0, np.float32))
+
+    def to_coo(self):
+        cols = np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int32), np.diff(self.indptr))
+        return self.rows, cols, self.weights
+
+    def row_of(self, pk):
+        row = int(np.searchsorted(self.ids, pk))
+        return row if row < len(self.ids) and self.ids[row] == pk else None
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class Delta:
+    """
+    Documents indexed since the base was built, as growing arrays of
+    ``(document, column, weight)`` entries. Replacing or removing a document
+    zeroes its entries.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.rows = {}
+        self.spans = []
+        self.docs = np.zeros(0, np.int32)
+        self.cols = np.zeros(0, np.int32)
+        self.weights = np.zeros(0, np.float32)
+        self.size = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, pk, cols, weights):
+        end = self.size + len(cols)
+        if end > len(self.cols):
+            capacity = max(end, 2 * len(self.cols), 1024)
+            self.docs, self.cols, self.weights = (
+                np.concatenate([array, np.zeros(capacity - len(array), array.dtype)])
+                for array in (self.docs, self.cols, self.weights)
+            )
+        row = len(self.ids)
+        self.docs[self.size:end] = row
+        self.cols[self.size:end] = cols
+        self.weights[self.size:end] = weights
+        self.ids.append(pk)
+        self.spans.append((self.size, end))
+        self.rows[pk] = row
+        self.size = end
+
+    def document(self, row):
+        start, end = self.spans[row]
+        return self.cols[start:end], self.weights[start:end]
+
+    def discard(self, pk):
+        """The columns of ``pk``'s document, now zeroed, or None if it has none here."""
+        row = self.rows.pop(pk, None)
+        if row is None:
+            return None
+        start, end = self.spans[row]
+        self.weights[start:end] = 0
+        return self.cols[start:end]
+
+    def scores(self, cols, weights, columns):
+        dense = np.zeros(columns, np.float32)
+        dense[cols] = weights
+        size = self.size
+        return np.bincount(
+            self.docs[:size], dense[self.cols[:size]] * self.weights[:size], minlength=len(self.ids),
+        )
+
+
+class IndexNotReady(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Recommendations are still being prepared; try again shortly."
+    default_code = 'index_not_ready'
+
+
+class MatchingIndex:
+    """
+    The TF-IDF vectors of one model's documents: rows of ``model`` matching
+    ``filters``, made of ``fields`` with their weights.
+    """
+    # The delta is merged into the base, in a background thread, once it
+    # holds this fraction of it
+    merge_fraction = 0.02
+    min_merge = 1000
+    merge_in_background = True
+    batch_size = 2000
+
+    def __init__(self, name, model, fields, filters=None):
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self.filters = filters or {}
+        self._lock = threading.RLock()
+        self._builder = None
+        self._reset()
+
+    def _reset(self):
+        self._built = False
+        self._vocabulary = {}
+        self._df = np.zeros(0, np.int64)
+        self._base = Segment.empty()
+        # Base rows replaced or removed since the base was built
+        self._dead = set()
+        self._delta = Delta()
+        # Documents changed while a merge is under way
+        self._changed = None
+        self._loaded_at = None
+        self._watermark = None
+
+    @property
+    def refresh_interval(self):
+        return getattr(settings, 'JOBS_MATCHING_REFRESH_SECONDS', 60)
+
+    @property
+    def snapshot_path(self):
+        directory = getattr(settings, 'JOBS_MATCHING_INDEX_DIR', None)
+        return Path(directory) / f'{self.name}.npz' if directory else None
+
+    def _rows(self, queryset):
+        return queryset.filter(**self.filters).values_list('pk', *self.fields).iterator(chunk_size=self.batch_size)
+
+    def terms_of(self, instance):
+        return document_terms([getattr(instance, name) for name in self.fields], self.fields.values())
+
+    # Building
+
+    def build(self):
+        """Load the index from its snapshot, or else build it from the database."""
+        path = self.snapshot_path
+        if path is not None and path.exists():
+            self.load(path)
+        else:
+            self._build()
+
+    def build_in_background(self):
+        """Start building the index in a thread, unless it is built or being built."""
+        with self._lock:
+            if self._built or self._builder is not None:
+                return
+            self._builder = threading.Thread(target=self._build_in_thread, name=f'matching-build-{self.name}', daemon=True)
+            self._builder.start()
+
+    def _build_in_thread(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception("Building the %s matching index failed", self.name)
+        finally:
+            with self._lock:
+                self._builder = None
+            connections.close_all()
+
+    def _ensure_built(self):
+        if not self._built:
+            self.build_in_background()
+            raise IndexNotReady()
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self.refresh()
+
+    def _build(self):
+        watermark = timezone.now()
+        weights = list(self.fields.values())
+        vocabulary = {}
+        ids, rows, cols, counts = array('q'), array('i'), array('i'), array('f')
+        for pk, *values in self._rows(self.model._default_manager.order_by('pk')):
+            terms = document_terms(values, weights)
+            if not terms:
+                continue
+            row = len(ids)
+            ids.append(pk)
+            for term, count in terms.items():
+                rows.append(row)
+                cols.append(vocabulary.setdefault(term, len(vocabulary)))
+                counts.append(count)
+        self._install(
+            np.frombuffer(ids, np.int64).copy(), np.frombuffer(rows, np.int32), np.frombuffer(cols, np.int32),
+            np.frombuffer(counts, np.float32), vocabulary, watermark,
+        )
+
+    def _install(self, ids, rows, cols, counts, vocabulary, watermark):
+        """Make the base from every document's ``(row, col, count)`` entries."""
+        idf = _idf(np.bincount(cols, minlength=len(vocabulary)), len(ids)).astype(np.float32)
+        weights = np.log1p(counts) * idf[cols]
+
+        # Each row's MAX_TERMS heaviest entries, L2-normalized
+        order = np.lexsort((-weights, rows))
+        rows, cols, weights = rows[order], cols[order], weights[order]
+        starts = np.searchsorted(rows, np.arange(len(ids), dtype=np.int32))
+        keep = np.arange(len(rows)) - starts[rows] < MAX_TERMS
+        rows, cols, weights = rows[keep], cols[keep], weights[keep]
+        norms = np.sqrt(np.bincount(rows, weights * weights, minlength=len(ids))).astype(np.float32)
+        base = Segment.from_coo(ids, rows, cols, weights / norms[rows], len(vocabulary))
+
+        with self._lock:
+            self._reset()
+            self._vocabulary = vocabulary
+            self._df = np.diff(base.indptr)
+            self._base = base
+            self._built = True
+            self._loaded_at = time.monotonic()
+            self._watermark = watermark
+
+    def save(self, path):
+        """Write the index, merged, to ``path`` (an .npz file) for other processes to load."""
+        if not self._built:
+            self.build()
+        self.merge(background=False)
+        with self._lock:
+            base, watermark = self._base, self._watermark
+            terms = sorted(self._vocabulary, key=self._vocabulary.get)[:len(base.indptr) - 1]
+        partial = Path(f'{path}.partial')
+        with open(partial, 'wb') as file:
+            np.savez(
+                file, ids=base.ids, indptr=base.indptr, rows=base.rows, weights=base.weights,
+                vocabulary=np.frombuffer(json.dumps(terms).encode('utf-8'), np.uint8),
+                watermark=np.array(watermark.isoformat()),
+            )
+        os.replace(partial, path)
+
+    def load(self, path):
+        """Take the base from a file written by ``save``. Rows changed since are refreshed on next use."""
+        with np.load(path) as data:
+            terms = json.loads(data['vocabulary'].tobytes().decode('utf-8'))
+            base = Segment(data['ids'], data['indptr'], data['rows'], data['weights'])
+            watermark = datetime.fromisoformat(str(data['watermark']))
+        with self._lock:
+            self._reset()
+            self._vocabulary = {term: col for col, term in enumerate(terms)}
+            self._df = np.diff(base.indptr)
+            self._base = base
+            self._built = True
+            self._watermark = watermark
+
+    def __len__(self):
+        return len(self._base) - len(self._dead) + len(self._delta)
+
+    def _vector(self, terms, grow=False):
+        """A document's (or query's) columns and normalized weights."""
+        cols, counts = [], []
+        for term, count in terms.items():
+            col = self._vocabulary.get(term)
+            if col is None:
+                if not grow:
+                    continue
+                col = self._vocabulary[term] = len(self._vocabulary)
+            cols.append(col)
+            counts.append(count)
+        cols = np.array(cols, np.int32)
+        if grow and len(self._vocabulary) > len(self._df):
+            self._df = np.concatenate([self._df, np.zeros(max(len(self._vocabulary) - len(self._df), 1024), np.int64)])
+        df = self._df[cols] + grow
+        weights = np.log1p(np.array(counts, np.float32)) * _idf(df, len(self) + grow).astype(np.float32)
+        if len(cols) > MAX_TERMS:
+            strongest = np.argpartition(-weights, MAX_TERMS)[:MAX_TERMS]
+            cols, weights = cols[strongest], weights[strongest]
+        norm = math.sqrt(float(weights @ weights))
+        return cols, (weights / norm if norm else weights).astype(np.float32)
+
+    # Changes
+
+    def _discard(self, pk):
+        if self._changed is not None:
+            self._changed.add(pk)
+        cols = self._delta.discard(pk)
+        if cols is not None:
+            self._df[cols] -= 1
+            return
+        row = self._base.row_of(pk)
+        if row is not None:
+            # Its document frequencies are recounted at the next merge
+            self._dead.add(row)
+
+    def _add(self, pk, terms):
+        self._discard(pk)
+        if terms:
+            cols, weights = self._vector(terms, grow=True)
+            self._df[cols] += 1
+            self._delta.add(pk, cols, weights)
+
+    def _includes(self, instance):
+        return all(getattr(instance, name) == value for name, value in self.filters.items())
+
+    def index_instance(self, instance):
+        """Index (or unindex) a saved instance; nothing to do before the first build."""
+        if not self._built:
+            return
+        with self._lock:
+            if self._includes(instance):
+                self._add(instance.pk, self.terms_of(instance))
+            else:
+                self._discard(instance.pk)
+        self._maybe_merge()
+
+    def index(self, pks):
+        """Index the rows ``pks`` as they are in the database."""
+        if not self._built:
+            return
+        pks = set(pks)
+        weights = list(self.fields.values())
+        with self._lock:
+            for pk, *values in self._rows(self.model._default_manager.filter(pk__in=pks)):
+                self._add(pk, document_terms(values, weights))
+                pks.discard(pk)
+            for pk in pks:
+                self._discard(pk)
+        self._maybe_merge()
+
+    def remove(self, pks):
+        with self._lock:
+            for pk in pks:
+                self._discard(pk)
+        self._maybe_merge()
+
+    def refresh(self):
+        """Index the rows other processes have changed since the last refresh."""
+        with self._lock:
+            if not self._built:
+                return
+            # Overlap the last refresh, for transactions committed late
+            since = self._watermark - timedelta(seconds=self.refresh_interval)
+            self._watermark = timezone.now()
+            self._loaded_at = time.monotonic()
+            changed = self.model._default_manager.filter(updated_at__gte=since).values_list('pk', flat=True)
+            self.index(changed.iterator(chunk_size=self.batch_size))
+
+    def _maybe_merge(self):
+        with self._lock:
+            # Counting replaced entries too, so one document saved over and over still merges
+            pending = max(len(self._delta) + len(self._dead), self._delta.size // MAX_TERMS)
+            due = self._changed is None and pending > max(self.min_merge, self.merge_fraction * len(self._base))
+        if due:
+            self.merge(background=self.merge_in_background)
+
+    def merge(self, background=False):
+        """
+        Fold the delta into a new base without the replaced rows. Queries and
+        changes carry on against the old base meanwhile; documents changed
+        during the merge are carried over into the new delta.
+        """
+        with self._lock:
+            if self._changed is not None:
+                return
+            self._changed = set()
+            delta = self._delta
+            state = (
+                self._base, list(self._dead), list(delta.ids), sorted(delta.rows.values()),
+                (delta.docs[:delta.size], delta.cols[:delta.size], delta.weights[:delta.size]),
+                len(self._vocabulary),
+            )
+        if background:
+            threading.Thread(target=self._merge, args=state, name=f'matching-merge-{self.name}', daemon=True).start()
+        else:
+            self._merge(*state)
+
+    def _merge(self, base, dead, delta_ids, live, entries, columns):
+        try:
+            rows, cols, weights = base.to_coo()
+            alive = np.ones(len(base), bool)
+            alive[dead] = False
+            base_rows = np.flatnonzero(alive)
+            delta_rows = np.array(live, np.int64)
+            ids = np.concatenate([base.ids[base_rows], np.array(delta_ids, np.int64)[delta_rows]])
+            # The new row of each kept base row and delta document, in id order
+            order = np.argsort(ids, kind='stable')
+            position = np.empty(len(order), np.int32)
+            position[order] = np.arange(len(order), dtype=np.int32)
+            base_map = np.full(len(base), -1, np.int32)
+            base_map[base_rows] = position[:len(base_rows)]
+            delta_map = np.full(len(delta_ids), -1, np.int32)
+            delta_map[delta_rows] = position[len(base_rows):]
+
+            keep = base_map[rows] >= 0
+            delta_docs, delta_cols, delta_weights = entries
+            delta_keep = delta_map[delta_docs] >= 0
+            merged = Segment.from_coo(
+                ids[order],
+                np.concatenate([base_map[rows[keep]], delta_map[delta_docs[delta_keep]]]),
+                np.concatenate([cols[keep], delta_cols[delta_keep]]),
+                np.concatenate([weights[keep], delta_weights[delta_keep]]),
+                columns,
+            )
+        except BaseException:
+            with self._lock:
+                self._changed = None
+            raise
+
+        with self._lock:
+            if self._base is not base or self._changed is None:
+                # Rebuilt or cleared in the meantime
+                return
+            df = np.zeros(len(self._df), np.int64)
+            df[:columns] = np.diff(merged.indptr)
+            carried = Delta()
+            for pk, row in self._delta.rows.items():
+                if row >= len(delta_ids):
+                    cols, weights = self._delta.document(row)
+                    carried.add(pk, cols, weights)
+                    df[cols] += 1
+            self._dead = {row for row in map(merged.row_of, self._changed) if row is not None}
+            self._base, self._delta, self._df = merged, carried, df
+            self._changed = None
+
+    def rebuild(self):
+        with self._lock:
+            self._build()
+
+    def clear(self):
+        """Drop the index; the next query starts building (or loading) it again."""
+        with self._lock:
+            self._reset()
+
+    # Queries
+
+    def query(self, terms, limit, exclude=()):
+        """
+        The ``limit`` best ``(pk, score)`` matches for ``terms``, best first.
+        Raises IndexNotReady until the index is built.
+        """
+        self._ensure_built()
+        exclude = set(exclude)
+        with self._lock:
+            cols, weights = self._vector(terms)
+            base = self._base
+            dead = list(self._dead)
+            hits = []
+            if len(self._delta):
+                scores = self._delta.scores(cols, weights, len(self._vocabulary))
+                scores[[self._delta.rows[pk] for pk in exclude if pk in self._delta.rows]] = 0
+                hits = _top(scores, self._delta.ids, limit)
+
+        scores = np.zeros(len(base), np.float32)
+        columns = len(base.indptr) - 1
+        for col, weight in zip(cols.tolist(), weights.tolist()):
+            # Terms first seen since the base was built are only in the delta
+            if col < columns:
+                start, end = base.indptr[col], base.indptr[col + 1]
+                # A column holds each row once, so fancy-indexed += adds correctly
+                scores[base.rows[start:end]] += weight * base.weights[start:end]
+        dead.extend(row for row in map(base.row_of, exclude) if row is not None)
+        scores[dead] = 0
+        hits.extend(_top(scores, base.ids, limit))
+        hits.sort(key=lambda hit: (-hit[1], hit[0]))
+        return [(pk, round(score, 4)) for pk, score in hits[:limit]]
+
+
+def _top(scores, ids, limit):
+    """The ``limit`` highest positive ``scores`` with the ids of their rows."""
+    top = np.argpartition(-scores, limit)[:limit] if limit < len(scores) else np.arange(len(scores))
+    top = top[scores[top] > 0]
+    return [(int(ids[row]), score) for row, score in zip(top.tolist(), scores[top].tolist())]
+
+
+applicant_index = MatchingIndex('applicants', Applicant, APPLICANT_FIELDS)
+job_index = MatchingIndex('jobs', Job, JOB_FIELDS, filters={'status': 'PUBLISHED'})
+
+
+def build_indexes():
+    """Load or build both indexes in this process, as at server startup."""
+    for index in (job_index, applicant_index):
+        index.build()
+
+
+def get_limit(params):
+    """The number of matches asked for with ``?limit=``."""
+    maximum = getattr(settings, 'JOBS_MATCHING_MAX_RESULTS', 100)
+    limit = params.get('limit') or getattr(settings, 'JOBS_MATCHING_RESULTS', 20)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = 0
+    if not 0 < limit <= maximum:
+        raise ValidationError({'limit': f"Must be a whole number from 1 to {maximum}"})
+    return limit
+
+
+def recommend_applicants(job, limit):
+    """Applicant profiles best matching ``job``, each with a ``score``."""
+    hits = applicant_index.query(job_index.terms_of(job), limit)
+    applicants = Applicant.objects.select_related('user').in_bulk([pk for pk, _ in hits])
+    return _scored(applicants, hits)
+
+
+def recommend_jobs(applicant, limit):
+    """
+    Published jobs best matching a profile, leaving out those applied to and
+    those past their deadline (which jobs.lifecycle has yet to close).
+    """
+    today = timezone.now().date()
+    applied = Application.objects.filter(applicant_id=applicant.user_id).values_list('job_id', flat=True)
+    expired = Job.objects.filter(status='PUBLISHED', deadline__lt=today).values_list('pk', flat=True)
+    hits = job_index.query(applicant_index.terms_of(applicant), limit, exclude=[*applied, *expired])
+    jobs = Job.objects.filter(status='PUBLISHED').exclude(deadline__lt=today).select_related('employer')
+    return _scored(jobs.in_bulk([pk for pk, _ in hits]), hits)
+
+
+def _scored(objects, hits):
+    # Rows deleted since they were indexed are dropped
+    results = []
+    for pk, score in hits:
+        instance = objects.get(pk)
+        if instance is not None:
+            instance.score = score
+            results.append(instance)
+    return results
+
@@ -0,0 +1,384 @@
+"""
+Per-route request metrics, served as Prometheus text at ``/metrics``.
+
+With ``JOBS_METRICS`` on, every request is counted by route name (the URL
+pattern's name, e.g. ``job-list``), method and status, and a sample of
+``JOBS_METRICS_SAMPLE_RATE`` of them is measured into histograms:
+
+- wall time, from the middleware in to the response out;
+- database queries and the time spent in them;
+- serialization: time in the view outside the database, which for these
+  views is chiefly serializers (validation included, on writes);
+- rendering of the response body, and its size.
+
+Sampled responses carry the same figures in a ``Server-Timing`` header
+unless ``JOBS_SERVER_TIMING`` is off. Histograms live in each process, so
+a scrape sees the worker that answered it.
+
+Queries are timed by a wrapper on every connection that does nothing
+outside a sampled request; requests that are not sampled cost one counter
+increment.
+
+The connection pools of databases configured with ``?pool=`` (see
+``database_from_url`` in the settings) are reported too: their size,
+connections in use and requests waiting for one, which near the maximum
+size mean the pool is saturated.
+"""
+import bisect
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Metrics of the sampled request being handled, if any
+_current = ContextVar('jobs_request_metrics', default=None)
+
+
+def enabled():
+    return getattr(settings, 'JOBS_METRICS', False)
+
+
+def sample_rate():
+    return getattr(settings, 'JOBS_METRICS_SAMPLE_RATE', 1.0)
+
+
+class Histogram:
+    """Counts of observations per bucket (not cumulative), their sum and count."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """
+    Histograms and counters by metric name and label values, and collectors
+    of metrics read when scraped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.collectors = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def increment(self, name, labels):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def collect(self, collector):
+        """
+        Add ``collector()``, returning ``(name, type, [(labels, value)])``
+        for each metric it reads; usable as a decorator.
+        """
+        self.collectors.append(collector)
+        return collector
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, (histogram.buckets, list(histogram.counts), histogram.sum, histogram.count))
+                for key, histogram in self.histograms.items()
+            )
+        lines = []
+        described = set()
+        for (name, labels), value in counters:
+            if name not in described:
+                described.add(name)
+                lines += [f'# HELP {name} {METRICS[name]}', f'# TYPE {name} counter']
+            lines.append(f'{name}{_labels(labels)} {value}')
+        for (name, labels), (buckets, counts, total, count) in histograms:
+            if name not in described:
+                described.add(name)
+                lines += [f'# HELP {name} {METRICS[name]}', f'# TYPE {name} histogram']
+            cumulative = 0
+            for bound, bucket_count in zip((*buckets, '+Inf'), counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_labels((*labels, ("le", str(bound))))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {round(total, 6)}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+        for collector in self.collectors:
+            for name, kind, samples in collector():
+                if samples:
+                    lines += [f'# HELP {name} {METRICS[name]}', f'# TYPE {name} {kind}']
+                lines += [f'{name}{_labels(labels)} {value}' for labels, value in samples]
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+METRICS = {
+    'jobs_requests_total': "Requests by route, method and status",
+    'jobs_request_duration_seconds': "Wall time of sampled requests",
+    'jobs_request_db_queries': "Database queries per sampled request",
+    'jobs_request_db_duration_seconds': "Time in database queries per sampled request",
+    'jobs_request_serialize_duration_seconds': "Time in the view outside the database per sampled request",
+    'jobs_request_render_duration_seconds': "Time rendering the response body per sampled request",
+    'jobs_response_size_bytes': "Body size of sampled responses",
+    'jobs_db_pool_min_size': "Connections the pool keeps open at least",
+    'jobs_db_pool_max_size': "Connections the pool opens at most",
+    'jobs_db_pool_size': "Connections open, in use or not",
+    'jobs_db_pool_in_use': "Connections lent out",
+    'jobs_db_pool_waiting': "Requests waiting for a connection",
+    'jobs_db_pool_requests_total': "Connections asked of the pool",
+    'jobs_db_pool_requests_queued_total': "Connections asked of the pool that had to wait",
+    'jobs_db_pool_wait_seconds_total': "Time spent waiting for a connection",
+    'jobs_db_pool_request_errors_total': "Connections asked of the pool that were not given in time",
+    'jobs_db_pool_connections_total': "Connections the pool opened",
+    'jobs_db_pool_connections_lost_total': "Connections found broken by health checks",
+    'jobs_db_pool_connection_errors_total': "Connection attempts that failed",
+}
+
+registry = Registry()
+
+# (metric, type, psycopg_pool statistic or None for in use, scale)
+POOL_METRICS = [
+    ('jobs_db_pool_min_size', 'gauge', 'pool_min', 1),
+    ('jobs_db_pool_max_size', 'gauge', 'pool_max', 1),
+    ('jobs_db_pool_size', 'gauge', 'pool_size', 1),
+    ('jobs_db_pool_in_use', 'gauge', None, 1),
+    ('jobs_db_pool_waiting', 'gauge', 'requests_waiting', 1),
+    ('jobs_db_pool_requests_total', 'counter', 'requests_num', 1),
+    ('jobs_db_pool_requests_queued_total', 'counter', 'requests_queued', 1),
+    ('jobs_db_pool_wait_seconds_total', 'counter', 'requests_wait_ms', 0.001),
+    ('jobs_db_pool_request_errors_total', 'counter', 'requests_errors', 1),
+    ('jobs_db_pool_connections_total', 'counter', 'connections_num', 1),
+    ('jobs_db_pool_connections_lost_total', 'counter', 'connections_lost', 1),
+    ('jobs_db_pool_connection_errors_total', 'counter', 'connections_errors', 1),
+]
+
+
+def database_pools():
+    """{alias: pool} of the connection pools this process has created."""
+    pools = {}
+    for alias in connections:
+        # Not connections[alias].pool, which would create one
+        pool = getattr(connections[alias], '_connection_pools', {}).get(alias)
+        if pool is not None:
+            pools[alias] = pool
+    return pools
+
+
+@registry.collect
+def pool_metrics():
+    """Size and usage of each database's connection pool in this process."""
+    stats = {alias: pool.get_stats() for alias, pool in database_pools().items()}
+    metrics = []
+    for name, kind, statistic, scale in POOL_METRICS:
+        samples = []
+        for alias, values in sorted(stats.items()):
+            if statistic is None:
+                value = values.get('pool_size', 0) - values.get('pool_available', 0)
+            else:
+                # Counters are left out until they first count
+                value = values.get(statistic, 0) * scale
+            samples.append(((('database', alias),), round(value, 6)))
+        metrics.append((name, kind, samples))
+    return metrics
+
+
+class RequestMetrics:
+    """What one sampled request spent, filled in as it runs."""
+    __slots__ = ('started', 'queries', 'db_seconds', 'view_started', 'view_db_seconds', 'view_ended', 'render_db_seconds')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.view_started = None
+        self.view_db_seconds = 0.0
+        self.view_ended = None
+        self.render_db_seconds = 0.0
+
+    def start_view(self):
+        self.view_started = time.perf_counter()
+        self.view_db_seconds = self.db_seconds
+
+    def end_view(self):
+        self.view_ended = time.perf_counter()
+        self.render_db_seconds = self.db_seconds
+
+    def phases(self, ended):
+        """``{phase: seconds}``; serialize and render only once the view ran."""
+        phases = {'db': self.db_seconds}
+        if self.view_started is not None:
+            view_ended = self.view_ended or ended
+            view_db = (self.render_db_seconds if self.view_ended else self.db_seconds) - self.view_db_seconds
+            phases['serialize'] = max(view_ended - self.view_started - view_db, 0.0)
+            if self.view_ended is not None:
+                phases['render'] = max(ended - self.view_ended - (self.db_seconds - self.render_db_seconds), 0.0)
+        phases['total'] = ended - self.started
+        return phases
+
+
+def time_query(execute, sql, params, many, context):
+    """``execute_wrapper`` adding each query of a sampled request to its metrics."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_seconds += time.perf_counter() - started
+        metrics.queries += 1
+
+
+def route_of(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.url_name or match.view_name) if match is not None else 'unmatched'
+
+
+def record(request, response, metrics):
+    """Count the request, and with ``metrics`` add them to the histograms."""
+    route = route_of(request)
+    registry.increment('jobs_requests_total', (('route', route), ('method', request.method), ('status', response.status_code)))
+    if metrics is None:
+        return
+    phases = metrics.phases(time.perf_counter())
+    labels = (('route', route), ('method', request.method))
+    registry.observe('jobs_request_duration_seconds', labels, phases['total'], DURATION_BUCKETS)
+    registry.observe('jobs_request_db_queries', labels, metrics.queries, QUERY_BUCKETS)
+    registry.observe('jobs_request_db_duration_seconds', labels, phases['db'], DURATION_BUCKETS)
+    if 'serialize' in phases:
+        registry.observe('jobs_request_serialize_duration_seconds', labels, phases['serialize'], DURATION_BUCKETS)
+    if 'render' in phases:
+        registry.observe('jobs_request_render_duration_seconds', labels, phases['render'], DURATION_BUCKETS)
+    if not response.streaming:
+        registry.observe('jobs_response_size_bytes', labels, len(response.content), SIZE_BUCKETS)
+    if getattr(settings, 'JOBS_SERVER_TIMING', True):
+        response['Server-Timing'] = server_timing(phases, metrics.queries)
+
+
+def server_timing(phases, queries):
+    entries = []
+    for phase, seconds in phases.items():
+        entry = f'{phase};dur={seconds * 1000:.2f}'
+        if phase == 'db':
+            entry += f';desc="{queries} {"query" if queries == 1 else "queries"}"'
+        entries.append(entry)
+    return ', '.join(entries)
+
+
+class MetricsMiddleware:
+    """
+    Counts and samples requests (see the module docstring). Put it first in
+    MIDDLEWARE so its wall time covers the rest.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Django would otherwise run the sync hooks in a thread
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def start(self):
+        rate = sample_rate()
+        if rate >= 1 or (rate > 0 and random.random() < rate):
+            return RequestMetrics()
+        return None
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = self.start()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        record(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = self.start()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        record(request, response, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _start_view()
+        return None
+
+    def process_template_response(self, request, response):
+        # The view has returned; what follows is rendering
+        _end_view()
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        _start_view()
+        return None
+
+    async def aprocess_template_response(self, request, response):
+        _end_view()
+        return response
+
+
+def _start_view():
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.start_view()
+
+
+def _end_view():
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.end_view()
+
+
+def metrics_view(request):
+    """The registry as Prometheus text; with JOBS_METRICS_TOKEN set, for bearers of it only."""
+    token = getattr(settings, 'JOBS_METRICS_TOKEN', None)
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
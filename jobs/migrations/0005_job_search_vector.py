@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:52
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def populate_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.search import SearchVector
+    from django.db.models import OuterRef, Subquery
+
+    Job = apps.get_model('jobs', 'Job')
+    Employer = apps.get_model('jobs', 'Employer')
+    company_name = Subquery(Employer.objects.filter(pk=OuterRef('employer_id')).values('company_name')[:1])
+    Job.objects.using(schema_editor.connection.alias).update(
+        search_vector=(
+            SearchVector('title', weight='A', config='english')
+            + SearchVector(company_name, weight='A', config='english')
+            + SearchVector('requirements', weight='B', config='english')
+            + SearchVector('description', weight='C', config='english')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0004_alter_application_resume'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='job_search_vector_idx'),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0005_job_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['job', '-applied_at'], name='application_job_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['applicant', '-applied_at'], name='application_user_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status', 'PUBLISHED')), fields=['-created_at', 'id'], name='job_published_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status', 'PUBLISHED')), fields=['job_type', '-created_at', 'id'], name='job_published_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status', 'PUBLISHED')), fields=['location', '-created_at', 'id'], name='job_published_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['employer', '-created_at'], name='job_employer_created_idx'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:59
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_resumes(apps, schema_editor):
+    # Resumes uploaded before the pipeline were stored directly; they were
+    # never scanned or extracted, but they are usable
+    for model in ('Application', 'Applicant'):
+        apps.get_model('jobs', model).objects.using(schema_editor.connection.alias).exclude(
+            resume__isnull=True,
+        ).exclude(resume='').update(resume_status='READY')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0007_revokedtoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='applicant',
+            name='resume_status',
+            field=models.CharField(choices=[('NONE', 'No resume'), ('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('READY', 'Ready'), ('REJECTED', 'Rejected'), ('FAILED', 'Failed')], default='NONE', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='applicant',
+            name='resume_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='applicant',
+            name='resume_thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='applicant_resume_thumbnails/'),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='resume_status',
+            field=models.CharField(choices=[('NONE', 'No resume'), ('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('READY', 'Ready'), ('REJECTED', 'Rejected'), ('FAILED', 'Failed')], default='NONE', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='resume_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='resume_thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='resume_thumbnails/'),
+        ),
+        migrations.CreateModel(
+            name='ResumeUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('size', models.PositiveBigIntegerField()),
+                ('received', models.PositiveBigIntegerField(default=0)),
+                ('status', models.CharField(choices=[('UPLOADING', 'Uploading'), ('COMPLETE', 'Complete'), ('ATTACHED', 'Attached')], default='UPLOADING', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resume_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='QUEUED', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('run_after', models.DateTimeField()),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='task_ready_idx')],
+            },
+        ),
+        migrations.RunPython(mark_existing_resumes, migrations.RunPython.noop),
+    ]
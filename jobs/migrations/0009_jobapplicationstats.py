@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_applications(apps, schema_editor):
+    Application = apps.get_model('jobs', 'Application')
+    JobApplicationStats = apps.get_model('jobs', 'JobApplicationStats')
+    statuses = ['PENDING', 'REVIEWED', 'SHORTLISTED', 'REJECTED', 'ACCEPTED']
+    rows = Application.objects.using(schema_editor.connection.alias).order_by().values('job_id').annotate(**{
+        status.lower(): Count('pk', filter=Q(status=status)) for status in statuses
+    })
+    JobApplicationStats.objects.using(schema_editor.connection.alias).bulk_create(
+        [JobApplicationStats(**row) for row in rows], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0008_resume_pipeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobApplicationStats',
+            fields=[
+                ('job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='application_stats', serialize=False, to='jobs.job')),
+                ('pending', models.IntegerField(default=0)),
+                ('reviewed', models.IntegerField(default=0)),
+                ('shortlisted', models.IntegerField(default=0)),
+                ('rejected', models.IntegerField(default=0)),
+                ('accepted', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(count_applications, migrations.RunPython.noop),
+    ]
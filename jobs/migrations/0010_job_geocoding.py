@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:20
+
+import csv
+import re
+import unicodedata
+from decimal import Decimal
+from pathlib import Path
+
+from django.db import migrations, models
+
+# A copy of jobs.geo as it was when this migration was written, so that
+# later changes to it cannot change what the migration does. It locates
+# jobs with the bundled gazetteer; `manage.py geocode_jobs` geocodes them
+# again with JOBS_GEOCODER.
+GAZETTEER = Path(__file__).resolve().parent.parent / 'data' / 'gazetteer.csv'
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 12
+COORDINATES_RE = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    bits = precision * 5
+    lat_bits, lon_bits = bits // 2, bits - bits // 2
+    lat_index = min(max(int((float(latitude) + 90.0) / 180.0 * (1 << lat_bits)), 0), (1 << lat_bits) - 1)
+    lon_index = min(max(int((float(longitude) + 180.0) / 360.0 * (1 << lon_bits)), 0), (1 << lon_bits) - 1)
+    code = 0
+    for position in range(bits):
+        if position % 2 == 0:
+            lon_bits -= 1
+            bit = lon_index >> lon_bits & 1
+        else:
+            lat_bits -= 1
+            bit = lat_index >> lat_bits & 1
+        code = code << 1 | bit
+    return ''.join(BASE32[code >> shift & 31] for shift in range(bits - 5, -1, -5))
+
+
+def normalize_place(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    return ' '.join(re.sub(r'[^\w]+', ' ', text).split())
+
+
+def load_gazetteer():
+    places = {}
+    with open(GAZETTEER, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            point = (Decimal(row['latitude']), Decimal(row['longitude']))
+            for name in [row['name'], *filter(None, (row.get('aliases') or '').split('|'))]:
+                places.setdefault(normalize_place(name), point)
+                places.setdefault(normalize_place(f"{name} {row['country']}"), point)
+    return places
+
+
+def locate(location, places):
+    match = COORDINATES_RE.match(location or '')
+    if match is not None:
+        point = float(match.group(1)), float(match.group(2))
+    else:
+        point = next(
+            (places[name] for name in map(normalize_place, [location, *(location or '').split(',')]) if name in places),
+            None,
+        )
+    if point is None or not (-90 <= point[0] <= 90 and -180 <= point[1] <= 180):
+        return None, None, None
+    latitude, longitude = (Decimal(str(round(float(value), 6))) for value in point)
+    return latitude, longitude, encode(latitude, longitude)
+
+
+def geocode_existing_jobs(apps, schema_editor, batch_size=500):
+    Job = apps.get_model('jobs', 'Job')
+    jobs = Job.objects.using(schema_editor.connection.alias)
+    places = load_gazetteer()
+    batch = []
+    for job in jobs.only('pk', 'location').order_by('pk').iterator(chunk_size=batch_size):
+        job.latitude, job.longitude, job.geohash = locate(job.location, places)
+        batch.append(job)
+        if len(batch) == batch_size:
+            jobs.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+            batch = []
+    if batch:
+        jobs.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0009_jobapplicationstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, editable=False, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, editable=False, max_digits=9, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['geohash'], name='job_geohash_idx'),
+        ),
+        migrations.RunPython(geocode_existing_jobs, migrations.RunPython.noop),
+    ]
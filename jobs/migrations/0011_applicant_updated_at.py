@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0010_job_geocoding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='applicant',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['updated_at'], name='job_updated_idx'),
+        ),
+    ]
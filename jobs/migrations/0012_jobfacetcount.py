@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:04
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, Value, When
+
+
+def count_jobs(apps, schema_editor):
+    Job = apps.get_model('jobs', 'Job')
+    JobFacetCount = apps.get_model('jobs', 'JobFacetCount')
+    bounds = sorted(getattr(settings, 'JOBS_SALARY_BANDS', [500, 1000, 2000, 5000]))
+    salary_band = Case(
+        *[When(salary_min__lt=bound, then=Value(band)) for band, bound in enumerate(bounds)],
+        default=Value(len(bounds)),
+    )
+    rows = (
+        Job.objects.using(schema_editor.connection.alias).filter(status='PUBLISHED')
+        .annotate(salary_band=salary_band)
+        .order_by().values('job_type', 'location', 'salary_band').annotate(count=Count('pk'))
+    )
+    JobFacetCount.objects.using(schema_editor.connection.alias).bulk_create(
+        [JobFacetCount(**row) for row in rows], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0011_applicant_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_type', models.CharField(max_length=20)),
+                ('location', models.CharField(max_length=255)),
+                ('salary_band', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('job_type', 'location', 'salary_band'), name='job_facet_count_unique')],
+            },
+        ),
+        migrations.RunPython(count_jobs, migrations.RunPython.noop),
+    ]
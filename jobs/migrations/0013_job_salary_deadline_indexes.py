@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0012_jobfacetcount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status', 'PUBLISHED')), fields=['salary_min', 'id'], name='job_published_salary_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status', 'PUBLISHED')), fields=['deadline', 'id'], name='job_published_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status', 'PUBLISHED')), fields=['job_type', 'salary_min', 'id'], name='job_published_type_salary_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status', 'PUBLISHED')), fields=['job_type', 'deadline', 'id'], name='job_published_type_dl_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status', 'PUBLISHED')), fields=['location', 'salary_min', 'id'], name='job_published_loc_salary_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status', 'PUBLISHED')), fields=['location', 'deadline', 'id'], name='job_published_loc_dl_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0013_job_salary_deadline_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='publish_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('publish_at__isnull', False), ('status', 'DRAFT')), fields=['publish_at'], name='job_scheduled_idx'),
+        ),
+    ]
@@ -1,10 +1,22 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 class UserType(models.TextChoices):
     EMPLOYER = 'EMPLOYER', 'Employer'
     APPLICANT = 'APPLICANT', 'Applicant'
 
+class ResumeStatus(models.TextChoices):
+    NONE = 'NONE', 'No resume'
+    PENDING = 'PENDING', 'Pending'
+    PROCESSING = 'PROCESSING', 'Processing'
+    READY = 'READY', 'Ready'
+    REJECTED = 'REJECTED', 'Rejected'
+    FAILED = 'FAILED', 'Failed'
+
 # Create your models here.
 class Employer(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -43,12 +55,87 @@ class Job(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     deadline = models.DateField(blank=True, null=True)
+    # A draft is published once this time comes (see jobs.lifecycle)
+    publish_at = models.DateTimeField(blank=True, null=True)
+    # Maintained by jobs.search; only populated on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Geocoded from location by jobs.geo; the geohash of the point serves
+    # radius and bounding-box searches
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True, editable=False)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, null=True, editable=False)
     
     def __str__(self):
         return f"{self.title} at {self.employer.company_name}"
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='job_search_vector_idx'),
+            # Public listing: published jobs only, newest first, optionally
+            # narrowed by job_type or location
+            models.Index(
+                fields=['-created_at', 'id'],
+                name='job_published_created_idx',
+                condition=models.Q(status='PUBLISHED'),
+            ),
+            models.Index(
+                fields=['job_type', '-created_at', 'id'],
+                name='job_published_type_idx',
+                condition=models.Q(status='PUBLISHED'),
+            ),
+            models.Index(
+                fields=['location', '-created_at', 'id'],
+                name='job_published_location_idx',
+                condition=models.Q(status='PUBLISHED'),
+            ),
+            # ?ordering= by minimum salary or deadline (scanned either way),
+            # and expired jobs still published
+            models.Index(
+                fields=['salary_min', 'id'],
+                name='job_published_salary_idx',
+                condition=models.Q(status='PUBLISHED'),
+            ),
+            models.Index(
+                fields=['deadline', 'id'],
+                name='job_published_deadline_idx',
+                condition=models.Q(status='PUBLISHED'),
+            ),
+            # The same orderings narrowed by job_type or location
+            models.Index(
+                fields=['job_type', 'salary_min', 'id'],
+                name='job_published_type_salary_idx',
+                condition=models.Q(status='PUBLISHED'),
+            ),
+            models.Index(
+                fields=['job_type', 'deadline', 'id'],
+                name='job_published_type_dl_idx',
+                condition=models.Q(status='PUBLISHED'),
+            ),
+            models.Index(
+                fields=['location', 'salary_min', 'id'],
+                name='job_published_loc_salary_idx',
+                condition=models.Q(status='PUBLISHED'),
+            ),
+            models.Index(
+                fields=['location', 'deadline', 'id'],
+                name='job_published_loc_dl_idx',
+                condition=models.Q(status='PUBLISHED'),
+            ),
+            # Drafts waiting to be published
+            models.Index(
+                fields=['publish_at'],
+                name='job_scheduled_idx',
+                condition=models.Q(status='DRAFT', publish_at__isnull=False),
+            ),
+            # Jobs near a point or in a box: ranges of geohash cells. Not
+            # partial, so SQLite can scan each range of an OR on its own
+            models.Index(fields=['geohash'], name='job_geohash_idx'),
+            # Jobs changed since a matching index last refreshed
+            models.Index(fields=['updated_at'], name='job_updated_idx'),
+            # Employer's own jobs, drafts included
+            models.Index(fields=['employer', '-created_at'], name='job_employer_created_idx'),
+        ]
     
 class Application(models.Model):
     STATUS_CHOICES = [
@@ -62,6 +149,10 @@ class Application(models.Model):
     job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="applications")
     applicant = models.ForeignKey(User, on_delete=models.CASCADE, related_name="applications")
     resume = models.FileField(upload_to="resumes/", blank=True, null=True)
+    # Filled in by the background resume pipeline (jobs.resumes)
+    resume_status = models.CharField(max_length=20, choices=ResumeStatus.choices, default=ResumeStatus.NONE)
+    resume_text = models.TextField(blank=True, default="")
+    resume_thumbnail = models.ImageField(upload_to="resume_thumbnails/", blank=True, null=True)
     cover_letter = models.TextField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
     applied_at = models.DateTimeField(auto_now_add=True)
@@ -72,16 +163,151 @@ class Application(models.Model):
             full_name = self.applicant.username
         return f"{full_name} - {self.job.title}"
     
+    def save(self, *args, **kwargs):
+        # The job's counters are updated by a post_save handler; commit both
+        # or neither
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+    
     class Meta:
         ordering = ["-applied_at"]
         unique_together = ['job', 'applicant'] # Prevent multiple applications for the same job
+        indexes = [
+            models.Index(fields=['job', '-applied_at'], name='application_job_applied_idx'),
+            models.Index(fields=['applicant', '-applied_at'], name='application_user_applied_idx'),
+        ]
+
+class JobApplicationStats(models.Model):
+    """
+    Number of applications to a job in each status, kept up to date by the
+    handlers in jobs.signals and rebuilt by `manage.py rebuild_application_stats`.
+    """
+    job = models.OneToOneField(Job, on_delete=models.CASCADE, primary_key=True, related_name="application_stats")
+    pending = models.IntegerField(default=0)
+    reviewed = models.IntegerField(default=0)
+    shortlisted = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+    accepted = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Counter column for each Application status
+    STATUS_FIELDS = {status: status.lower() for status, _ in Application.STATUS_CHOICES}
+    
+    def counts(self):
+        counts = {field: getattr(self, field) for field in self.STATUS_FIELDS.values()}
+        counts['total'] = sum(counts.values())
+        return counts
+    
+    def __str__(self):
+        return f"Application stats for job {self.job_id}"
+
+class JobFacetCount(models.Model):
+    """
+    Number of published jobs with each job type, location and salary band
+    (an index into JOBS_SALARY_BANDS), kept up to date by the handlers in
+    jobs.signals and rebuilt by `manage.py rebuild_facet_counts`.
+    """
+    job_type = models.CharField(max_length=20)
+    location = models.CharField(max_length=255)
+    salary_band = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job_type', 'location', 'salary_band'], name='job_facet_count_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.count} {self.job_type} jobs in {self.location} (salary band {self.salary_band})"
 
 class Applicant(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     resume = models.FileField(upload_to="applicant_resumes/", blank=True, null=True)
+    resume_status = models.CharField(max_length=20, choices=ResumeStatus.choices, default=ResumeStatus.NONE)
+    resume_text = models.TextField(blank=True, default="")
+    resume_thumbnail = models.ImageField(upload_to="applicant_resume_thumbnails/", blank=True, null=True)
     skills = models.TextField(blank=True, null=True)
     experience = models.TextField(blank=True, null=True)
     education = models.TextField(blank=True, null=True)
+    # Lets other processes' matching indexes (jobs.matching) find changed profiles
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return self.user.get_full_name() or self.user.username
+
+
+class RevokedToken(models.Model):
+    """
+    Hash of a revoked JWT identifier: a token's jti, a superseded
+    password-hash claim, or a whole user. With ``issued_before``, only tokens
+    issued before then are revoked, so that a user reactivated can log in
+    again. Rows only matter until every token they could match has expired.
+    """
+    token_hash = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    issued_before = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.token_hash
+
+
+class ResumeUpload(models.Model):
+    """
+    A resume sent in chunks to the staging area. Once complete it can be
+    attached to an application or applicant profile by id.
+    """
+    UPLOADING = 'UPLOADING'
+    COMPLETE = 'COMPLETE'
+    ATTACHED = 'ATTACHED'
+    STATUS_CHOICES = [
+        (UPLOADING, 'Uploading'),
+        (COMPLETE, 'Complete'),
+        (ATTACHED, 'Attached'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="resume_uploads")
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=UPLOADING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+
+class Task(models.Model):
+    """A unit of background work in the database-backed queue (jobs.tasks)."""
+    QUEUED = 'QUEUED'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField()
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='task_ready_idx'),
+        ]
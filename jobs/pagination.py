@@ -0,0 +1,252 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a fixed, unique ordering.
+
+    Pages are selected with a WHERE clause on the boundary row of the previous
+    page rather than an OFFSET, so a deep page costs the same as the first one.
+    Cursors are opaque base64 tokens holding the boundary row and direction.
+
+    ``ordering_choices`` maps the values ``?ordering=`` may take to other
+    orderings; each should have an index to seek on. Nullable fields sort
+    their NULLs after every value, as PostgreSQL indexes them by default.
+    """
+    ordering = None
+    ordering_choices = {}
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    @property
+    def page_size_default(self):
+        return getattr(settings, 'JOBS_PAGE_SIZE', 20)
+
+    @property
+    def max_page_size(self):
+        return getattr(settings, 'JOBS_MAX_PAGE_SIZE', 100)
+
+    def get_ordering(self, request, queryset, view):
+        assert self.ordering, 'KeysetPagination requires an ordering ending on a unique field.'
+        choice = request.query_params.get(self.ordering_query_param) if self.ordering_choices else None
+        if not choice:
+            return tuple(self.ordering)
+        if choice not in self.ordering_choices:
+            raise ValidationError({
+                self.ordering_query_param: f"Choose from {', '.join(self.ordering_choices)}",
+            })
+        return tuple(self.ordering_choices[choice])
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return min(self.page_size_default, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.get_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, using the async ORM."""
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.get_page([row async for row in queryset.aiterator(chunk_size=self.page_size + 1)])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        Return the queryset for the requested page, sliced to one row more than
+        the page size so the presence of a following page can be detected.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.model = queryset.model
+        self.position, self.reverse = self.decode_cursor(request)
+
+        ordering = [self._flip(field) for field in self.ordering] if self.reverse else list(self.ordering)
+        queryset = queryset.order_by(*[self._order_by(field) for field in ordering])
+        if self.position is not None:
+            queryset = queryset.filter(self._seek_filter(ordering, self.position))
+        return queryset[:self.page_size + 1]
+
+    def get_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        if self.reverse:
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        if rows:
+            self.next_position = self._get_position(rows[-1])
+            self.previous_position = self._get_position(rows[0])
+        else:
+            # An empty page can only be reached by walking past the end; the
+            # way back starts from the cursor we were given.
+            self.next_position = self.previous_position = self.position
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.previous_position is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = tuple(self._clean(field, value) for field, value in zip(self.ordering, values))
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise ValidationError({self.cursor_query_param: self.invalid_cursor_message})
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': [_jsonable(value) for value in position]}
+        if reverse:
+            payload['r'] = 1
+        encoded = b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position(self, row):
+        names = [field.lstrip('-') for field in self.ordering]
+        if isinstance(row, dict):
+            return tuple(row[name] for name in names)
+        return tuple(getattr(row, name) for name in names)
+
+    def _clean(self, field, value):
+        # A tampered cursor must not reach the database with a value the
+        # column cannot hold, such as an id beyond the integer range
+        field = self._get_field(field)
+        value = field.to_python(value)
+        if value is None and not field.null:
+            raise ValueError
+        field.run_validators(value)
+        return value
+
+    def _get_field(self, field):
+        return self.model._meta.get_field(field.lstrip('-'))
+
+    def _order_by(self, field):
+        if not self._get_field(field).null:
+            return field
+        if field.startswith('-'):
+            return F(field[1:]).desc(nulls_first=True)
+        return F(field).asc(nulls_last=True)
+
+    def _seek_filter(self, ordering, position):
+        # (a, b) after (x, y) == a beyond x OR (a == x AND b beyond y)
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            if value is None:
+                # NULLs sort last: only values are beyond one, descending
+                beyond = Q(**{f'{name}__isnull': False}) if descending else None
+                equal_value = Q(**{f'{name}__isnull': True})
+            else:
+                beyond = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+                if not descending and self._get_field(field).null:
+                    beyond |= Q(**{f'{name}__isnull': True})
+                equal_value = Q(**{name: value})
+            if beyond is not None:
+                condition |= equal & beyond
+            equal &= equal_value
+        return condition
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+
+def _jsonable(value):
+    if isinstance(value, (int, str)) or value is None:
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class JobKeysetPagination(KeysetPagination):
+    """
+    Follows ``Job.Meta.ordering`` with ``id`` as the tie-breaker, or
+    ``?ordering=`` by creation, minimum salary or deadline. Each runs along
+    one of the published-job indexes on Job, forwards or backwards.
+    """
+    ordering = ('-created_at', 'id')
+    ordering_choices = {
+        '-created_at': ('-created_at', 'id'),
+        'created_at': ('created_at', '-id'),
+        'salary_min': ('salary_min', 'id'),
+        '-salary_min': ('-salary_min', '-id'),
+        'deadline': ('deadline', 'id'),
+        '-deadline': ('-deadline', '-id'),
+    }
+
+
+class JobSearchPagination(PageNumberPagination):
+    """
+    Relevance-ranked search results have no stable keyset to seek on, so they
+    are paged by number instead.
+    """
+    page_size_query_param = 'page_size'
+
+    @property
+    def page_size(self):
+        return getattr(settings, 'JOBS_PAGE_SIZE', 20)
+
+    @property
+    def max_page_size(self):
+        return getattr(settings, 'JOBS_MAX_PAGE_SIZE', 100)
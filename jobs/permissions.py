@@ -0,0 +1,17 @@
+from rest_framework import permissions
+
+from .roles import get_roles
+
+
+class IsEmployer(permissions.BasePermission):
+    message = "Only employers can access this endpoint"
+
+    def has_permission(self, request, view):
+        return get_roles(request).is_employer
+
+
+class IsApplicant(permissions.BasePermission):
+    message = "Only applicants can access this endpoint"
+
+    def has_permission(self, request, view):
+        return get_roles(request).is_applicant
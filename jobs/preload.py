@@ -0,0 +1,57 @@
+"""
+Work done once in the server's master process before it forks workers
+(``preload_app`` in gunicorn.conf.py), so that every worker starts with it
+done, in memory shared with the master until written to (copy-on-write):
+the modules, the URL resolver, the geocoder's gazetteer and the matching
+indexes, loaded from their snapshots in JOBS_MATCHING_INDEX_DIR or built
+from the database, so no request waits for them.
+
+Reference counting writes to the objects it touches, but the cyclic
+garbage collector would write to all of them; ``gc.freeze()`` moves what
+exists so far out of its reach. The master disables the collector from
+the start, so that preloading leaves no holes in the pages it shares, and
+workers enable it again (see gunicorn.conf.py).
+"""
+import gc
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.urls import get_resolver
+
+from . import geo, matching
+from .cache import get_cache_backend
+from .metrics import database_pools
+
+
+def close_connections():
+    """
+    Close the master's connections, which workers would otherwise share,
+    and its connection pools, whose threads do not survive a fork: each
+    worker opens its own.
+    """
+    connections.close_all()
+    for alias in database_pools():
+        connections[alias].close_pool()
+
+
+def check_shared_state(workers):
+    """
+    Refuse to fork several workers that would each keep their own response
+    cache: an invalidation would only reach the worker making it, and the
+    others would go on serving stale responses.
+    """
+    if workers > 1 and not get_cache_backend().shared:
+        raise ImproperlyConfigured(
+            f"JOBS_RESPONSE_CACHE is per process but {workers} workers would serve it; "
+            "use jobs.cache.DjangoCacheBackend over a shared cache (Redis or Memcached)"
+        )
+
+
+def preload():
+    # Imports the views, serializers and everything they use
+    get_resolver().url_patterns
+    get_resolver()._populate()
+    geo.get_geocoder()
+    matching.build_indexes()
+    close_connections()
+    gc.freeze()
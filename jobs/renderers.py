@@ -0,0 +1,40 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Falls back to the json module
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson when it is installed.
+
+    The output is byte-for-byte what JSONRenderer produces with the default
+    UNICODE_JSON, COMPACT_JSON and STRICT_JSON settings: compact separators,
+    UTF-8 rather than \\u escapes, and U+2028/U+2029 escaped. Dates and times
+    go through DRF's encoder, as they would with json. Anything orjson cannot
+    encode the same way (indented output, ints over 64 bits, non-string keys)
+    is rendered by JSONRenderer instead.
+
+    Floats are the one difference: orjson writes ``1e16`` where json writes
+    ``1e+16``. The serializers here render decimals as strings, so no floats
+    reach the renderer.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default = self.encoder_class().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact or not self.strict:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # As JSONRenderer, keep the output a strict javascript subset
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
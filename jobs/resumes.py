@@ -0,0 +1,339 @@
+import io
+import logging
+import os
+import re
+import shutil
+import uuid
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from .models import ResumeStatus, ResumeUpload
+from .tasks import enqueue, task
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF text extraction is optional
+    PdfReader = None
+
+
+class ResumeRejected(Exception):
+    """Raised by a scanner to refuse a file, e.g. because it is infected."""
+
+
+def max_resume_bytes():
+    return getattr(settings, 'JOBS_RESUME_MAX_BYTES', 10 * 1024 * 1024)
+
+
+def staging_dir():
+    path = Path(getattr(settings, 'JOBS_UPLOAD_STAGING_DIR', Path(settings.BASE_DIR) / 'uploads' / 'staging'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def staged_path(upload):
+    return staging_dir() / str(upload.pk)
+
+
+def discard(upload):
+    """Delete an upload, and its staged bytes once that is committed."""
+    path = staged_path(upload)
+    upload.delete()
+    transaction.on_commit(lambda: path.unlink(missing_ok=True))
+
+
+# Chunked uploads
+
+def parse_content_range(header, size):
+    """
+    Parse ``bytes start-end/total`` into ``(start, end)`` with ``end``
+    exclusive. A missing header means the body is the whole file.
+    """
+    if not header:
+        return 0, size
+    match = re.fullmatch(r'bytes (\d+)-(\d+)/(\d+|\*)', header.strip())
+    if match is None:
+        raise ValidationError({'Content-Range': "Expected 'bytes start-end/total'"})
+    start, end, total = match.groups()
+    start, end = int(start), int(end) + 1
+    if total != '*' and int(total) != size:
+        raise ValidationError({'Content-Range': f"Total must match the declared size of {size} bytes"})
+    if start >= end or end > size:
+        raise ValidationError({'Content-Range': f"Range must fall within the declared size of {size} bytes"})
+    return start, end
+
+
+def write_chunk(upload, stream, start, end):
+    """
+    Append bytes ``start`` to ``end`` read from ``stream`` to the staged
+    file. ``start`` must equal the bytes received so far; a client that lost
+    track asks for the upload again and resumes from ``received``.
+    """
+    if upload.status != ResumeUpload.UPLOADING:
+        raise ValidationError({'detail': "This upload is already complete"})
+    if start != upload.received:
+        raise ValidationError({'detail': f"Expected the chunk to start at byte {upload.received}"})
+
+    path = staged_path(upload)
+    remaining = end - start
+    with open(path, 'r+b' if path.exists() else 'wb') as staged:
+        staged.seek(start)
+        while remaining:
+            data = stream.read(min(remaining, 64 * 1024))
+            if not data:
+                break
+            staged.write(data)
+            remaining -= len(data)
+        staged.truncate()
+    if remaining:
+        raise ValidationError({'detail': f"The body was {remaining} bytes shorter than its Content-Range"})
+
+    # Only the request that wrote from the current offset moves it forward
+    status = ResumeUpload.COMPLETE if end == upload.size else ResumeUpload.UPLOADING
+    updated = ResumeUpload.objects.filter(pk=upload.pk, received=start, status=ResumeUpload.UPLOADING).update(
+        received=end, status=status, updated_at=timezone.now(),
+    )
+    if not updated:
+        raise ValidationError({'detail': "Another chunk was written concurrently; fetch the upload and resume"})
+    upload.received, upload.status = end, status
+    return upload
+
+
+def stage_file(file, user):
+    """Move a file uploaded in a single request into the staging area."""
+    if file.size > max_resume_bytes():
+        raise ValidationError({'resume': f"Resumes can be at most {max_resume_bytes()} bytes"})
+    upload = ResumeUpload.objects.create(
+        user=user, filename=os.path.basename(file.name), content_type=getattr(file, 'content_type', '') or '',
+        size=file.size, received=file.size, status=ResumeUpload.COMPLETE,
+    )
+    if hasattr(file, 'temporary_file_path'):
+        # Large uploads are already on disk; moving them is just a rename
+        shutil.move(file.temporary_file_path(), staged_path(upload))
+    else:
+        with open(staged_path(upload), 'wb') as staged:
+            for chunk in file.chunks():
+                staged.write(chunk)
+    return upload
+
+
+def take_resume(serializer, user):
+    """
+    Remove the resume (a file or a completed ``resume_upload``) from the
+    serializer's validated data so the request never writes it to storage,
+    and return it as a staged upload, claimed for this object.
+    """
+    data = serializer.validated_data
+    upload = data.pop('resume_upload', None)
+    file = data.pop('resume', None)
+    if upload is not None:
+        if upload.user_id != user.pk:
+            raise PermissionDenied("You can only attach your own uploads")
+        claimed = ResumeUpload.objects.filter(pk=upload.pk, status=ResumeUpload.COMPLETE).update(
+            status=ResumeUpload.ATTACHED, updated_at=timezone.now(),
+        )
+        if not claimed:
+            raise ValidationError({'resume_upload': "This upload has already been attached"})
+    elif file is not None:
+        upload = stage_file(file, user)
+        upload.status = ResumeUpload.ATTACHED
+        upload.save(update_fields=['status'])
+    return upload
+
+
+def schedule_resume(instance, upload):
+    """Mark ``instance``'s resume as pending and queue its processing."""
+    if upload is None:
+        return
+    with transaction.atomic():
+        type(instance).objects.filter(pk=instance.pk).update(resume_status=ResumeStatus.PENDING)
+        instance.resume_status = ResumeStatus.PENDING
+        enqueue('process_resume', model=instance._meta.label_lower, pk=instance.pk, upload=str(upload.pk))
+
+
+# Processing
+
+def get_scanners():
+    return [import_string(path) for path in getattr(settings, 'JOBS_RESUME_SCANNERS', [])]
+
+
+SIGNATURES = [
+    (b'%PDF-', 'pdf'),
+    (b'PK\x03\x04', 'docx'),
+    (b'\x89PNG\r\n\x1a\n', 'image'),
+    (b'\xff\xd8\xff', 'image'),
+]
+
+
+def sniff(path):
+    """Guess a staged file's kind from its first bytes."""
+    with open(path, 'rb') as staged:
+        head = staged.read(2048)
+    for signature, kind in SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as exc:
+        # A multi-byte character cut off at the end of the sample is fine
+        if exc.start < len(head) - 3:
+            return None
+    return 'text'
+
+
+def check_file_type(path, upload):
+    """Scanner rejecting anything that is not a PDF, Word, image or text file."""
+    if sniff(path) is None:
+        raise ResumeRejected("Unsupported file type")
+
+
+def extract_text(path, kind):
+    if kind == 'text':
+        with open(path, 'rb') as staged:
+            return staged.read().decode('utf-8', errors='replace')
+    if kind == 'pdf' and PdfReader is not None:
+        return '\n'.join(page.extract_text() or '' for page in PdfReader(path).pages)
+    if kind == 'docx':
+        try:
+            with zipfile.ZipFile(path) as archive:
+                xml = archive.read('word/document.xml').decode('utf-8', errors='replace')
+        except (zipfile.BadZipFile, KeyError):
+            return ''
+        xml = re.sub(r'</w:p>', '\n', xml)
+        return re.sub(r'<[^>]+>', '', xml)
+    return ''
+
+
+def make_thumbnail(path, kind):
+    if kind != 'image':
+        return None
+    from PIL import Image
+
+    size = getattr(settings, 'JOBS_RESUME_THUMBNAIL_SIZE', (200, 200))
+    with Image.open(path) as image:
+        image.thumbnail(size)
+        buffer = io.BytesIO()
+        image.convert('RGB').save(buffer, format='PNG')
+    return ContentFile(buffer.getvalue())
+
+
+def _set_status(instance, status, **fields):
+    if hasattr(instance, 'updated_at'):
+        # update() skips auto_now; matching indexes look for changed profiles by it
+        fields['updated_at'] = timezone.now()
+    type(instance).objects.filter(pk=instance.pk).update(resume_status=status, **fields)
+
+
+def abandon_resume(model, pk, upload):
+    """Mark a resume that could not be processed as failed and delete its upload."""
+    upload = ResumeUpload.objects.filter(pk=upload).first()
+    instance = apps.get_model(model).objects.filter(pk=pk).first()
+    if instance is not None:
+        _set_status(instance, ResumeStatus.FAILED)
+    if upload is not None:
+        discard(upload)
+
+
+@task('process_resume', on_failure=abandon_resume)
+def process_resume(model, pk, upload):
+    """Scan the staged file, then extract its text and thumbnail and store it."""
+    upload = ResumeUpload.objects.filter(pk=upload).first()
+    instance = apps.get_model(model).objects.filter(pk=pk).first()
+    if upload is None:
+        return
+    if instance is None:
+        # The application or profile was deleted in the meantime
+        discard(upload)
+        return
+
+    path = staged_path(upload)
+    _set_status(instance, ResumeStatus.PROCESSING)
+    try:
+        for scanner in get_scanners():
+            scanner(path, upload)
+    except ResumeRejected as exc:
+        logger.warning("Rejected resume %s for %s %s: %s", upload.pk, model, pk, exc)
+        _set_status(instance, ResumeStatus.REJECTED)
+        discard(upload)
+        return
+
+    try:
+        kind = sniff(path)
+        text = extract_text(path, kind)
+        thumbnail = make_thumbnail(path, kind)
+        with open(path, 'rb') as staged:
+            instance.resume.save(upload.filename, File(staged), save=False)
+        if thumbnail is not None:
+            instance.resume_thumbnail.save(f'{Path(upload.filename).stem}.png', thumbnail, save=False)
+    except Exception:
+        _set_status(instance, ResumeStatus.FAILED)
+        raise
+
+    _set_status(
+        instance, ResumeStatus.READY,
+        resume=instance.resume.name, resume_text=text.replace('\x00', ''),
+        resume_thumbnail=instance.resume_thumbnail.name or None,
+    )
+    discard(upload)
+
+
+def purge_uploads(older_than):
+    """Delete uploads that were abandoned unfinished or never attached."""
+    stale = ResumeUpload.objects.filter(
+        status__in=[ResumeUpload.UPLOADING, ResumeUpload.COMPLETE], updated_at__lt=older_than,
+    )
+    count = 0
+    for upload in stale.iterator():
+        discard(upload)
+        count += 1
+    return count
+
+
+def purge_staged_files(older_than):
+    """
+    Delete staged files left without an upload: those of a request whose
+    transaction was rolled back after staging them, or of a process that
+    died. Recent files are left alone, as their upload may not be
+    committed yet.
+    """
+    cutoff = older_than.timestamp()
+    staged = {}
+    for path in staging_dir().iterdir():
+        try:
+            # Staged files are named after their upload; anything else is not ours
+            if str(uuid.UUID(path.name)) == path.name and path.stat().st_mtime < cutoff:
+                staged[path.name] = path
+        except (ValueError, FileNotFoundError):
+            continue
+    names = list(staged)
+    orphans = set(names)
+    for offset in range(0, len(names), 500):
+        kept = ResumeUpload.objects.filter(pk__in=names[offset:offset + 500]).values_list('pk', flat=True)
+        orphans.difference_update(str(pk) for pk in kept)
+    for name in orphans:
+        staged[name].unlink(missing_ok=True)
+    return len(orphans)
+
+
+def housekeeping():
+    """Called periodically by the worker to clear out old tasks, uploads, staged files and token revocations."""
+    from .revocation import purge_revocations
+    from .tasks import purge_tasks
+
+    now = timezone.now()
+    purge_revocations(now)
+    hours = getattr(settings, 'JOBS_UPLOAD_EXPIRY_HOURS', 24)
+    purge_uploads(now - timedelta(hours=hours))
+    purge_staged_files(now - timedelta(hours=hours))
+    purge_tasks(now - timedelta(days=getattr(settings, 'JOBS_TASK_RETENTION_DAYS', 7)))
@@ -0,0 +1,124 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevokedToken
+
+
+def _hash(kind, value):
+    return hashlib.sha256(f'{kind}:{value}'.encode('utf-8')).hexdigest()
+
+
+def token_hashes(token):
+    """Every revocation hash that would reject ``token``."""
+    hashes = [_hash('user', token.get(api_settings.USER_ID_CLAIM))]
+    if token.get(api_settings.JTI_CLAIM):
+        hashes.append(_hash('jti', token[api_settings.JTI_CLAIM]))
+    if token.get(api_settings.REVOKE_TOKEN_CLAIM):
+        hashes.append(_hash('password', token[api_settings.REVOKE_TOKEN_CLAIM]))
+    return hashes
+
+
+def _token_lifetime():
+    # Access tokens minted from a refresh token can outlive the refresh
+    # token's issue time by one access lifetime
+    return max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+
+
+def _revoke(token_hash, expires_at, issued_before=None):
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.update_or_create(
+                token_hash=token_hash, defaults={'expires_at': expires_at, 'issued_before': issued_before},
+            )
+    except IntegrityError:
+        pass
+    # Not before it is stored: a revocation rolled back must not linger here
+    transaction.on_commit(lambda: revocation_cache.add(token_hash, issued_before))
+
+
+def revoke_token(token):
+    """Revoke a single token (on logout, see jobs.views.LogoutView) by its jti."""
+    expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+    _revoke(_hash('jti', token[api_settings.JTI_CLAIM]), expires_at)
+
+
+def revoke_password_hash(password_claim):
+    """Revoke every token issued against a password that has since changed."""
+    _revoke(_hash('password', password_claim), timezone.now() + _token_lifetime())
+
+
+def revoke_user(user_id):
+    """
+    Revoke every token issued to a user so far, e.g. one being deactivated.
+    Tokens issued later, once reactivated, are accepted.
+    """
+    now = timezone.now()
+    _revoke(_hash('user', user_id), now + _token_lifetime(), issued_before=now)
+
+
+def purge_revocations(now=None):
+    """Delete revocations that no unexpired token could match. Returns how many."""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
+
+
+class RevocationCache:
+    """
+    In-process set of unexpired revocation hashes, reloaded from the database
+    at most every ``JOBS_REVOCATION_REFRESH_SECONDS``. Revocations made in
+    this process apply immediately; those made elsewhere within one refresh
+    interval.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Revocation hash -> timestamp of issue before which tokens are
+        # revoked, or None for all of them
+        self._hashes = {}
+        self._loaded_at = None
+
+    @property
+    def refresh_interval(self):
+        return getattr(settings, 'JOBS_REVOCATION_REFRESH_SECONDS', 30)
+
+    def refresh(self):
+        hashes = {
+            token_hash: issued_before and issued_before.timestamp()
+            for token_hash, issued_before in RevokedToken.objects.filter(
+                expires_at__gt=timezone.now(),
+            ).values_list('token_hash', 'issued_before')
+        }
+        with self._lock:
+            self._hashes = hashes
+            self._loaded_at = time.monotonic()
+
+    def add(self, token_hash, issued_before=None):
+        with self._lock:
+            self._hashes = {**self._hashes, token_hash: issued_before and issued_before.timestamp()}
+
+    def is_revoked(self, token):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self.refresh()
+        hashes = self._hashes
+        issued_at = token.get('iat')
+        for token_hash in token_hashes(token):
+            if token_hash in hashes:
+                issued_before = hashes[token_hash]
+                if issued_before is None or issued_at is None or issued_at < issued_before:
+                    return True
+        return False
+
+    def clear(self):
+        with self._lock:
+            self._hashes = {}
+            self._loaded_at = None
+
+
+revocation_cache = RevocationCache()
@@ -0,0 +1,114 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.models import TokenUser
+
+from .models import Applicant, Employer
+
+_UNKNOWN = object()
+
+
+def _cached_profile(user, accessor):
+    """
+    Return the profile if it was loaded alongside ``user`` (select_related),
+    None if it was loaded and is missing, or _UNKNOWN if it was not loaded.
+    """
+    descriptor = getattr(type(user), accessor, None)
+    if descriptor is None or not hasattr(descriptor, 'is_cached') or not descriptor.is_cached(user):
+        return _UNKNOWN
+    try:
+        return getattr(user, accessor)
+    except ObjectDoesNotExist:
+        return None
+
+
+class Roles:
+    """
+    The Employer/Applicant profile of the requesting user.
+
+    Each profile is looked up at most once per request, and not at all when
+    the authentication class already loaded it with the user.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def _load(self, accessor, model):
+        if not self.user.is_authenticated:
+            return None
+        profile = _cached_profile(self.user, accessor)
+        if profile is _UNKNOWN:
+            profile = model.objects.filter(user_id=self.user.pk).first()
+        if profile is not None:
+            # Serializers render profile.user; hand them the user we already have
+            profile.user = self.user
+        return profile
+
+    @cached_property
+    def employer(self):
+        return self._load('employer', Employer)
+
+    @cached_property
+    def applicant(self):
+        if self.employer is not None:
+            return None
+        return self._load('applicant', Applicant)
+
+    @property
+    def employer_id(self):
+        return self.employer.pk if self.employer is not None else None
+
+    @property
+    def applicant_id(self):
+        return self.applicant.pk if self.applicant is not None else None
+
+    @property
+    def is_employer(self):
+        return self.employer_id is not None
+
+    @property
+    def is_applicant(self):
+        return self.applicant_id is not None
+
+
+class ClaimRoles(Roles):
+    """
+    Roles of a stateless TokenUser, read from the claims embedded when the
+    token was issued. Profiles are only loaded if a view needs the object.
+    """
+
+    def _claim(self, name):
+        return self.user.token.get(name)
+
+    def _load_by_id(self, model, pk):
+        if pk is None:
+            return None
+        return model.objects.select_related('user').filter(pk=pk).first()
+
+    @cached_property
+    def employer(self):
+        return self._load_by_id(Employer, self.employer_id)
+
+    @cached_property
+    def applicant(self):
+        return self._load_by_id(Applicant, self.applicant_id)
+
+    @property
+    def employer_id(self):
+        return self._claim('employer_id')
+
+    @property
+    def applicant_id(self):
+        return self._claim('applicant_id')
+
+
+def get_roles(request):
+    """
+    Resolve the roles of ``request.user`` once and keep them on the
+    underlying HttpRequest, where views and permission classes share them.
+    """
+    http_request = getattr(request, '_request', request)
+    roles = getattr(http_request, 'roles', None)
+    if roles is None or roles.user is not request.user:
+        roles_class = ClaimRoles if isinstance(request.user, TokenUser) else Roles
+        roles = http_request.roles = roles_class(request.user)
+    return roles
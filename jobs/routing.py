@@ -0,0 +1,169 @@
+"""
+Read-replica routing. GET, HEAD and OPTIONS requests read from one of
+``JOBS_DATABASE_REPLICAS``, picked once per request; everything else, and
+any code outside a request (worker, commands), uses the primary.
+
+A client that wrote in the last ``JOBS_REPLICA_STICKY_SECONDS`` reads from
+the primary too, so it sees its own writes (a job it just posted, an
+application it just sent) before the replicas catch up. Clients are told
+apart by the user of their access token, or else their session cookie,
+and the marks kept in ``CACHES[JOBS_REPLICA_STICKY_CACHE]``, which must be
+shared by every worker: the middleware refuses a per-process LocMemCache
+when there are replicas. A request that writes reads from the primary
+from then on.
+
+Responses streamed after the view returns (exports) read from the primary.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework import permissions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+# Routing state of the request being handled, if any
+_request_state = ContextVar('jobs_replica_routing', default=None)
+
+
+def replicas():
+    return list(getattr(settings, 'JOBS_DATABASE_REPLICAS', []))
+
+
+def _sticky_cache():
+    return caches[getattr(settings, 'JOBS_REPLICA_STICKY_CACHE', 'default')]
+
+
+def check_sticky_cache():
+    """Refuse marks that a client's next request may not see, being sent to another worker."""
+    if replicas() and isinstance(_sticky_cache(), LocMemCache):
+        raise ImproperlyConfigured(
+            "JOBS_REPLICA_STICKY_CACHE must name a cache shared by every worker (Redis or Memcached), "
+            "not a LocMemCache, when JOBS_DATABASE_REPLICAS is set"
+        )
+
+
+def _sticky_key(client):
+    return f'jobs:replica-sticky:{client}'
+
+
+def user_client(user_id):
+    return f'user:{user_id}'
+
+
+def client_of(request):
+    """
+    Who sent ``request``: the user of a valid access token, or the session
+    cookie, or None. Needs no query.
+    """
+    header = request.META.get(api_settings.AUTH_HEADER_NAME, '').split()
+    if len(header) == 2 and header[0] in api_settings.AUTH_HEADER_TYPES:
+        try:
+            token = JWTAuthentication().get_validated_token(header[1])
+            return user_client(token[api_settings.USER_ID_CLAIM])
+        except (InvalidToken, TokenError, KeyError):
+            return None
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    return f'session:{session}' if session else None
+
+
+def stick(client):
+    """Send ``client``'s reads to the primary for the sticky window."""
+    timeout = getattr(settings, 'JOBS_REPLICA_STICKY_SECONDS', 10)
+    if client is not None and replicas() and timeout:
+        _sticky_cache().set(_sticky_key(client), True, timeout)
+
+
+def is_sticky(client):
+    return client is not None and bool(_sticky_cache().get(_sticky_key(client)))
+
+
+class RequestState:
+    """Where one request reads from, decided at its first query."""
+
+    def __init__(self, request):
+        self.request = request
+        self.safe = request.method in permissions.SAFE_METHODS
+        self.wrote = False
+        self._alias = None
+        self._decided = False
+
+    def read_alias(self):
+        """The replica to read from, or None for the primary."""
+        if not self.safe or self.wrote:
+            return None
+        if not self._decided:
+            self._decided = True
+            choices = replicas()
+            if choices and not is_sticky(client_of(self.request)):
+                self._alias = random.choice(choices)
+        return self._alias
+
+    def finish(self, response):
+        if not self.safe and response.status_code < 400:
+            stick(client_of(self.request))
+
+
+class ReplicaRouter:
+    """Database router for ``DATABASE_ROUTERS``; see the module docstring."""
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        return state.read_alias() if state is not None else None
+
+    def db_for_write(self, model, **hints):
+        if not replicas():
+            return None
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        # Objects read from a replica are saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Makes ``ReplicaRouter`` route the queries of each request."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        check_sticky_cache()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RequestState(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        state.finish(response)
+        return response
+
+    async def __acall__(self, request):
+        state = RequestState(request)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if not state.safe:
+            await sync_to_async(state.finish)(response)
+        return response
@@ -0,0 +1,237 @@
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, OuterRef, Subquery, Value, When
+
+from .models import Employer, Job
+
+# Field weights follow Postgres' A-D labels: a hit in the title or company
+# name outranks one buried in the description.
+WEIGHTS = {
+    'title': 'A',
+    'company_name': 'A',
+    'requirements': 'B',
+    'description': 'C',
+}
+LABEL_SCORES = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+STOP_WORDS = frozenset("""
+    a an and are as at be by for from has in is it of on or that the to was
+    were will with we you our your this
+""".split())
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [
+        token for token in TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+class PostgresSearchBackend:
+    """
+    Ranked search over ``Job.search_vector``, a stored tsvector kept current by
+    ``index_jobs`` and served by a GIN index.
+    """
+
+    @property
+    def config(self):
+        return getattr(settings, 'JOBS_SEARCH_CONFIG', 'english')
+
+    def vector(self):
+        company_name = Subquery(
+            Employer.objects.filter(pk=OuterRef('employer_id')).values('company_name')[:1]
+        )
+        return (
+            SearchVector('title', weight=WEIGHTS['title'], config=self.config)
+            + SearchVector(company_name, weight=WEIGHTS['company_name'], config=self.config)
+            + SearchVector('requirements', weight=WEIGHTS['requirements'], config=self.config)
+            + SearchVector('description', weight=WEIGHTS['description'], config=self.config)
+        )
+
+    def search(self, queryset, text):
+        query = SearchQuery(text, search_type='websearch', config=self.config)
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', '-created_at', 'id')
+        )
+
+    def index_jobs(self, job_ids):
+        Job.objects.filter(pk__in=list(job_ids)).update(search_vector=self.vector())
+
+    def index_employer(self, employer_id):
+        Job.objects.filter(employer_id=employer_id).update(search_vector=self.vector())
+
+    def remove_jobs(self, job_ids):
+        pass
+
+    def rebuild(self):
+        Job.objects.update(search_vector=self.vector())
+
+
+class InvertedIndexSearchBackend:
+    """
+    In-process inverted index for databases without full-text search (SQLite
+    test runs). Built from the database on first use, then kept current by
+    the same hooks that maintain the Postgres vector, once their transaction
+    commits: the index would otherwise keep a rolled back save. Scoring is
+    BM25 over field-weighted term frequencies.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._postings = defaultdict(dict)
+        self._documents = {}
+
+    def _document_terms(self, title, description, requirements, company_name):
+        terms = defaultdict(float)
+        for field, text in (
+            ('title', title),
+            ('company_name', company_name),
+            ('requirements', requirements),
+            ('description', description),
+        ):
+            weight = LABEL_SCORES[WEIGHTS[field]]
+            for token in tokenize(text):
+                terms[token] += weight
+        return terms
+
+    def _rows(self, queryset):
+        return queryset.values_list(
+            'pk', 'title', 'description', 'requirements', 'employer__company_name'
+        ).iterator(chunk_size=2000)
+
+    def _add(self, pk, *fields):
+        self._discard(pk)
+        terms = self._document_terms(*fields)
+        for term, frequency in terms.items():
+            self._postings[term][pk] = frequency
+        self._documents[pk] = (tuple(terms), sum(terms.values()))
+
+    def _discard(self, pk):
+        document = self._documents.pop(pk, None)
+        if document is None:
+            return
+        for term in document[0]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(pk, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _ensure_built(self):
+        if self._built:
+            return
+        with self._lock:
+            if not self._built:
+                for row in self._rows(Job.objects.all()):
+                    self._add(*row)
+                self._built = True
+
+    def scores(self, text):
+        self._ensure_built()
+        terms = set(tokenize(text))
+        with self._lock:
+            total = len(self._documents)
+            if not total or not terms:
+                return {}
+            average_length = sum(length for _, length in self._documents.values()) / total or 1.0
+            scores = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for pk, frequency in postings.items():
+                    length = self._documents[pk][1]
+                    norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[pk] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+    def search(self, queryset, text):
+        """
+        The best JOBS_SEARCH_MAX_RESULTS matches among ``queryset``, which is
+        filtered before ranking so that its filters never empty the results.
+        """
+        limit = getattr(settings, 'JOBS_SEARCH_MAX_RESULTS', 1000)
+        scores = self.scores(text)
+        candidates = list(scores)
+        listed = []
+        for offset in range(0, len(candidates), 500):
+            listed += queryset.filter(pk__in=candidates[offset:offset + 500]).values_list('pk', flat=True)
+        ranked = sorted(((pk, scores[pk]) for pk in listed), key=lambda item: -item[1])[:limit]
+        if not ranked:
+            return queryset.none()
+        rank = Case(
+            *[When(pk=pk, then=Value(score)) for pk, score in ranked],
+            output_field=FloatField(),
+        )
+        return (
+            queryset.filter(pk__in=[pk for pk, _ in ranked])
+            .annotate(rank=rank)
+            .order_by('-rank', '-created_at', 'id')
+        )
+
+    def index_jobs(self, job_ids):
+        job_ids = set(job_ids)
+        transaction.on_commit(lambda: self._index_jobs(job_ids))
+
+    def _index_jobs(self, job_ids):
+        if not self._built:
+            return
+        with self._lock:
+            found = set()
+            for row in self._rows(Job.objects.filter(pk__in=job_ids)):
+                self._add(*row)
+                found.add(row[0])
+            for pk in job_ids - found:
+                self._discard(pk)
+
+    def index_employer(self, employer_id):
+        transaction.on_commit(lambda: self._index_employer(employer_id))
+
+    def _index_employer(self, employer_id):
+        if not self._built:
+            return
+        with self._lock:
+            for row in self._rows(Job.objects.filter(employer_id=employer_id)):
+                self._add(*row)
+
+    def remove_jobs(self, job_ids):
+        job_ids = list(job_ids)
+        transaction.on_commit(lambda: self._remove_jobs(job_ids))
+
+    def _remove_jobs(self, job_ids):
+        with self._lock:
+            for pk in job_ids:
+                self._discard(pk)
+
+    def rebuild(self):
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._built = False
+        self._ensure_built()
+
+
+_postgres_backend = PostgresSearchBackend()
+_inverted_index_backend = InvertedIndexSearchBackend()
+
+
+def get_search_backend():
+    if connection.vendor == 'postgresql':
+        return _postgres_backend
+    return _inverted_index_backend
@@ -0,0 +1,179 @@
+"""
+Synthetic data at realistic volumes for benchmarks (``manage.py seed_data``).
+
+Employers, jobs, applicants and applications are inserted with bulk_create
+in batches, then indexed and counted as the signal handlers would have
+done. Volumes are skewed the way real boards are: a few employers post
+most jobs, a few cities hold most of them, and popular jobs draw most
+applications. The same ``random_seed`` gives the same data.
+"""
+import csv
+import random
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import matching, stats
+from .bulk import after_insert
+from .geo import GazetteerGeocoder, locate
+from .models import Applicant, Application, Employer, Job
+
+DEFAULT_PASSWORD = 'benchmark-password'
+
+LEVELS = ['Junior', 'Senior', 'Lead', 'Principal', 'Staff', 'Associate']
+ROLES = [
+    'Python Developer', 'Backend Engineer', 'Frontend Engineer', 'Data Analyst', 'Data Engineer',
+    'DevOps Engineer', 'Product Manager', 'QA Engineer', 'Mobile Developer', 'UX Designer',
+    'Accountant', 'Sales Executive', 'Marketing Specialist', 'Customer Support Agent', 'Nurse',
+]
+SKILLS = [
+    'python', 'django', 'postgresql', 'react', 'typescript', 'kotlin', 'swift', 'aws', 'docker',
+    'kubernetes', 'sql', 'excel', 'figma', 'selenium', 'spark', 'airflow', 'terraform', 'linux',
+    'accounting', 'sales', 'seo', 'communication', 'leadership', 'english', 'burmese', 'thai',
+]
+SCHOOLS = ['Yangon University', 'Mandalay Technological University', 'Chulalongkorn University', 'NUS']
+APPLICATION_STATUSES = [('PENDING', 60), ('REVIEWED', 20), ('SHORTLISTED', 8), ('REJECTED', 10), ('ACCEPTED', 2)]
+
+
+def _zipf_weights(count, exponent=1.0):
+    """Cumulative weights for ``random.choices``, falling off with rank."""
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def _places():
+    with open(GazetteerGeocoder.default_path, newline='', encoding='utf-8') as file:
+        return [row['name'] for row in csv.DictReader(file)]
+
+
+def _batches(objects, batch_size):
+    for start in range(0, len(objects), batch_size):
+        yield objects[start:start + batch_size]
+
+
+class Seeder:
+    def __init__(self, prefix='seed', random_seed=0, batch_size=None, password=DEFAULT_PASSWORD):
+        self.prefix = prefix
+        self.random = random.Random(random_seed)
+        self.batch_size = batch_size or getattr(settings, 'JOBS_BULK_BATCH_SIZE', 500)
+        self.password = make_password(password)
+        self.today = timezone.now().date()
+        self.places = _places()
+
+    def users(self, kind, count):
+        users = [
+            User(
+                username=f'{self.prefix}-{kind}-{number}', email=f'{self.prefix}-{kind}-{number}@example.com',
+                first_name=kind.title(), last_name=str(number), password=self.password,
+            )
+            for number in range(count)
+        ]
+        return User.objects.bulk_create(users, batch_size=self.batch_size)
+
+    def employers(self, count):
+        employers = [
+            Employer(
+                user=user, company_name=f'{self.random.choice(ROLES).split()[0]} Company {number}',
+                website=f'https://company{number}.example.com', description='A company that hires.',
+                location=self.random.choice(self.places),
+            )
+            for number, user in enumerate(self.users('employer', count))
+        ]
+        return Employer.objects.bulk_create(employers, batch_size=self.batch_size)
+
+    def jobs(self, employers, count):
+        places = self.places + ['Remote']
+        place_weights = _zipf_weights(len(places))
+        employer_weights = _zipf_weights(len(employers), 0.8)
+        job_types = [choice for choice, _ in Job.JOB_TYPE_CHOICES]
+        created = []
+        for batch in _batches(range(count), self.batch_size):
+            jobs = []
+            for _ in batch:
+                salary_min = Decimal(round(self.random.lognormvariate(7, 0.6), -1))
+                deadline = None
+                if self.random.random() < 0.8:
+                    deadline = self.today + timedelta(days=self.random.randint(-30, 90))
+                job = Job(
+                    employer=self.random.choices(employers, cum_weights=employer_weights)[0],
+                    title=f'{self.random.choice(LEVELS)} {self.random.choice(ROLES)}',
+                    description=' '.join(self.random.choices(SKILLS, k=30)),
+                    requirements=', '.join(self.random.sample(SKILLS, 5)),
+                    location=self.random.choices(places, cum_weights=place_weights)[0],
+                    salary_min=salary_min,
+                    salary_max=salary_min + Decimal(self.random.randrange(0, 2000, 50)),
+                    job_type=self.random.choices(job_types, [70, 15, 10, 5])[0],
+                    status=self.random.choices(['PUBLISHED', 'DRAFT', 'CLOSED'], [85, 10, 5])[0],
+                    deadline=deadline,
+                )
+                # bulk_create skips the pre_save geocoding
+                locate(job)
+                jobs.append(job)
+            created += Job.objects.bulk_create(jobs)
+        # Once for all batches: the summary is adjusted a group at a time
+        after_insert(created)
+        return created
+
+    def applicants(self, count):
+        applicants = [
+            Applicant(
+                user=user,
+                skills=', '.join(self.random.sample(SKILLS, 6)),
+                experience=f'{self.random.randint(0, 15)} years as {self.random.choice(ROLES)}',
+                education=self.random.choice(SCHOOLS),
+            )
+            for user in self.users('applicant', count)
+        ]
+        applicants = Applicant.objects.bulk_create(applicants, batch_size=self.batch_size)
+        matching.applicant_index.index([applicant.pk for applicant in applicants])
+        return applicants
+
+    def applications(self, jobs, applicants, count):
+        jobs = [job for job in jobs if job.status != 'DRAFT']
+        count = min(count, len(jobs) * len(applicants))
+        if not count:
+            return []
+        job_weights = _zipf_weights(len(jobs), 0.7)
+        statuses, status_weights = zip(*APPLICATION_STATUSES)
+        status_weights = list(accumulate(status_weights))
+        pairs = set()
+        while len(pairs) < count:
+            job = self.random.choices(jobs, cum_weights=job_weights)[0]
+            pairs.add((job.pk, self.random.choice(applicants).user_id))
+        applications = [
+            Application(
+                job_id=job_id, applicant_id=user_id, cover_letter='I would like to apply.',
+                status=self.random.choices(statuses, cum_weights=status_weights)[0],
+            )
+            for job_id, user_id in sorted(pairs)
+        ]
+        applications = Application.objects.bulk_create(applications, batch_size=self.batch_size)
+        # bulk_create skips the counters kept by the signal handlers
+        stats.rebuild_stats(sorted({job_id for job_id, _ in pairs}), batch_size=self.batch_size)
+        return applications
+
+
+def seed(employers=100, jobs=5000, applicants=2000, applications=20000, **options):
+    """
+    Create the given numbers of each, in one transaction. Raises ValueError
+    if users with the prefix exist already. Returns how many were created.
+    """
+    seeder = Seeder(**options)
+    if User.objects.filter(username__startswith=f'{seeder.prefix}-').exists():
+        raise ValueError(f"Users named {seeder.prefix}-... exist already; choose another prefix")
+    with transaction.atomic():
+        employer_rows = seeder.employers(employers)
+        job_rows = seeder.jobs(employer_rows, jobs) if employer_rows else []
+        applicant_rows = seeder.applicants(applicants)
+        application_rows = seeder.applications(job_rows, applicant_rows, applications)
+    return {
+        'employers': len(employer_rows),
+        'jobs': len(job_rows),
+        'applicants': len(applicant_rows),
+        'applications': len(application_rows),
+    }
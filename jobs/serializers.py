@@ -1,9 +1,18 @@
 from rest_framework import serializers
-from .models import Employer, Job, Application, Applicant, UserType
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import Employer, Job, Application, Applicant, JobApplicationStats, ResumeUpload, UserType
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.db import transaction
+from .eager_loading import EagerLoadingMixin
+from .fieldsets import SparseFieldsetMixin
+from .authentication import ROLE_CLAIM, EMPLOYER_ID_CLAIM, APPLICANT_ID_CLAIM
+from .routing import stick, user_client
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     user_type = serializers.ChoiceField(choices=UserType.choices, write_only=True)
     
@@ -27,22 +36,88 @@ class UserSerializer(serializers.ModelSerializer):
                 
         return user
 
-class ApplicantSerializer(serializers.ModelSerializer):
+def resume_upload_field():
+    # A finished chunked upload (see ResumeUploadSerializer), as an
+    # alternative to sending the resume file itself
+    return serializers.PrimaryKeyRelatedField(
+        queryset=ResumeUpload.objects.filter(status=ResumeUpload.COMPLETE),
+        write_only=True,
+        required=False
+    )
+
+class ResumeUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResumeUpload
+        fields = ["id", "filename", "content_type", "size", "received", "status", "created_at"]
+        read_only_fields = ["received", "status"]
+    
+    def validate_size(self, value):
+        limit = getattr(settings, 'JOBS_RESUME_MAX_BYTES', 10 * 1024 * 1024)
+        if value <= 0 or value > limit:
+            raise serializers.ValidationError(f"Resumes must be between 1 and {limit} bytes")
+        return value
+
+class UserSummarySerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ["id", "username", "first_name", "last_name"]
+
+class ApplicantSerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    select_related_fields = ['user']
+    resume_upload = resume_upload_field()
     
     class Meta:
         model = Applicant
-        fields = "__all__"
+        exclude = ["resume_text"]
+        read_only_fields = ["resume_status", "resume_thumbnail"]
 
-class EmployerSerializer(serializers.ModelSerializer):
+class EmployerSerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    select_related_fields = ['user']
     
     class Meta:
         model = Employer
         fields = "__all__"
 
-class JobSerializer(serializers.ModelSerializer):
+class EmployerSummarySerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Employer
+        fields = ["id", "company_name", "company_logo", "location"]
+
+# Loaded with every job even when not rendered: keyset pagination orders on
+# created_at, the response cache reads updated_at and the signal handlers
+# read status
+JOB_ALWAYS_LOAD = ['created_at', 'updated_at', 'status']
+
+class JobListSerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    """Compact job for listings: no description or requirements, and a summary of the employer"""
+    employer = EmployerSummarySerializer(read_only=True)
+    select_related_fields = ['employer']
+    always_load_fields = JOB_ALWAYS_LOAD
+    expandable_fields = {'employer': EmployerSerializer}
+    
+    class Meta:
+        model = Job
+        fields = [
+            "id", "title", "employer", "location", "latitude", "longitude", "salary_min", "salary_max",
+            "job_type", "status", "deadline", "created_at", "updated_at",
+        ]
+
+class JobSummarySerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    """The few job fields an application listing shows"""
+    employer = EmployerSummarySerializer(read_only=True)
+    select_related_fields = ['employer']
+    expandable_fields = {'employer': EmployerSerializer}
+    
+    class Meta:
+        model = Job
+        fields = ["id", "title", "employer", "location", "job_type", "status"]
+
+class JobSerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     employer = EmployerSerializer(read_only=True)
+    select_related_fields = ['employer']
+    always_load_fields = JOB_ALWAYS_LOAD
     employer_id = serializers.PrimaryKeyRelatedField(
         queryset=Employer.objects.all(),
         write_only=True,
@@ -51,11 +126,38 @@ class JobSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Job
-        fields = "__all__"
+        exclude = ["search_vector", "geohash"]
 
-class ApplicationSerializer(serializers.ModelSerializer):
+class EmployerJobSerializer(JobSerializer):
+    """A job as its own employer sees it, with application counts per status"""
+    stats = serializers.SerializerMethodField()
+    select_related_fields = ['employer', 'application_stats']
+    
+    def get_stats(self, job):
+        # No counters row until the first application arrives
+        stats = getattr(job, 'application_stats', None) or JobApplicationStats()
+        return stats.counts()
+
+class JobImportSerializer(JobSerializer):
+    # The employer comes from the importer, not from each row
+    employer_id = None
+
+
+class RecommendedJobSerializer(JobListSerializer):
+    """A job matched to the applicant's profile, with its similarity score"""
+    score = serializers.FloatField(read_only=True)
+    
+    class Meta(JobListSerializer.Meta):
+        fields = [*JobListSerializer.Meta.fields, "score"]
+
+class RecommendedApplicantSerializer(ApplicantSerializer):
+    """An applicant matched to a job, with their similarity score"""
+    score = serializers.FloatField(read_only=True)
+
+class ApplicationSerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     applicant = UserSerializer(read_only=True)
     job = JobSerializer(read_only=True)
+    select_related_fields = ['applicant', 'job']
     job_id = serializers.PrimaryKeyRelatedField(
         queryset=Job.objects.all(),
         write_only=True,
@@ -64,8 +166,95 @@ class ApplicationSerializer(serializers.ModelSerializer):
     )
     cover_letter = serializers.CharField(required=False)
     resume = serializers.FileField(required=False)
-    status = serializers.CharField(required=False)
+    resume_upload = resume_upload_field()
+    status = serializers.ChoiceField(choices=Application.STATUS_CHOICES, required=False)
     
     class Meta:
         model = Application
-        fields = "__all__"
\ No newline at end of file
+        exclude = ["resume_text"]
+        read_only_fields = ["resume_status", "resume_thumbnail"]
+
+class ApplicationListSerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    """Compact application for listings: no cover letter, and summaries of the job and applicant"""
+    applicant = UserSummarySerializer(read_only=True)
+    job = JobSummarySerializer(read_only=True)
+    select_related_fields = ['applicant', 'job']
+    # Ordering, and what the signal handlers read
+    always_load_fields = ['job', 'status', 'applied_at']
+    expandable_fields = {'applicant': UserSerializer, 'job': JobSerializer}
+    
+    class Meta:
+        model = Application
+        fields = ["id", "job", "applicant", "status", "resume", "resume_status", "resume_thumbnail", "applied_at"]
+
+class ApplicationStatusUpdateSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=Application.STATUS_CHOICES)
+
+
+class ApplicationFilterSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Application.STATUS_CHOICES, required=False)
+    applied_after = serializers.DateTimeField(required=False)
+    applied_before = serializers.DateTimeField(required=False)
+
+
+class BulkApplicationStatusSerializer(serializers.Serializer):
+    """
+    Either ``updates``, a list of ``{id, status}``, or a ``filter`` selecting
+    applications of the job together with the target ``status``.
+    """
+    updates = ApplicationStatusUpdateSerializer(many=True, required=False)
+    filter = ApplicationFilterSerializer(required=False)
+    status = serializers.ChoiceField(choices=Application.STATUS_CHOICES, required=False)
+    
+    def validate_updates(self, value):
+        limit = getattr(settings, 'JOBS_BULK_UPDATE_MAX', 1000)
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} updates per request")
+        ids = [update['id'] for update in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Each application id may only appear once")
+        return value
+    
+    def validate(self, attrs):
+        if 'updates' in attrs:
+            if 'filter' in attrs or 'status' in attrs:
+                raise serializers.ValidationError("Send either updates or filter and status, not both")
+        elif 'filter' not in attrs or 'status' not in attrs:
+            raise serializers.ValidationError("Send updates, or filter together with status")
+        return attrs
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Embeds the user's role and profile ids so tokens can be used statelessly."""
+    
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        employer = Employer.objects.filter(user=user).values_list('pk', flat=True).first()
+        applicant = None if employer else Applicant.objects.filter(user=user).values_list('pk', flat=True).first()
+        token[ROLE_CLAIM] = UserType.EMPLOYER if employer else UserType.APPLICANT if applicant else None
+        token[EMPLOYER_ID_CLAIM] = employer
+        token[APPLICANT_ID_CLAIM] = applicant
+        token['username'] = user.username
+        return token
+    
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        # Read the new user (and last_login) from the primary until replicas catch up
+        stick(user_client(self.user.pk))
+        return data
+
+
+class LogoutSerializer(serializers.Serializer):
+    """The caller's refresh token, if it is to be blacklisted too"""
+    refresh = serializers.CharField(required=False)
+    
+    def validate_refresh(self, value):
+        try:
+            token = RefreshToken(value)
+        except TokenError as exc:
+            raise serializers.ValidationError(str(exc))
+        if str(token.get(api_settings.USER_ID_CLAIM)) != str(self.context['request'].user.pk):
+            raise serializers.ValidationError("Not a token of yours")
+        return token
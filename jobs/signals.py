@@ -0,0 +1,209 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import invalidate_jobs
+from .models import Applicant, Application, Employer, Job
+from .revocation import revoke_password_hash, revoke_user
+from .search import get_search_backend
+from . import diagnostics, facets, geo, matching, metrics, stats
+
+
+def _is_public(job):
+    return job.__dict__.get('status') == 'PUBLISHED'
+
+
+@receiver(post_init, sender=Job)
+def remember_job_status(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred status is not fetched for every row
+    instance._was_public = _is_public(instance)
+    instance._loaded_location = instance.__dict__.get('location')
+    instance._facet_key = facets.job_key(instance)
+
+
+@receiver(pre_save, sender=Job)
+def geocode_job(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Saves of chosen fields, or with location deferred, leave it unchanged
+    if raw or update_fields is not None or 'location' not in instance.__dict__:
+        return
+    if instance.location != instance._loaded_location or instance.__dict__.get('geohash') is None:
+        geo.locate(instance)
+
+
+@receiver(post_save, sender=Job)
+def index_saved_job(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    get_search_backend().index_jobs([instance.pk])
+
+
+@receiver(post_save, sender=Job)
+def match_saved_job(sender, instance, raw=False, **kwargs):
+    # The index is in memory, and would keep a rolled back save
+    if raw:
+        return
+    transaction.on_commit(lambda: matching.job_index.index_instance(instance))
+
+
+@receiver(pre_save, sender=Job)
+@receiver(pre_delete, sender=Job)
+def load_facet_key(sender, instance, raw=False, **kwargs):
+    # Look up what a job loaded with facet fields deferred counted towards
+    if not raw and instance.pk is not None and instance._facet_key is facets.UNKNOWN:
+        instance._facet_key = facets.stored_key(instance.pk)
+
+
+@receiver(post_save, sender=Job)
+def count_saved_job_facets(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    key = facets.job_key(instance)
+    if key is facets.UNKNOWN:
+        key = facets.stored_key(instance.pk)
+    facets.move(None if created else instance._facet_key, key)
+    instance._facet_key = key
+
+
+@receiver(post_save, sender=Job)
+def invalidate_saved_job(sender, instance, raw=False, **kwargs):
+    listed = instance._was_public or _is_public(instance)
+    instance._was_public = _is_public(instance)
+    instance._loaded_location = instance.__dict__.get('location')
+    transaction.on_commit(lambda: invalidate_jobs([instance.pk], listings=listed))
+
+
+@receiver(post_delete, sender=Job)
+def unindex_deleted_job(sender, instance, **kwargs):
+    get_search_backend().remove_jobs([instance.pk])
+
+
+@receiver(post_delete, sender=Job)
+def unmatch_deleted_job(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: matching.job_index.remove([pk]))
+
+
+@receiver(post_delete, sender=Job)
+def uncount_deleted_job_facets(sender, instance, **kwargs):
+    facets.move(instance._facet_key, None)
+
+
+@receiver(post_delete, sender=Job)
+def invalidate_deleted_job(sender, instance, **kwargs):
+    pk, listed = instance.pk, instance._was_public
+    transaction.on_commit(lambda: invalidate_jobs([pk], listings=listed))
+
+
+@receiver(post_save, sender=Employer)
+def reindex_employer_jobs(sender, instance, created=False, raw=False, **kwargs):
+    # Company name is part of every job's search document
+    if raw or created:
+        return
+    get_search_backend().index_employer(instance.pk)
+
+
+@receiver(post_save, sender=Employer)
+def invalidate_employer_jobs(sender, instance, created=False, raw=False, **kwargs):
+    # Job responses embed the employer, so its jobs go stale with it
+    if raw or created:
+        return
+    job_ids = list(instance.jobs.values_list('pk', flat=True))
+    if job_ids:
+        transaction.on_commit(lambda: invalidate_jobs(job_ids))
+
+
+@receiver(post_save, sender=Applicant)
+def match_saved_applicant(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(lambda: matching.applicant_index.index_instance(instance))
+
+
+@receiver(post_delete, sender=Applicant)
+def unmatch_deleted_applicant(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: matching.applicant_index.remove([pk]))
+
+
+@receiver(post_init, sender=User)
+def remember_user_credentials(sender, instance, **kwargs):
+    instance._loaded_password = instance.__dict__.get('password')
+    instance._loaded_is_active = instance.__dict__.get('is_active')
+
+
+@receiver(post_save, sender=User)
+def revoke_stale_tokens(sender, instance, created=False, raw=False, **kwargs):
+    # Stateless authentication never sees the user row, so tokens issued
+    # against an old password or a now inactive account are revoked here
+    if raw or created:
+        return
+    old_password = instance._loaded_password
+    if old_password and old_password != instance.password:
+        revoke_password_hash(get_md5_hash_password(old_password))
+    if instance._loaded_is_active and not instance.is_active:
+        revoke_user(instance.pk)
+    instance._loaded_password = instance.password
+    instance._loaded_is_active = instance.is_active
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    # Stateless authentication would otherwise go on accepting them
+    revoke_user(instance.pk)
+
+
+@receiver(post_init, sender=Application)
+def remember_application_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.__dict__.get('status')
+    instance._loaded_job_id = instance.__dict__.get('job_id')
+
+
+@receiver(pre_save, sender=Application)
+@receiver(pre_delete, sender=Application)
+def load_application_status(sender, instance, raw=False, **kwargs):
+    # Look up what an application loaded with status or job deferred counted towards
+    if raw or instance.pk is None:
+        return
+    if instance._loaded_status is None or instance._loaded_job_id is None:
+        stored = Application.objects.filter(pk=instance.pk).values('status', 'job_id').first()
+        if stored is not None:
+            instance._loaded_status, instance._loaded_job_id = stored['status'], stored['job_id']
+
+
+@receiver(post_save, sender=Application)
+def count_saved_application(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.adjust(instance.job_id, {instance.status: 1})
+    elif instance._loaded_job_id != instance.job_id:
+        stats.adjust(instance._loaded_job_id, {instance._loaded_status: -1}, create=False)
+        stats.adjust(instance.job_id, {instance.status: 1})
+    elif instance._loaded_status != instance.status:
+        stats.apply_transitions(instance.job_id, [(instance._loaded_status, instance.status)])
+    instance._loaded_status = instance.status
+    instance._loaded_job_id = instance.job_id
+
+
+@receiver(post_delete, sender=Application)
+def count_deleted_application(sender, instance, **kwargs):
+    # When the whole job is being deleted its counters are going too
+    stats.adjust(instance._loaded_job_id, {instance._loaded_status: -1}, create=False)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    # Does nothing outside requests sampled by jobs.metrics. The wrapper
+    # outlives its connections, so reconnecting must not add it again.
+    if metrics.time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.time_query)
+
+
+@receiver(connection_created)
+def inspect_queries(sender, connection, **kwargs):
+    # Does nothing outside requests inspected by jobs.diagnostics
+    if diagnostics.inspect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(diagnostics.inspect_query)
@@ -0,0 +1,107 @@
+from collections import Counter
+
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Application, Job, JobApplicationStats
+
+STATUS_FIELDS = JobApplicationStats.STATUS_FIELDS
+
+
+def adjust(job_id, deltas, create=True):
+    """
+    Add ``deltas`` (``{status: change}``) to a job's counters in one UPDATE.
+    Run it in the transaction that changed the applications. Statuses
+    without a counter (None, or anything not in Application.STATUS_CHOICES)
+    are not counted.
+    """
+    changes = {STATUS_FIELDS[status]: delta for status, delta in deltas.items() if delta and status in STATUS_FIELDS}
+    if not changes:
+        return
+    increments = {field: F(field) + delta for field, delta in changes.items()}
+    updated = JobApplicationStats.objects.filter(job_id=job_id).update(updated_at=timezone.now(), **increments)
+    if not updated and create:
+        # No row yet: the job has no applications but this one (rows exist
+        # for every job that had any, see migration 0009). Insert it empty,
+        # leaving it be if a concurrent first application got there first
+        # (the insert waits for that one to commit), then count this one.
+        JobApplicationStats.objects.bulk_create([JobApplicationStats(job_id=job_id)], ignore_conflicts=True)
+        JobApplicationStats.objects.filter(job_id=job_id).update(updated_at=timezone.now(), **increments)
+
+
+def apply_transitions(job_id, transitions):
+    """Adjust a job's counters for ``(old_status, new_status)`` pairs."""
+    deltas = Counter()
+    for old, new in transitions:
+        deltas[old] -= 1
+        deltas[new] += 1
+    adjust(job_id, deltas)
+
+
+def count_applications(job_ids):
+    """Current counts per status for each job, straight from the applications."""
+    rows = Application.objects.filter(job_id__in=job_ids).values('job_id').annotate(**{
+        field: Count('pk', filter=Q(status=status)) for status, field in STATUS_FIELDS.items()
+    })
+    counts = {job_id: dict.fromkeys(STATUS_FIELDS.values(), 0) for job_id in job_ids}
+    for row in rows.order_by():
+        counts[row.pop('job_id')] = row
+    return counts
+
+
+def rebuild_stats(job_ids=None, batch_size=500):
+    """
+    Recount the counters of the given jobs, or of every job, in batches.
+    Returns the number of jobs recounted.
+    """
+    if job_ids is None:
+        job_ids = Job.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size)
+    total = 0
+    batch = []
+    for job_id in job_ids:
+        batch.append(job_id)
+        if len(batch) == batch_size:
+            total += _rebuild_batch(batch)
+            batch = []
+    if batch:
+        total += _rebuild_batch(batch)
+    return total
+
+
+def _rebuild_batch(job_ids):
+    now = timezone.now()
+    rows = [
+        JobApplicationStats(job_id=job_id, updated_at=now, **counts)
+        for job_id, counts in count_applications(job_ids).items()
+    ]
+    JobApplicationStats.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['job'],
+        update_fields=[*STATUS_FIELDS.values(), 'updated_at'],
+    )
+    return len(rows)
+
+
+def employer_dashboard(employer_id):
+    """
+    Each of the employer's jobs with its counters, plus totals across all of
+    them, from a single query.
+    """
+    fields = list(STATUS_FIELDS.values())
+    rows = Job.objects.filter(employer_id=employer_id).values(
+        'id', 'title', 'status', 'created_at', *[f'application_stats__{field}' for field in fields],
+    )
+    totals = dict.fromkeys([*fields, 'total'], 0)
+    jobs_by_status = Counter()
+    jobs = []
+    for row in rows:
+        counts = {field: row.pop(f'application_stats__{field}') or 0 for field in fields}
+        counts['total'] = sum(counts.values())
+        for field, value in counts.items():
+            totals[field] += value
+        jobs_by_status[row['status']] += 1
+        jobs.append({**row, 'stats': counts})
+    return {
+        'jobs_by_status': {status: jobs_by_status[status] for status, _ in Job.STATUS_CHOICES},
+        'applications': totals,
+        'jobs': jobs,
+    }
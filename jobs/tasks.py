@@ -0,0 +1,224 @@
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_failure_handlers = {}
+
+
+def task(name, on_failure=None):
+    """
+    Register a function as the handler for tasks called ``name``.
+    ``on_failure`` is called with the same payload once a task has used up
+    all its attempts, to clean up after it.
+    """
+    def decorator(func):
+        _registry[name] = func
+        if on_failure is not None:
+            _failure_handlers[name] = on_failure
+        return func
+    return decorator
+
+
+def get_handler(name):
+    if name not in _registry:
+        # Handlers register themselves on import
+        from . import resumes  # noqa: F401
+    return _registry[name]
+
+
+def _eager():
+    return getattr(settings, 'JOBS_TASKS_EAGER', False)
+
+
+def enqueue(name, delay=None, max_attempts=None, **payload):
+    """
+    Queue a task. The row is written in the caller's transaction, so the
+    task only becomes visible to workers if that transaction commits.
+
+    With ``JOBS_TASKS_EAGER`` the task instead runs in-process once the
+    transaction commits, which keeps development and tests free of a worker.
+    """
+    run_after = timezone.now() + (delay or timedelta())
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'JOBS_TASK_MAX_ATTEMPTS', 3)
+    item = Task.objects.create(name=name, payload=payload, run_after=run_after, max_attempts=max_attempts)
+    if _eager():
+        transaction.on_commit(lambda: run_task(claim_task(item.pk)))
+    return item
+
+
+def _lease():
+    return timedelta(seconds=getattr(settings, 'JOBS_TASK_LEASE_SECONDS', 300))
+
+
+def _ready(now):
+    # Queued tasks that are due, plus running ones whose worker died holding them
+    return Task.objects.filter(status=Task.QUEUED, run_after__lte=now) | Task.objects.filter(
+        status=Task.RUNNING, locked_until__lt=now,
+    )
+
+
+def _lock(queryset):
+    if connection.features.has_select_for_update_skip_locked:
+        return queryset.select_for_update(skip_locked=True)
+    return queryset
+
+
+def claim_tasks(limit):
+    """
+    Mark up to ``limit`` due tasks as running and return them. Workers never
+    claim the same task: rows are locked with SKIP LOCKED where the database
+    supports it, and the conditional UPDATE guards the rest.
+    """
+    now = timezone.now()
+    claimed = []
+    with transaction.atomic():
+        candidates = list(_lock(_ready(now).order_by('run_after', 'id'))[:limit])
+        for item in candidates:
+            updated = Task.objects.filter(pk=item.pk, status=item.status, attempts=item.attempts).update(
+                status=Task.RUNNING, attempts=item.attempts + 1, locked_until=now + _lease(), updated_at=now,
+            )
+            if updated:
+                item.status = Task.RUNNING
+                item.attempts += 1
+                claimed.append(item)
+    return claimed
+
+
+def claim_task(pk):
+    now = timezone.now()
+    updated = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+        status=Task.RUNNING, attempts=1, locked_until=now + _lease(), updated_at=now,
+    )
+    return Task.objects.get(pk=pk) if updated else None
+
+
+def _backoff(attempts):
+    base = getattr(settings, 'JOBS_TASK_RETRY_DELAY', 30)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def _give_up(item):
+    handler = _failure_handlers.get(item.name)
+    if handler is None:
+        return
+    try:
+        handler(**item.payload)
+    except Exception:
+        logger.exception("Cleaning up after failed task %s failed", item)
+
+
+def run_task(item):
+    """Run a claimed task and record how it went. Never raises."""
+    if item is None:
+        return
+    try:
+        get_handler(item.name)(**item.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception("Task %s failed (attempt %s of %s)", item, item.attempts, item.max_attempts)
+        if item.attempts < item.max_attempts:
+            Task.objects.filter(pk=item.pk).update(
+                status=Task.QUEUED, run_after=timezone.now() + _backoff(item.attempts),
+                locked_until=None, last_error=error, updated_at=timezone.now(),
+            )
+        else:
+            Task.objects.filter(pk=item.pk).update(
+                status=Task.FAILED, locked_until=None, last_error=error, updated_at=timezone.now(),
+            )
+            _give_up(item)
+    else:
+        Task.objects.filter(pk=item.pk).update(status=Task.DONE, locked_until=None, updated_at=timezone.now())
+
+
+class Worker:
+    """
+    Polls the task table and runs tasks on a pool of threads. Each thread has
+    its own database connection, closed after every task.
+    """
+
+    def __init__(self, concurrency=None, poll_interval=None):
+        self.concurrency = concurrency or getattr(settings, 'JOBS_WORKER_CONCURRENCY', 4)
+        self.poll_interval = poll_interval or getattr(settings, 'JOBS_WORKER_POLL_SECONDS', 1.0)
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, item):
+        close_old_connections()
+        try:
+            run_task(item)
+        finally:
+            connections.close_all()
+
+    def housekeeping(self):
+        from .resumes import housekeeping
+
+        try:
+            housekeeping()
+        except Exception:
+            logger.exception("Worker housekeeping failed")
+
+    def lifecycle(self):
+        from .lifecycle import run_lifecycle
+
+        try:
+            run_lifecycle()
+        except Exception:
+            logger.exception("Job lifecycle run failed")
+
+    def run(self, once=False):
+        """Run until stopped, or with ``once`` until no task is due."""
+        logger.info("Worker %s started with %s threads", self.name, self.concurrency)
+        interval = getattr(settings, 'JOBS_WORKER_HOUSEKEEPING_SECONDS', 3600)
+        lifecycle_interval = getattr(settings, 'JOBS_LIFECYCLE_SECONDS', 60)
+        last_housekeeping = last_lifecycle = None
+        if lifecycle_interval:
+            from .lifecycle import check_cache
+
+            check_cache()
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='jobs-worker') as pool:
+            while not self._stop.is_set():
+                if last_housekeeping is None or time.monotonic() - last_housekeeping > interval:
+                    self.housekeeping()
+                    last_housekeeping = time.monotonic()
+                if lifecycle_interval and (last_lifecycle is None or time.monotonic() - last_lifecycle > lifecycle_interval):
+                    self.lifecycle()
+                    last_lifecycle = time.monotonic()
+
+                free = self.concurrency - len(running)
+                claimed = claim_tasks(free) if free else []
+                for item in claimed:
+                    running.add(pool.submit(self._run, item))
+
+                if once and not claimed and not running:
+                    break
+                if running:
+                    _, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    running = set(running)
+                elif not claimed:
+                    self._stop.wait(self.poll_interval)
+            wait(running)
+        logger.info("Worker %s stopped", self.name)
+
+
+def purge_tasks(older_than):
+    """Delete finished tasks last touched before ``older_than``."""
+    return Task.objects.filter(status=Task.DONE, updated_at__lt=older_than).delete()[0]
@@ -0,0 +1,32 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountAssertionsMixin:
+    """
+    TestCase mixin for catching N+1 regressions on list endpoints.
+    """
+
+    def assertConstantQueryCount(self, client, url, add_rows, **extra):
+        """
+        GET ``url``, call ``add_rows()`` to grow the data set, then GET ``url``
+        again. Both requests must issue the same number of queries.
+        """
+        with CaptureQueriesContext(connection) as before:
+            response = client.get(url, **extra)
+        self.assertEqual(response.status_code, 200, response.content)
+
+        add_rows()
+
+        with CaptureQueriesContext(connection) as after:
+            response = client.get(url, **extra)
+        self.assertEqual(response.status_code, 200, response.content)
+
+        self.assertEqual(
+            len(before), len(after),
+            "%s issued %d queries before adding rows and %d after:\n%s" % (
+                url, len(before), len(after),
+                "\n".join(query['sql'] for query in after.captured_queries),
+            ),
+        )
+        return len(after)
@@ -1,3 +1,1726 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from base64 import b64encode
+from importlib import import_module
+from io import StringIO
+from datetime import timedelta
+from itertools import combinations, count
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, connections, router, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import AsyncClient, AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from jobboard.settings import database_from_url
+
+from .models import Employer, Job, Application, Applicant, JobApplicationStats, JobFacetCount, ResumeUpload, RevokedToken, Task
+from .benchmarking import ENDPOINTS, uncovered_urls
+from .cache import get_cache_backend
+from .diagnostics import QueryProblem, diagnose, fingerprint, inspect_query, read_log
+from .metrics import registry, time_query
+from .pagination import JobKeysetPagination
+from .preload import check_shared_state
+from .revocation import purge_revocations, revocation_cache, revoke_user, token_hashes
+from .routing import ReplicaRoutingMiddleware
+from .seeding import seed
+from .search import get_search_backend
+from .serializers import JobListSerializer, JobSerializer
+from .testing import QueryCountAssertionsMixin
+from . import async_views, bulk, facets, fastpath, geo, lifecycle, matching, resumes, stats, tasks, views
+
+_sequence = count()
+
+
+def make_employer():
+    n = next(_sequence)
+    user = User.objects.create(username=f"employer{n}")
+    return Employer.objects.create(user=user, company_name=f"Company {n}")
+
+
+def make_applicant():
+    n = next(_sequence)
+    user = User.objects.create(username=f"applicant{n}")
+    Applicant.objects.create(user=user)
+    return user
+
+
+def make_job(employer, **kwargs):
+    kwargs.setdefault('title', 'Engineer')
+    kwargs.setdefault('description', 'Build things')
+    kwargs.setdefault('location', 'Yangon')
+    kwargs.setdefault('salary_min', 1000)
+    kwargs.setdefault('status', 'PUBLISHED')
+    return Job.objects.create(employer=employer, **kwargs)
+
+
+@override_settings(JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.NullCacheBackend'})
+class ListQueryCountTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.employer = make_employer()
+        self.job = make_job(self.employer)
+
+    def add_applications(self, job=None, n=3):
+        for _ in range(n):
+            Application.objects.create(job=job or self.job, applicant=make_applicant(), cover_letter="Hi")
+
+    def test_job_list(self):
+        self.assertConstantQueryCount(
+            self.client, '/api/v1/jobs/',
+            lambda: [make_job(make_employer()) for _ in range(3)],
+        )
+
+    @override_settings(JOBS_FAST_PATH=[])
+    def test_sparse_job_list_loads_the_ordering(self):
+        for n in range(3):
+            make_job(self.employer, deadline=timezone.now().date() + timedelta(days=n + 1), salary_min=1000 + n)
+        for ordering in JobKeysetPagination.ordering_choices:
+            with self.subTest(ordering=ordering):
+                with CaptureQueriesContext(connection) as full:
+                    self.client.get(f'/api/v1/jobs/?ordering={ordering}&page_size=2')
+                with CaptureQueriesContext(connection) as sparse:
+                    response = self.client.get(f'/api/v1/jobs/?ordering={ordering}&page_size=2&fields=id,title')
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertIsNotNone(response.data['next'])
+                self.assertEqual(len(sparse), len(full))
+
+    def test_applicant_list(self):
+        self.client.force_authenticate(self.employer.user)
+        self.assertConstantQueryCount(
+            self.client, '/api/v1/applicants/',
+            lambda: [make_applicant() for _ in range(3)],
+        )
+
+    def test_employer_application_lists(self):
+        self.client.force_authenticate(self.employer.user)
+        self.assertConstantQueryCount(self.client, '/api/v1/applications/', self.add_applications)
+        self.assertConstantQueryCount(
+            self.client, f'/api/v1/jobs/{self.job.pk}/applications/', self.add_applications,
+        )
+
+    def test_applicant_application_list(self):
+        applicant = make_applicant()
+        self.client.force_authenticate(applicant)
+
+        def apply_elsewhere():
+            for _ in range(3):
+                Application.objects.create(job=make_job(make_employer()), applicant=applicant, cover_letter="Hi")
+
+        self.assertConstantQueryCount(self.client, '/api/v1/applications/', apply_elsewhere)
+
+
+class JobListQueryPlanTests(TestCase):
+    """
+    Every combination of job list filters and orderings reads its rows in
+    order along an index. Without statistics, SQLite would rather seek a
+    salary band in the salary index and sort it than read another ordering's
+    index and filter it: both use an index, but no single index can serve
+    both.
+    """
+    filters = [
+        'job_type=CONTRACT',
+        'location=Yangon',
+        'salary_gte=1000&salary_lte=5000',
+        'deadline_after=2030-01-01',
+        'include_expired=true',
+    ]
+
+    def explain(self, query, **options):
+        call_command(
+            'explain_views', view=['job-list'], query=query,
+            no_seqscan=True, fail=True, stdout=StringIO(), **options,
+        )
+
+    def test_orderings_read_an_index_in_order(self):
+        for ordering in JobKeysetPagination.ordering_choices:
+            for query in [f'ordering={ordering}', f'ordering={ordering}&include_expired=true']:
+                with self.subTest(query=query):
+                    self.explain(query, no_sort=True)
+
+    def test_filters_and_orderings(self):
+        for ordering in JobKeysetPagination.ordering_choices:
+            for size in range(len(self.filters) + 1):
+                for chosen in combinations(self.filters, size):
+                    query = '&'.join([f'ordering={ordering}', *chosen])
+                    sorts_band = (
+                        connection.vendor == 'sqlite' and 'salary_gte' in query
+                        and ordering.lstrip('-') != 'salary_min'
+                    )
+                    with self.subTest(query=query):
+                        self.explain(query, no_sort=not sorts_band)
+
+
+@override_settings(JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.LRUCacheBackend', 'MAX_ENTRIES': 100, 'TIMEOUT': 300})
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.employer = make_employer()
+        self.job = make_job(self.employer)
+
+    def test_hit_and_invalidation(self):
+        url = f'/api/v1/jobs/{self.job.pk}/'
+        self.assertEqual(self.client.get(url).data['title'], 'Engineer')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data['title'], 'Engineer')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.job.title = 'Welder'
+            self.job.save()
+        self.assertEqual(self.client.get(url).data['title'], 'Welder')
+
+    def test_not_modified(self):
+        url = f'/api/v1/jobs/{self.job.pk}/'
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_validators_follow_the_list_version(self):
+        make_job(self.employer, title='Welder')
+        response = self.client.get('/api/v1/jobs/')
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/v1/jobs/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Takes a job off the list without touching the rows left on it
+        with self.captureOnCommitCallbacks(execute=True):
+            self.job.delete()
+        response = self.client.get('/api/v1/jobs/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([job['title'] for job in response.data['results']], ['Welder'])
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'shared': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    })
+    def test_several_workers_need_a_shared_cache(self):
+        check_shared_state(1)
+        with self.assertRaises(ImproperlyConfigured):
+            check_shared_state(2)
+        for alias, shared in (('default', False), ('shared', True)):
+            with self.settings(JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.DjangoCacheBackend', 'CACHE_ALIAS': alias}):
+                self.assertIs(get_cache_backend().shared, shared)
+
+
+# Separate cache instances over one directory, like workers sharing Redis
+SHARED_CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'jobs-tests-shared-cache'),
+    }
+    for alias in ('default', 'worker_2')
+}
+
+
+@override_settings(JOBS_DATABASE_REPLICAS=['replica_1'], CACHES=SHARED_CACHES)
+class ReplicaRoutingTests(TestCase):
+    """Where reads go; no query is made, so the replica need not exist."""
+
+    def setUp(self):
+        cache.clear()
+
+    def route(self, method, user=None, status=200):
+        """The database a request's views would read from."""
+        seen = []
+
+        def view(request):
+            seen.append(router.db_for_read(Job))
+            return HttpResponse(status=status)
+
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'} if user else {}
+        request = getattr(RequestFactory(), method)('/api/v1/jobs/', **headers)
+        ReplicaRoutingMiddleware(view)(request)
+        return seen[0]
+
+    def test_reads(self):
+        self.assertEqual(self.route('get'), 'replica_1')
+        self.assertEqual(self.route('head'), 'replica_1')
+        self.assertEqual(self.route('post'), 'default')
+        self.assertEqual(router.db_for_read(Job), 'default')
+        self.assertEqual(router.db_for_write(Job), 'default')
+
+    @override_settings(JOBS_DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.assertEqual(self.route('get'), 'default')
+
+    def test_writer_reads_from_primary(self):
+        writer, other = make_applicant(), make_applicant()
+        self.route('post', writer, status=400)
+        self.assertEqual(self.route('get', writer), 'replica_1')
+        self.route('post', writer, status=201)
+        self.assertEqual(self.route('get', writer), 'default')
+        self.assertEqual(self.route('get', other), 'replica_1')
+        self.assertEqual(self.route('get'), 'replica_1')
+
+    def test_writer_reads_from_primary_in_other_workers(self):
+        writer = make_applicant()
+        self.route('post', writer, status=201)
+        with self.settings(JOBS_REPLICA_STICKY_CACHE='worker_2'):
+            self.assertEqual(self.route('get', writer), 'default')
+
+    def test_sticky_cache_must_be_shared(self):
+        per_process = {
+            alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': alias}
+            for alias in ('default', 'worker_2')
+        }
+        with self.settings(CACHES=per_process):
+            with self.assertRaises(ImproperlyConfigured):
+                ReplicaRoutingMiddleware(HttpResponse)
+            with self.settings(JOBS_DATABASE_REPLICAS=[]):
+                ReplicaRoutingMiddleware(HttpResponse)
+
+    def test_login_reads_from_primary(self):
+        user = make_applicant()
+        user.set_password('secret-pass-1')
+        user.save()
+        response = APIClient().post('/api/token/', {'username': user.username, 'password': 'secret-pass-1'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.route('get', user), 'default')
+
+
+class BenchmarkTests(TestCase):
+    """Every endpoint answers the benchmark's requests as expected."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(employers=3, jobs=30, applicants=10, applications=40, prefix='bench')
+        # The in-process search index (SQLite) is only kept current on commit
+        get_search_backend().rebuild()
+
+    def benchmark(self, *args):
+        output = tempfile.NamedTemporaryFile(suffix='.json')
+        self.addCleanup(output.close)
+        # The command builds the matching indexes from this test's data
+        self.addCleanup(matching.job_index.clear)
+        self.addCleanup(matching.applicant_index.clear)
+        call_command('benchmark_api', '--requests=2', '--warmup=0', f'--output={output.name}', *args, stdout=StringIO(), stderr=StringIO())
+        with open(output.name) as file:
+            return json.load(file), output.name
+
+    def test_every_endpoint(self):
+        self.assertEqual(uncovered_urls(), [])
+        results, _ = self.benchmark()
+        self.assertEqual(list(results['endpoints']), [endpoint.name for endpoint in ENDPOINTS])
+        for name, summary in results['endpoints'].items():
+            with self.subTest(endpoint=name):
+                self.assertEqual(summary['errors'], 0)
+                self.assertGreater(summary['queries'], 0)
+
+    def test_compare(self):
+        results, path = self.benchmark('--only=GET job-list')
+        results['endpoints']['GET job-list']['queries'] -= 1
+        with open(path, 'w') as file:
+            json.dump(results, file)
+        with self.assertRaisesMessage(CommandError, "1 regressions"):
+            self.benchmark('--only=GET job-list', f'--compare={path}', '--min-ms=10000')
+
+
+@override_settings(JOBS_METRICS=True, JOBS_METRICS_SAMPLE_RATE=1.0, JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.NullCacheBackend'})
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.job = make_job(make_employer())
+
+    def test_sampled_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(f'/api/v1/jobs/{self.job.pk}/')
+        phases = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(phases, ['db', 'serialize', 'render', 'total'])
+        self.assertIn(f'desc="{len(queries)} quer', response['Server-Timing'])
+
+        metrics = APIClient().get('/metrics').content.decode()
+        self.assertIn('jobs_requests_total{route="job-detail",method="GET",status="200"} 1', metrics)
+        self.assertIn('jobs_request_db_queries_count{route="job-detail",method="GET"} 1', metrics)
+        self.assertIn('jobs_request_duration_seconds_bucket{route="job-detail",method="GET",le="+Inf"} 1', metrics)
+
+    async def test_async_request(self):
+        response = await AsyncClient().get(f'/api/v1/jobs/{self.job.pk}/')
+        self.assertEqual(response.status_code, 200)
+        phases = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(phases, ['db', 'serialize', 'render', 'total'])
+
+    @override_settings(JOBS_METRICS_SAMPLE_RATE=0)
+    def test_unsampled_request_is_only_counted(self):
+        response = APIClient().get('/api/v1/jobs/')
+        self.assertNotIn('Server-Timing', response)
+        metrics = APIClient().get('/metrics').content.decode()
+        self.assertIn('jobs_requests_total{route="job-list",method="GET",status="200"} 1', metrics)
+        self.assertNotIn('jobs_request_duration_seconds', metrics)
+
+    @override_settings(JOBS_METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(APIClient().get('/metrics').status_code, 403)
+        self.assertEqual(APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+
+class QueryDiagnosticsTests(TestCase):
+    def test_wrappers_installed_once(self):
+        # As on reconnecting
+        connection_created.send(sender=type(connection), connection=connection)
+        self.assertEqual(connection.execute_wrappers.count(inspect_query), 1)
+        self.assertEqual(connection.execute_wrappers.count(time_query), 1)
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM \"jobs_job\" WHERE \"id\" = 1 AND \"title\" = 'it''s' LIMIT 21"),
+            fingerprint('SELECT *  FROM "jobs_job" WHERE "id" = %s AND "title" = %s LIMIT 2'),
+        )
+        self.assertEqual(fingerprint('SELECT "t1"."id" FROM t1 WHERE id IN (%s, %s, %s)'), 'SELECT "t1"."id" FROM t1 WHERE id IN (...)')
+
+    def test_nested_serializer_n_plus_one(self):
+        for _ in range(5):
+            make_job(make_employer())
+        with self.assertRaises(QueryProblem) as raised, self.assertLogs('jobs.diagnostics', 'WARNING') as logs:
+            with diagnose(strict=True):
+                JobSerializer(Job.objects.all(), many=True).data
+        self.assertIn('from JobSerializer.employer:', str(raised.exception))
+        self.assertIn('from JobSerializer.employer > EmployerSerializer.user:', str(raised.exception))
+        self.assertIn('in test_nested_serializer_n_plus_one', logs.output[0])
+
+        with diagnose(strict=True) as log:
+            JobSerializer(Job.objects.select_related('employer__user'), many=True).data
+        self.assertEqual(log.queries, 1)
+
+    def test_request_log_and_report(self):
+        for _ in range(5):
+            make_job(make_employer())
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            JOBS_QUERY_DIAGNOSTICS=True, JOBS_QUERY_DIAGNOSTICS_STRICT=True, JOBS_QUERY_LOG=f'{directory}/queries.jsonl',
+            JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.NullCacheBackend'},
+        ):
+            # Strict: the eager loading leaves nothing to report
+            self.assertEqual(APIClient().get('/api/v1/jobs/?expand=employer').status_code, 200)
+            with override_settings(JOBS_SLOW_QUERY_MS=0, JOBS_QUERY_DIAGNOSTICS_STRICT=False), self.assertLogs('jobs.diagnostics', 'WARNING'):
+                APIClient().get(f'/api/v1/jobs/{Job.objects.first().pk}/')
+            out = StringIO()
+            call_command('query_report', '--json', stdout=out)
+        views = {view['route']: view for view in json.loads(out.getvalue())}
+        self.assertEqual(views['job-list']['repeated'] + views['job-list']['slow'], 0)
+        self.assertGreater(views['job-detail']['slow'], 0)
+        self.assertEqual(list(views)[0], 'job-detail')
+
+    def test_log_per_process(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(JOBS_QUERY_LOG=f'{directory}/queries.jsonl'):
+            # Another worker's log and its backup, one gone for long, and something else
+            logs = [('queries.1.jsonl.1', 'other'), ('queries.1.jsonl', 'other'), ('queries.2.jsonl', 'gone'), ('notes.jsonl', 'notes')]
+            for name, route in logs:
+                with open(f'{directory}/{name}', 'w') as file:
+                    file.write(json.dumps({'route': route}) + '\n')
+            month_ago = time.time() - 30 * 24 * 3600
+            os.utime(f'{directory}/queries.2.jsonl', (month_ago, month_ago))
+            with diagnose('parent'):
+                pass
+            pid = os.fork()
+            if pid == 0:
+                # The forked worker opens a file of its own rather than the parent's
+                with diagnose('child'):
+                    pass
+                os._exit(0)
+            os.waitpid(pid, 0)
+            with diagnose('parent'):
+                pass
+            self.assertEqual(
+                sorted(os.listdir(directory)),
+                sorted([
+                    'queries.1.jsonl.1', 'queries.1.jsonl', 'notes.jsonl',
+                    f'queries.{os.getpid()}.jsonl', f'queries.{pid}.jsonl',
+                ]),
+            )
+            self.assertEqual(sorted(entry['route'] for entry in read_log()), ['child', 'other', 'other', 'parent', 'parent'])
+
+
+class DatabasePoolTests(TestCase):
+    def test_pool_options_from_url(self):
+        database = database_from_url('postgres://u:p@db:6432/jobboard?pool_max_size=8&pool_timeout=2.5&sslmode=require')
+        self.assertEqual(database['OPTIONS'], {'pool': {'max_size': 8, 'timeout': 2.5}, 'sslmode': 'require'})
+        self.assertEqual(database['PORT'], 6432)
+        self.assertEqual(database_from_url('postgres://u:p@db/jobboard?pool=1')['OPTIONS'], {'pool': True})
+        self.assertEqual(database_from_url('postgres://u:p@db/jobboard')['OPTIONS'], {})
+
+    def test_pool_flag(self):
+        for flag, enabled in (('1', True), ('True', True), ('yes', True), ('ON', True),
+                              ('0', False), ('False', False), ('no', False), ('off', False)):
+            with self.subTest(flag=flag):
+                options = database_from_url(f'postgres://u:p@db/jobboard?pool={flag}')['OPTIONS']
+                self.assertEqual(options, {'pool': True} if enabled else {})
+        for query in ('pool=2', 'pool=enabled', 'pool=off&pool_max_size=8'):
+            with self.subTest(query=query), self.assertRaises(ImproperlyConfigured):
+                database_from_url(f'postgres://u:p@db/jobboard?{query}')
+
+    def test_pool_metrics(self):
+        class Pool:
+            def get_stats(self):
+                return {'pool_min': 2, 'pool_max': 4, 'pool_size': 4, 'pool_available': 1, 'requests_waiting': 2, 'requests_queued': 7}
+
+        wrapper = connections['default']
+        wrapper._connection_pools = {'default': Pool()}
+        try:
+            metrics = APIClient().get('/metrics').content.decode()
+        finally:
+            del wrapper._connection_pools
+        self.assertIn('jobs_db_pool_in_use{database="default"} 3', metrics)
+        self.assertIn('jobs_db_pool_waiting{database="default"} 2', metrics)
+        self.assertIn('jobs_db_pool_requests_queued_total{database="default"} 7', metrics)
+        self.assertIn('# TYPE jobs_db_pool_requests_total counter', metrics)
+
+
+class ApplicationStatsTests(TestCase):
+    """The counters kept by the signal handlers match a recount."""
+
+    def setUp(self):
+        self.employer = make_employer()
+        self.job = make_job(self.employer)
+
+    def apply(self, job, status='PENDING'):
+        return Application.objects.create(job=job, applicant=make_applicant(), cover_letter='Hi', status=status)
+
+    def assertCounted(self, job, **expected):
+        stored = JobApplicationStats.objects.get(job=job).counts()
+        recount = stats.count_applications([job.pk])[job.pk]
+        self.assertEqual({field: stored[field] for field in recount}, recount)
+        self.assertEqual({field: stored[field] for field in expected}, expected)
+
+    def test_create_change_move_delete(self):
+        other = make_job(self.employer)
+        first, second = self.apply(self.job), self.apply(self.job)
+        self.assertCounted(self.job, pending=2, total=2)
+        first.status = 'SHORTLISTED'
+        first.save()
+        self.assertCounted(self.job, pending=1, shortlisted=1)
+        second.job = other
+        second.save()
+        self.assertCounted(self.job, pending=0, shortlisted=1, total=1)
+        self.assertCounted(other, pending=1, total=1)
+        first.delete()
+        self.assertCounted(self.job, total=0)
+
+    def test_deferred_status(self):
+        application = self.apply(self.job)
+        application = Application.objects.only('pk', 'job').get(pk=application.pk)
+        application.status = 'REJECTED'
+        application.save()
+        self.assertCounted(self.job, pending=0, rejected=1)
+        Application.objects.only('pk').get(pk=application.pk).delete()
+        self.assertCounted(self.job, total=0)
+
+    def test_first_application_inserts_the_row(self):
+        self.assertFalse(JobApplicationStats.objects.filter(job=self.job).exists())
+        self.apply(self.job, status='REVIEWED')
+        self.assertCounted(self.job, reviewed=1, total=1)
+
+    def test_unknown_status(self):
+        stats.adjust(self.job.pk, {None: 1, 'FOO': 1})
+        self.assertFalse(JobApplicationStats.objects.filter(job=self.job).exists())
+        application = self.apply(self.job)
+        client = APIClient()
+        client.force_authenticate(self.employer.user)
+        url = f'/api/v1/jobs/{self.job.pk}/applications/{application.pk}/'
+        response = client.patch(url, {'status': 'FOO'}, format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+        response = client.patch(url, {'status': 'ACCEPTED'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_dashboard_after_bulk_changes(self):
+        draft, quiet = make_job(self.employer, status='DRAFT'), make_job(self.employer)
+        make_job(make_employer())
+        applications = [self.apply(self.job) for _ in range(4)]
+        self.apply(draft, status='REVIEWED')
+        client = APIClient()
+        # The profile is cached on the user, so only the dashboard queries
+        client.force_authenticate(self.employer.user)
+        bulk_url = f'/api/v1/jobs/{self.job.pk}/applications/bulk-status/'
+        updates = [{'id': applications[0].pk, 'status': 'SHORTLISTED'}, {'id': applications[1].pk, 'status': 'REJECTED'}]
+        response = client.post(bulk_url, {'updates': updates}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        response = client.post(bulk_url, {'filter': {'status': 'PENDING'}, 'status': 'REVIEWED'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        response = client.post(bulk_url, {'updates': [{'id': applications[0].pk, 'status': 'ACCEPTED'}]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        with self.assertNumQueries(1):
+            response = client.get('/api/v1/employer/dashboard/')
+        self.assertEqual(response.status_code, 200, response.content)
+        dashboard = response.json()
+        self.assertEqual(dashboard['jobs_by_status'], {'DRAFT': 1, 'PUBLISHED': 2, 'CLOSED': 0})
+        recount = stats.count_applications([self.job.pk, draft.pk, quiet.pk])
+        jobs = {job['id']: job['stats'] for job in dashboard['jobs']}
+        self.assertEqual(set(jobs), set(recount))
+        for job_id, counts in recount.items():
+            self.assertEqual(jobs[job_id], {**counts, 'total': sum(counts.values())})
+        self.assertEqual(
+            jobs[self.job.pk],
+            {'pending': 0, 'reviewed': 2, 'shortlisted': 0, 'rejected': 1, 'accepted': 1, 'total': 4},
+        )
+        self.assertEqual(jobs[quiet.pk]['total'], 0)
+        self.assertEqual(
+            dashboard['applications'],
+            {'pending': 0, 'reviewed': 3, 'shortlisted': 0, 'rejected': 1, 'accepted': 1, 'total': 5},
+        )
+        self.assertCounted(self.job, pending=0, accepted=1)
+
+
+@override_settings(JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.LRUCacheBackend', 'MAX_ENTRIES': 100, 'TIMEOUT': 300})
+class JobLifecycleTests(TestCase):
+    def setUp(self):
+        self.employer = make_employer()
+        self.now = timezone.now()
+
+    def assertFacetsCounted(self):
+        stored = {
+            (row.job_type, row.location, row.salary_band): row.count
+            for row in JobFacetCount.objects.exclude(count=0)
+        }
+        recount = (
+            Job.objects.filter(status='PUBLISHED').annotate(salary_band=facets.salary_band_expression())
+            .order_by().values_list('job_type', 'location', 'salary_band').annotate(count=Count('pk'))
+        )
+        self.assertEqual(stored, {tuple(row[:3]): row[3] for row in recount})
+
+    def test_publish_scheduled(self):
+        due = [make_job(self.employer, status='DRAFT', publish_at=self.now - timedelta(minutes=1), location=f'City {n}') for n in range(3)]
+        later = make_job(self.employer, status='DRAFT', publish_at=self.now + timedelta(hours=1))
+        unscheduled = make_job(self.employer, status='DRAFT')
+        self.assertEqual(lifecycle.publish_scheduled(self.now), 3)
+        for job in due:
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.publish_at), ('PUBLISHED', None))
+        self.assertEqual(Job.objects.get(pk=later.pk).status, 'DRAFT')
+        self.assertEqual(Job.objects.get(pk=unscheduled.pk).status, 'DRAFT')
+        self.assertFacetsCounted()
+        self.assertEqual(lifecycle.publish_scheduled(self.now), 0)
+        self.assertFacetsCounted()
+
+    def test_close_expired(self):
+        today = self.now.date()
+        expired = make_job(self.employer, deadline=today - timedelta(days=1))
+        open_job = make_job(self.employer, deadline=today)
+        draft = make_job(self.employer, status='DRAFT', deadline=today - timedelta(days=1))
+        self.assertEqual(lifecycle.close_expired(today), 1)
+        self.assertEqual(Job.objects.get(pk=expired.pk).status, 'CLOSED')
+        self.assertEqual(Job.objects.get(pk=open_job.pk).status, 'PUBLISHED')
+        self.assertEqual(Job.objects.get(pk=draft.pk).status, 'DRAFT')
+        self.assertFacetsCounted()
+        self.assertEqual(lifecycle.close_expired(today), 0)
+
+    def test_batches(self):
+        for n in range(5):
+            make_job(self.employer, status='DRAFT', publish_at=self.now, salary_min=n * 1000)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(lifecycle.publish_scheduled(self.now, batch_size=2), 5)
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "jobs_job"')]
+        self.assertEqual(len(updates), 3)
+        self.assertFalse(Job.objects.filter(status='DRAFT').exists())
+        self.assertFacetsCounted()
+
+    def test_scheduled_and_expired_in_one_run(self):
+        make_job(self.employer, status='DRAFT', publish_at=self.now, deadline=self.now.date() - timedelta(days=1))
+        self.assertEqual(lifecycle.run_lifecycle(), {'published': 1, 'closed': 1})
+        self.assertEqual(lifecycle.run_lifecycle(), {'published': 0, 'closed': 0})
+        self.assertFacetsCounted()
+
+    def test_invalidates_listings(self):
+        make_job(self.employer, status='DRAFT', publish_at=self.now, title='Scheduled')
+        client = APIClient()
+        self.assertEqual(client.get('/api/v1/jobs/').data['results'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            lifecycle.publish_scheduled(self.now)
+        self.assertEqual([job['title'] for job in client.get('/api/v1/jobs/').data['results']], ['Scheduled'])
+
+
+@override_settings(JOBS_MATCHING_INDEX_DIR=None, JOBS_MATCHING_REFRESH_SECONDS=3600)
+class MatchingIndexTests(TestCase):
+    words = ['python', 'welding', 'nursing', 'accounting', 'carpentry', 'plumbing']
+
+    def setUp(self):
+        self.employer = make_employer()
+        self.jobs = [
+            make_job(self.employer, title=f'{word} {other}', requirements=word)
+            for word in self.words for other in self.words if word != other
+        ]
+
+    def index(self):
+        index = matching.MatchingIndex('test', Job, matching.JOB_FIELDS, filters={'status': 'PUBLISHED'})
+        index.merge_in_background = False
+        index.build()
+        return index
+
+    def matches(self, index):
+        return {word: sorted(pk for pk, _ in index.query({word: 1}, 100)) for word in [*self.words, 'masonry']}
+
+    def test_changes_match_a_fresh_build(self):
+        index = self.index()
+        renamed, unpublished, deleted = self.jobs[:3]
+        renamed.title = 'masonry python'
+        renamed.save()
+        unpublished.status = 'CLOSED'
+        unpublished.save()
+        created = make_job(self.employer, title='masonry nursing')
+        for job in (renamed, unpublished, created):
+            index.index_instance(job)
+        index.remove([deleted.pk])
+        deleted.delete()
+        self.assertEqual(len(index), len(self.jobs) - 1)
+
+        expected = self.matches(self.index())
+        self.assertEqual(sorted(expected['masonry']), sorted([renamed.pk, created.pk]))
+        self.assertEqual(self.matches(index), expected)
+        index.merge()
+        self.assertEqual(len(index._delta), 0)
+        self.assertEqual(self.matches(index), expected)
+        # Changes after a merge land in the new delta over the merged base
+        renamed.title = 'carpentry'
+        renamed.requirements = ''
+        renamed.save()
+        index.index_instance(renamed)
+        self.assertEqual(self.matches(index), self.matches(self.index()))
+
+    def test_saves_apply_on_commit(self):
+        index = matching.job_index
+        index.rebuild()
+        self.addCleanup(index.clear)
+        try:
+            with transaction.atomic():
+                make_job(self.employer, title='masonry')
+                raise DatabaseError
+        except DatabaseError:
+            pass
+        self.assertEqual(index.query({'masonry': 1}, 10), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            job = make_job(self.employer, title='masonry')
+        self.assertEqual([pk for pk, _ in index.query({'masonry': 1}, 10)], [job.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            job.delete()
+        self.assertEqual(index.query({'masonry': 1}, 10), [])
+
+    def recommendations(self, status=200):
+        user = make_applicant()
+        Applicant.objects.filter(user=user).update(skills='masonry')
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=user.pk))
+        response = client.get('/api/v1/applicant/recommended-jobs/')
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def test_cold_index_is_built_outside_the_request(self):
+        index = matching.job_index
+        index.clear()
+        self.addCleanup(index.clear)
+        started, release = threading.Event(), threading.Event()
+        threads = []
+
+        def build():
+            threads.append(threading.current_thread())
+            started.set()
+            release.wait(5)
+
+        with mock.patch.object(index, 'build', side_effect=build):
+            self.recommendations(status=503)
+            self.assertTrue(started.wait(5))
+            # Still building: turned away without starting another build
+            self.recommendations(status=503)
+            builder = index._builder
+            release.set()
+            builder.join(5)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+        self.assertIsNone(index._builder)
+
+        make_job(self.employer, title='masonry')
+        index.build()
+        self.assertEqual([job['title'] for job in self.recommendations()], ['masonry'])
+
+    def test_expired_jobs_are_not_recommended(self):
+        index = matching.job_index
+        today = timezone.now().date()
+        for title, deadline in [('masonry open', today), ('masonry expired', today - timedelta(days=1)), ('masonry', None)]:
+            make_job(self.employer, title=title, deadline=deadline)
+        index.build()
+        self.addCleanup(index.clear)
+        self.assertEqual(sorted(job['title'] for job in self.recommendations()), ['masonry', 'masonry open'])
+
+
+class RevocationTests(TestCase):
+    def setUp(self):
+        self.addCleanup(revocation_cache.clear)
+        self.client = APIClient()
+        self.user = make_applicant()
+        self.user.set_password('secret-pass-1')
+        self.user.save()
+
+    def login(self):
+        response = self.client.post('/api/token/', {'username': self.user.username, 'password': 'secret-pass-1'})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def get(self, access, url='/api/v1/applicant/profile/'):
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {access}').status_code
+
+    def test_logout(self):
+        tokens = self.login()
+        self.assertEqual(self.get(tokens['access']), 200)
+        other = make_applicant()
+        response = self.client.post(
+            '/api/token/logout/', {'refresh': str(RefreshToken.for_user(other))},
+            HTTP_AUTHORIZATION=f"Bearer {tokens['access']}",
+        )
+        self.assertEqual(response.status_code, 400)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/token/logout/', {'refresh': tokens['refresh']}, HTTP_AUTHORIZATION=f"Bearer {tokens['access']}",
+            )
+        self.assertEqual(response.status_code, 204, response.content)
+        self.assertEqual(self.get(tokens['access']), 401)
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']}).status_code, 401)
+        self.assertEqual(self.get(self.login()['access']), 200)
+
+    @override_settings(JOBS_STATELESS_JWT=True)
+    def test_password_change(self):
+        access = self.login()['access']
+        self.assertEqual(self.get(access, '/api/v1/jobs/'), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('secret-pass-2')
+            self.user.save()
+        self.assertEqual(self.get(access, '/api/v1/jobs/'), 401)
+        self.assertEqual(self.get(access), 401)
+
+    @override_settings(JOBS_STATELESS_JWT=True)
+    def test_deactivation_and_deletion(self):
+        access = self.login()['access']
+        self.assertEqual(self.get(access, '/api/v1/jobs/'), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.get(access, '/api/v1/jobs/'), 401)
+
+        self.user = make_applicant()
+        self.user.set_password('secret-pass-1')
+        self.user.save()
+        access = self.login()['access']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertEqual(self.get(access, '/api/v1/jobs/'), 401)
+
+    @override_settings(JOBS_STATELESS_JWT=True)
+    def test_reactivation(self):
+        now = timezone.now()
+        with mock.patch('rest_framework_simplejwt.tokens.aware_utcnow', return_value=now - timedelta(minutes=1)):
+            old = self.login()
+        # Tokens carry their time of issue in whole seconds
+        deactivated_at = now - timedelta(seconds=30)
+        with self.captureOnCommitCallbacks(execute=True), mock.patch('jobs.revocation.timezone.now', return_value=deactivated_at):
+            self.user.is_active = False
+            self.user.save()
+        credentials = {'username': self.user.username, 'password': 'secret-pass-1'}
+        self.assertEqual(self.client.post('/api/token/', credentials).status_code, 401)
+        self.user.is_active = True
+        self.user.save()
+        access = self.login()['access']
+        self.assertEqual(self.get(access, '/api/v1/jobs/'), 200)
+        self.assertEqual(self.get(access), 200)
+        self.assertEqual(self.get(old['access'], '/api/v1/jobs/'), 401)
+        self.assertEqual(self.get(old['access']), 401)
+        # Reloaded from the database as other processes see it
+        revocation_cache.clear()
+        self.assertEqual(self.get(access), 200)
+        self.assertEqual(self.get(old['access']), 401)
+
+    def test_purge(self):
+        revoke_user(self.user.pk)
+        RevokedToken.objects.create(token_hash='expired', expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(purge_revocations(), 1)
+        self.assertEqual(list(RevokedToken.objects.values_list('token_hash', flat=True)), [token_hashes({'user_id': self.user.pk})[0]])
+
+
+class BulkApplicationStatusTests(TestCase):
+    def setUp(self):
+        self.employer = make_employer()
+        self.job = make_job(self.employer)
+        self.client = APIClient()
+        self.client.force_authenticate(self.employer.user)
+        self.url = f'/api/v1/jobs/{self.job.pk}/applications/bulk-status/'
+
+    def apply(self, job):
+        return Application.objects.create(job=job, applicant=make_applicant(), cover_letter='Hi')
+
+    def test_ids_of_other_jobs_are_not_found(self):
+        own, unchanged = self.apply(self.job), self.apply(self.job)
+        sibling = self.apply(make_job(self.employer))
+        foreign = self.apply(make_job(make_employer()))
+        updates = [
+            {'id': own.pk, 'status': 'REVIEWED'}, {'id': unchanged.pk, 'status': 'PENDING'},
+            {'id': sibling.pk, 'status': 'REVIEWED'}, {'id': foreign.pk, 'status': 'REVIEWED'},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'updates': updates}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(
+            [result['result'] for result in response.data['results']], ['updated', 'unchanged', 'not_found', 'not_found'],
+        )
+        statuses = dict(Application.objects.values_list('pk', 'status'))
+        self.assertEqual([statuses[application.pk] for application in (own, sibling, foreign)], ['REVIEWED', 'PENDING', 'PENDING'])
+        self.assertEqual(JobApplicationStats.objects.get(job=self.job).counts()['reviewed'], 1)
+        if connection.features.has_select_for_update_of:
+            locking = [query['sql'] for query in queries if 'FOR UPDATE' in query['sql']]
+            self.assertTrue(locking)
+            for sql in locking:
+                self.assertTrue(sql.endswith('FOR UPDATE OF "jobs_application"'), sql)
+
+
+@override_settings(JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.NullCacheBackend'})
+class GeoSearchTests(TestCase):
+    points = {
+        'centre': (16.8409, 96.1735), 'east': (16.8409, 96.2335), 'corner': (16.9109, 96.2435),
+        'mandalay': (21.9588, 96.0891), 'fiji_west': (-17.7, 179.9), 'fiji_east': (-17.7, -179.9),
+        'vanuatu': (-17.7, 168.3),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        employer = make_employer()
+        for name, (latitude, longitude) in cls.points.items():
+            make_job(employer, title=name, location=f'{latitude},{longitude}')
+
+    def titles(self, query):
+        response = APIClient().get(f'/api/v1/jobs/?{query}&page_size=100')
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(job['title'] for job in response.data['results'])
+
+    def within(self, latitude, longitude, radius):
+        return sorted(
+            name for name, point in self.points.items() if geo.haversine_km(latitude, longitude, *point) <= radius
+        )
+
+    def test_radius(self):
+        for latitude, longitude, radius in [(16.8409, 96.1735, 5), (16.8409, 96.1735, 10), (19.4, 96.1, 400), (-17.7, 179.95, 50)]:
+            for dense in (False, True):
+                with self.subTest(near=(latitude, longitude), radius=radius, dense=dense):
+                    with mock.patch.object(geo, 'DENSE_CANDIDATES', 0 if dense else geo.DENSE_CANDIDATES):
+                        self.assertEqual(
+                            self.titles(f'near={latitude},{longitude}&radius={radius}'),
+                            self.within(latitude, longitude, radius),
+                        )
+        # The corner of the search box is further than the radius
+        self.assertEqual(self.within(16.8409, 96.1735, 10), ['centre', 'east'])
+
+    def test_bbox(self):
+        self.assertEqual(self.titles('bbox=96.1,16.8,96.24,16.9'), ['centre', 'east'])
+        self.assertEqual(self.titles('bbox=90,10,100,25'), ['centre', 'corner', 'east', 'mandalay'])
+
+    def test_antimeridian(self):
+        self.assertEqual(self.titles('bbox=179,-20,-179,-15'), ['fiji_east', 'fiji_west'])
+        self.assertEqual(self.titles('bbox=168,-20,-179,-15'), ['fiji_east', 'fiji_west', 'vanuatu'])
+        self.assertEqual(self.titles('near=-17.7,-179.99&radius=30'), ['fiji_east', 'fiji_west'])
+
+    def test_invalid(self):
+        for query in ('near=Atlantis', 'near=95,0', 'near=16,96&radius=0', 'bbox=1,2,3', 'bbox=0,10,1,5'):
+            with self.subTest(query=query):
+                self.assertEqual(APIClient().get(f'/api/v1/jobs/?{query}').status_code, 400)
+
+    def test_migration_geocodes_like_the_app(self):
+        migration = import_module('jobs.migrations.0010_job_geocoding')
+        employer = Employer.objects.first()
+        for location in ['Yangon', 'Downtown, Mandalay', 'yangon myanmar', 'Atlantis', '95,0', '']:
+            make_job(employer, title=location, location=location)
+        expected = {job.pk: (job.latitude, job.longitude, job.geohash) for job in Job.objects.all()}
+        Job.objects.update(latitude=None, longitude=None, geohash=None)
+        migration.geocode_existing_jobs(django_apps, SimpleNamespace(connection=connection), batch_size=4)
+        located = {job.pk: (job.latitude, job.longitude, job.geohash) for job in Job.objects.all()}
+        self.assertEqual(located, expected)
+        self.assertEqual(sum(point[2] is not None for point in located.values()), len(self.points) + 3)
+
+
+@override_settings(JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.NullCacheBackend'})
+class FacetCountTests(TestCase):
+    queries = [
+        '', 'job_type=PART_TIME', 'location=Yangon', 'job_type=FULL_TIME&location=Mandalay',
+        'include_expired=true', 'include_expired=true&job_type=CONTRACT', 'salary_gte=1000&location=Yangon',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        employer = make_employer()
+        yesterday = timezone.now().date() - timedelta(days=1)
+        types = [value for value, _ in Job.JOB_TYPE_CHOICES]
+        for n in range(24):
+            make_job(
+                employer, job_type=types[n % 4], location=['Yangon', 'Mandalay', 'Bago'][n % 3],
+                salary_min=[300, 800, 1500, 3000, 9000][n % 5],
+                status='PUBLISHED' if n % 7 else 'DRAFT',
+                deadline=yesterday if n % 5 == 1 else None,
+            )
+
+    def facets(self, query):
+        response = APIClient().get(f'/api/v1/jobs/?facets=job_type,location,salary&{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data['facets']
+
+    def test_summary_matches_grouping_the_listing(self):
+        for query in self.queries:
+            with self.subTest(query=query):
+                with CaptureQueriesContext(connection) as queries:
+                    summarized = self.facets(query)
+                used_summary = any('jobs_jobfacetcount' in q['sql'] for q in queries)
+                self.assertEqual(used_summary, not query.startswith('salary'))
+                with self.settings(JOBS_FACET_SUMMARY=False):
+                    self.assertEqual(summarized, self.facets(query))
+
+    def test_counts_are_disjunctive(self):
+        today = timezone.now().date()
+        open_jobs = Job.objects.filter(status='PUBLISHED').exclude(deadline__lt=today)
+        counts = self.facets('job_type=FULL_TIME&location=Mandalay')
+        self.assertEqual(
+            {row['value']: row['count'] for row in counts['job_type']},
+            {value: open_jobs.filter(job_type=value, location='Mandalay').count() for value, _ in Job.JOB_TYPE_CHOICES},
+        )
+        self.assertEqual(
+            {row['value']: row['count'] for row in counts['location']},
+            {
+                location: open_jobs.filter(job_type='FULL_TIME', location=location).count()
+                for location in ('Yangon', 'Mandalay', 'Bago')
+                if open_jobs.filter(job_type='FULL_TIME', location=location).exists()
+            },
+        )
+        self.assertEqual(
+            sum(row['count'] for row in counts['salary']),
+            open_jobs.filter(job_type='FULL_TIME', location='Mandalay').count(),
+        )
+
+
+@override_settings(JOBS_ASYNC_VIEWS=True, JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.NullCacheBackend'})
+class AsyncViewTests(TestCase):
+    """The async read path answers as the sync views it stands in for."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = make_employer()
+        cls.jobs = [make_job(cls.employer, title=f'Engineer {n}', job_type='PART_TIME' if n % 2 else 'FULL_TIME') for n in range(5)]
+
+    def requests(self):
+        job, employer = self.jobs[0], self.employer
+        return [
+            (async_views.JobList, views.JobListCreate, '/api/v1/jobs/', {}),
+            (async_views.JobList, views.JobListCreate, '/api/v1/jobs/?page_size=2&facets=job_type&job_type=FULL_TIME', {}),
+            (async_views.JobList, views.JobListCreate, '/api/v1/jobs/?q=engineer', {}),
+            (async_views.JobList, views.JobListCreate, '/api/v1/jobs/?facets=colour', {}),
+            (async_views.JobDetail, views.JobRetrieveUpdateDestroy, f'/api/v1/jobs/{job.pk}/', {'pk': job.pk}),
+            (async_views.JobDetail, views.JobRetrieveUpdateDestroy, '/api/v1/jobs/0/', {'pk': 0}),
+            (async_views.EmployerPublic, views.EmployerPublicView, f'/api/v1/employers/{employer.pk}/', {'pk': employer.pk}),
+        ]
+
+    async def test_same_responses_as_sync_views(self):
+        for async_view, sync_view, path, kwargs in self.requests():
+            with self.subTest(path=path):
+                response = await async_view.as_view()(AsyncRequestFactory().get(path), **kwargs)
+                expected = await sync_to_async(sync_view.as_view())(RequestFactory().get(path), **kwargs)
+                await sync_to_async(expected.render)()
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(json.loads(response.content), json.loads(expected.content))
+
+    async def test_writes_are_forwarded(self):
+        token = await sync_to_async(AccessToken.for_user)(self.employer.user)
+        request = AsyncRequestFactory().post(
+            '/api/v1/jobs/',
+            {'title': 'Welder', 'description': 'Weld', 'location': 'Yangon', 'salary_min': '900', 'employer_id': self.employer.pk},
+            content_type='application/json', headers={'Authorization': f'Bearer {token}'},
+        )
+        response = await async_views.JobList.as_view()(request)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(await Job.objects.filter(title='Welder', employer=self.employer).aexists())
+
+
+@override_settings(JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.NullCacheBackend'})
+class JobSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        employer = make_employer()
+        cls.in_title = make_job(employer, title='Python developer', description='Build services')
+        cls.in_requirements = make_job(employer, title='Engineer', requirements='Python and SQL')
+        cls.in_description = make_job(employer, title='Engineer', description='Some python scripting')
+        cls.unrelated = make_job(employer, title='Accountant', description='Keep the ledgers')
+        make_job(employer, title='Python lead', status='DRAFT')
+        cls.company = make_employer()
+        cls.company.company_name = 'Tidewater Shipping'
+        cls.company.save()
+        cls.at_company = make_job(cls.company, title='Clerk')
+
+    def setUp(self):
+        # The in-process index (SQLite) outlives the rolled back data of earlier tests
+        get_search_backend().rebuild()
+
+    def search(self, text):
+        response = APIClient().get('/api/v1/jobs/', {'q': text})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [job['id'] for job in response.data['results']]
+
+    def test_ranks_by_field(self):
+        self.assertEqual(
+            self.search('python'), [self.in_title.pk, self.in_requirements.pk, self.in_description.pk],
+        )
+
+    def test_matches_company_name(self):
+        self.assertEqual(self.search('tidewater'), [self.at_company.pk])
+
+    def test_follows_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.unrelated.title = 'Python accountant'
+            self.unrelated.save()
+        self.assertIn(self.unrelated.pk, self.search('python'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.company.company_name = 'Harbour Freight'
+            self.company.save()
+        self.assertEqual(self.search('tidewater'), [])
+        self.assertEqual(self.search('harbour'), [self.at_company.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.in_title.delete()
+        self.assertNotIn(self.in_title.pk, self.search('python'))
+
+    def test_rolled_back_save_is_not_found(self):
+        try:
+            with transaction.atomic():
+                self.unrelated.title = 'Welder'
+                self.unrelated.save()
+                raise DatabaseError
+        except DatabaseError:
+            pass
+        self.assertEqual(self.search('welder'), [])
+        self.assertEqual(self.search('accountant'), [self.unrelated.pk])
+
+    @override_settings(JOBS_SEARCH_MAX_RESULTS=2)
+    def test_filters_apply_before_the_limit(self):
+        # Better matches, but not listed
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                make_job(self.company, title='Python python', status='DRAFT')
+        # Only the in-process index (SQLite) limits its results
+        self.assertEqual(self.search('python')[:2], [self.in_title.pk, self.in_requirements.pk])
+
+    def test_nothing_to_match(self):
+        self.assertEqual(self.search('welder'), [])
+        self.assertEqual(self.search('the and of'), [])
+
+
+@override_settings(JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.NullCacheBackend'})
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = make_employer()
+        cls.job = make_job(cls.employer)
+        cls.applicant = make_applicant()
+        Application.objects.create(job=cls.job, applicant=cls.applicant, cover_letter='Hi')
+
+    def get(self, path, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client.get(path)
+
+    def test_listings_are_compact(self):
+        [job] = self.get('/api/v1/jobs/').data['results']
+        self.assertEqual(list(job), JobListSerializer.Meta.fields)
+        self.assertEqual(set(job['employer']), {'id', 'company_name', 'company_logo', 'location'})
+        # The detail is still complete
+        self.assertIn('description', self.get(f'/api/v1/jobs/{self.job.pk}/').data)
+
+    def test_fields(self):
+        [job] = self.get('/api/v1/jobs/?fields=id,title,employer.company_name').data['results']
+        self.assertEqual(
+            job, {'id': self.job.pk, 'title': 'Engineer', 'employer': {'company_name': self.employer.company_name}},
+        )
+        [application] = self.get('/api/v1/applications/?fields=id,job.title', self.applicant).data
+        self.assertEqual(set(application), {'id', 'job'})
+        self.assertEqual(application['job'], {'title': 'Engineer'})
+
+    def test_expand(self):
+        [job] = self.get('/api/v1/jobs/?expand=employer').data['results']
+        self.assertEqual(job['employer']['user']['id'], self.employer.user_id)
+        [job] = self.get('/api/v1/jobs/?expand=employer&fields=id,employer.user').data['results']
+        self.assertEqual(set(job['employer']), {'user'})
+
+    def test_invalid(self):
+        for query in ('fields=colour', 'fields=title.length', 'expand=title', 'expand=colour'):
+            with self.subTest(query=query):
+                self.assertEqual(self.get(f'/api/v1/jobs/?{query}').status_code, 400)
+
+
+@override_settings(JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.NullCacheBackend'})
+class FastPathTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = make_employer()
+        cls.applicant = make_applicant()
+        cls.jobs = [
+            make_job(
+                cls.employer, title=f'Engineer {n}', salary_max=None if n % 2 else 5000,
+                latitude=16.8 if n % 3 else None,
+            )
+            for n in range(6)
+        ]
+        for job in cls.jobs[:3]:
+            Application.objects.create(job=job, applicant=cls.applicant, cover_letter='Hi', resume='resumes/cv.pdf')
+            Application.objects.create(job=job, applicant=make_applicant(), cover_letter='Hi', status='REVIEWED')
+
+    def get(self, path, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        response = client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.content
+
+    def test_same_bytes_as_drf(self):
+        job = self.jobs[0]
+        requests = [
+            ('/api/v1/jobs/', None),
+            ('/api/v1/jobs/?page_size=2&ordering=-salary_min', None),
+            ('/api/v1/jobs/?fields=id,title,created_at,employer.company_name', None),
+            ('/api/v1/jobs/?expand=employer', None),
+            ('/api/v1/applications/', self.applicant),
+            ('/api/v1/applications/?expand=job,applicant', self.employer.user),
+            (f'/api/v1/jobs/{job.pk}/applications/', self.employer.user),
+        ]
+        for path, user in requests:
+            with self.subTest(path=path):
+                compiled = fastpath.CompiledSerializer
+                with mock.patch.object(compiled, 'render', autospec=True, side_effect=compiled.render) as render:
+                    fast = self.get(path, user)
+                render.assert_called()
+                with self.settings(JOBS_FAST_PATH=[]):
+                    self.assertEqual(fast, self.get(path, user))
+
+    def test_uncompilable_serializer_falls_back(self):
+        class Titled(JobListSerializer):
+            title = serializers.SerializerMethodField()
+
+            def get_title(self, job):
+                return job.title.upper()
+
+        serializer = Titled()
+        self.assertIsNone(fastpath.compile_serializer(serializer))
+        self.assertIsNotNone(fastpath.compile_serializer(JobListSerializer()))
+
+
+class ResumeStagingTests(TestCase):
+    class Rollback(Exception):
+        pass
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.staging = Path(directory.name)
+        staging = override_settings(JOBS_UPLOAD_STAGING_DIR=self.staging)
+        staging.enable()
+        self.addCleanup(staging.disable)
+        self.user = make_applicant()
+
+    def stage(self):
+        return resumes.stage_file(SimpleUploadedFile('cv.txt', b'Python developer'), self.user)
+
+    def stage_rolled_back(self):
+        with self.assertRaises(self.Rollback), transaction.atomic():
+            path = resumes.staged_path(self.stage())
+            raise self.Rollback
+        return path
+
+    def test_housekeeping_sweeps_files_without_an_upload(self):
+        orphan, recent_orphan = self.stage_rolled_back(), self.stage_rolled_back()
+        staged = resumes.staged_path(self.stage())
+        other = self.staging / 'notes.txt'
+        other.write_text('Not an upload')
+        two_days_ago = time.time() - 48 * 3600
+        for path in (orphan, staged, other):
+            os.utime(path, (two_days_ago, two_days_ago))
+        self.assertTrue(orphan.exists())
+        self.assertFalse(ResumeUpload.objects.filter(pk=orphan.name).exists())
+
+        resumes.housekeeping()
+        self.assertFalse(orphan.exists())
+        # Its transaction may still be open
+        self.assertTrue(recent_orphan.exists())
+        self.assertTrue(staged.exists())
+        self.assertTrue(other.exists())
+
+    def test_discard_keeps_the_file_until_committed(self):
+        path = resumes.staged_path(self.stage())
+        with self.assertRaises(self.Rollback), transaction.atomic():
+            resumes.discard(ResumeUpload.objects.get(pk=path.name))
+            raise self.Rollback
+        self.assertTrue(path.exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            resumes.discard(ResumeUpload.objects.get(pk=path.name))
+        self.assertFalse(path.exists())
+        self.assertFalse(ResumeUpload.objects.filter(pk=path.name).exists())
+
+
+class ResumeUploadTests(TestCase):
+    resume = b'Python developer'
+
+    def setUp(self):
+        for name in ('JOBS_UPLOAD_STAGING_DIR', 'MEDIA_ROOT'):
+            directory = tempfile.TemporaryDirectory()
+            self.addCleanup(directory.cleanup)
+            setting = override_settings(**{name: Path(directory.name)})
+            setting.enable()
+            self.addCleanup(setting.disable)
+        self.user = make_applicant()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.job = make_job(make_employer())
+
+    def put(self, upload, body, content_range):
+        return self.client.put(
+            f'/api/v1/resume-uploads/{upload["id"]}/', body,
+            content_type='application/octet-stream', headers={'Content-Range': content_range},
+        )
+
+    def upload(self, content=None):
+        content = self.resume if content is None else content
+        response = self.client.post('/api/v1/resume-uploads/', {'filename': 'cv.txt', 'size': len(content)}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.put(response.json(), content, f'bytes 0-{len(content) - 1}/{len(content)}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def apply(self, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/v1/jobs/{self.job.pk}/applications/', {'cover_letter': 'Hi', 'resume_upload': upload['id']},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        return Application.objects.get(pk=response.json()['id'])
+
+    def test_chunked_upload(self):
+        response = self.client.post('/api/v1/resume-uploads/', {'filename': 'cv.txt', 'size': 16}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        upload = response.json()
+        self.assertEqual((upload['status'], upload['received']), (ResumeUpload.UPLOADING, 0))
+
+        response = self.put(upload, self.resume[:6], 'bytes 0-5/16')
+        self.assertEqual(response.json()['received'], 6)
+        # A chunk that does not start where the last one ended, or a range outside the file
+        self.assertEqual(self.put(upload, self.resume[:6], 'bytes 0-5/16').status_code, 400)
+        self.assertEqual(self.put(upload, self.resume[6:], 'bytes 6-15/20').status_code, 400)
+        self.assertEqual(self.put(upload, self.resume[6:], 'bytes 6-16/16').status_code, 400)
+        self.assertEqual(self.put(upload, self.resume[6:], '6-15').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/v1/resume-uploads/{upload["id"]}/').json()['received'], 6)
+
+        response = self.put(upload, self.resume[6:], 'bytes 6-15/16')
+        self.assertEqual((response.json()['status'], response.json()['received']), (ResumeUpload.COMPLETE, 16))
+        self.assertEqual(resumes.staged_path(ResumeUpload.objects.get(pk=upload['id'])).read_bytes(), self.resume)
+        self.assertEqual(self.put(upload, self.resume[6:], 'bytes 6-15/16').status_code, 400)
+
+    def test_uploads_are_private(self):
+        upload = self.upload()
+        other = APIClient()
+        other.force_authenticate(make_applicant())
+        self.assertEqual(other.get(f'/api/v1/resume-uploads/{upload["id"]}/').status_code, 404)
+        self.assertEqual(other.delete(f'/api/v1/resume-uploads/{upload["id"]}/').status_code, 404)
+
+    def test_size_limit(self):
+        with override_settings(JOBS_RESUME_MAX_BYTES=10):
+            response = self.client.post('/api/v1/resume-uploads/', {'filename': 'cv.txt', 'size': 16}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_delete(self):
+        upload = self.upload()
+        path = resumes.staged_path(ResumeUpload.objects.get(pk=upload['id']))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/v1/resume-uploads/{upload["id"]}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(path.exists())
+
+    @override_settings(JOBS_TASKS_EAGER=True)
+    def test_attached_upload_is_processed(self):
+        upload = self.upload()
+        path = resumes.staged_path(ResumeUpload.objects.get(pk=upload['id']))
+        application = self.apply(upload)
+
+        self.assertEqual(application.resume_status, 'READY')
+        self.assertEqual(application.resume_text, 'Python developer')
+        self.assertEqual(application.resume.read(), self.resume)
+        self.assertFalse(ResumeUpload.objects.filter(pk=upload['id']).exists())
+        self.assertFalse(path.exists())
+
+    def test_attached_upload_cannot_be_reused_or_deleted(self):
+        upload = self.upload()
+        self.apply(upload)
+        self.assertEqual(self.client.delete(f'/api/v1/resume-uploads/{upload["id"]}/').status_code, 403)
+        response = self.client.patch('/api/v1/applicant/profile/', {'resume_upload': upload['id']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(JOBS_TASKS_EAGER=True)
+    def test_rejected_resume(self):
+        upload = self.upload(b'\x00\xff' * 2048)
+        application = self.apply(upload)
+        self.assertEqual(application.resume_status, 'REJECTED')
+        self.assertFalse(application.resume)
+        self.assertFalse(ResumeUpload.objects.filter(pk=upload['id']).exists())
+
+    @override_settings(JOBS_TASK_MAX_ATTEMPTS=2)
+    def test_upload_is_removed_when_processing_fails_for_good(self):
+        upload = self.upload()
+        path = resumes.staged_path(ResumeUpload.objects.get(pk=upload['id']))
+        application = self.apply(upload)
+        self.assertEqual(application.resume_status, 'PENDING')
+
+        with mock.patch('jobs.resumes.extract_text', side_effect=OSError('Disk on fire')), self.assertLogs('jobs.tasks'):
+            for attempt in range(2):
+                # Retried after a backoff while attempts remain
+                self.assertTrue(path.exists())
+                self.assertEqual(ResumeUpload.objects.get(pk=upload['id']).status, ResumeUpload.ATTACHED)
+                Task.objects.update(run_after=timezone.now())
+                with self.captureOnCommitCallbacks(execute=True):
+                    for item in tasks.claim_tasks(1):
+                        tasks.run_task(item)
+
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+        application.refresh_from_db()
+        self.assertEqual(application.resume_status, 'FAILED')
+        self.assertFalse(ResumeUpload.objects.filter(pk=upload['id']).exists())
+        self.assertFalse(path.exists())
+
+
+@override_settings(JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.NullCacheBackend'})
+class BulkImportExportTests(TestCase):
+    csv_rows = (
+        'title,description,location,salary_min,job_type,status\n'
+        'Backend engineer,Build APIs,Yangon,1000,FULL_TIME,PUBLISHED\n'
+        ',No title,Yangon,1000,FULL_TIME,PUBLISHED\n'
+        'Designer,Draw things,Mandalay,plenty,FULL_TIME,PUBLISHED\n'
+        'Tester,Break things,Mandalay,800,PART_TIME,DRAFT\n'
+    )
+
+    def setUp(self):
+        self.employer = make_employer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.employer.user)
+
+    def import_body(self, body, content_type='text/csv', path='/api/v1/jobs/import/'):
+        return self.client.generic('POST', path, body.encode(), content_type=content_type)
+
+    def export(self, client=None, **params):
+        response = (client or self.client).get('/api/v1/jobs/export/', params)
+        content = b''.join(response.streaming_content).decode() if response.streaming else None
+        return response, content
+
+    def test_import_reports_invalid_rows(self):
+        response = self.import_body(self.csv_rows)
+        self.assertEqual(response.status_code, 201, response.content)
+        report = response.json()
+        self.assertEqual((report['rows'], report['created']), (4, 2))
+        self.assertEqual([error['row'] for error in report['errors']], [2, 3])
+        self.assertIn('title', report['errors'][0]['errors'])
+        self.assertIn('salary_min', report['errors'][1]['errors'])
+        self.assertEqual(
+            sorted(self.employer.jobs.values_list('title', 'status')),
+            [('Backend engineer', 'PUBLISHED'), ('Tester', 'DRAFT')],
+        )
+
+    def test_import_ndjson_file(self):
+        lines = '\n'.join([
+            json.dumps({'title': 'Backend engineer', 'description': 'Build APIs', 'location': 'Yangon', 'salary_min': 1000}),
+            '{"title": "Cut off',
+            '',
+            '["not", "an", "object"]',
+            json.dumps({'title': 'Tester', 'description': 'Break things', 'location': 'Yangon', 'salary_min': 800}),
+        ])
+        upload = SimpleUploadedFile('jobs.jsonl', lines.encode(), content_type='application/octet-stream')
+        response = self.client.post('/api/v1/jobs/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        report = response.json()
+        self.assertEqual((report['rows'], report['created']), (4, 2))
+        self.assertEqual([error['row'] for error in report['errors']], [2, 3])
+
+    def test_import_format(self):
+        self.assertEqual(self.import_body(self.csv_rows, content_type='text/plain').status_code, 400)
+        response = self.import_body(self.csv_rows, content_type='text/plain', path='/api/v1/jobs/import/?input=csv')
+        self.assertEqual(response.json()['created'], 2)
+        response = self.client.post('/api/v1/jobs/import/', {}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        # Nothing valid to create
+        response = self.import_body('title\n\n')
+        self.assertEqual((response.status_code, response.json()['created']), (200, 0))
+
+    def test_only_employers_import_and_export(self):
+        applicant = APIClient()
+        applicant.force_authenticate(make_applicant())
+        self.assertEqual(applicant.post('/api/v1/jobs/import/', self.csv_rows, content_type='text/csv').status_code, 403)
+        self.assertEqual(self.export(applicant)[0].status_code, 403)
+        self.assertEqual(APIClient().get('/api/v1/jobs/export/').status_code, 401)
+        self.assertFalse(Job.objects.exists())
+
+    def test_a_failing_batch_is_retried_row_by_row(self):
+        bulk_create = Job.objects.bulk_create
+
+        def fail_on_broken(jobs, *args, **kwargs):
+            if any(job.title == 'Broken' for job in jobs):
+                raise DatabaseError("value too long")
+            return bulk_create(jobs, *args, **kwargs)
+
+        rows = [
+            (number, {'title': title, 'description': 'x', 'location': 'Yangon', 'salary_min': 1})
+            for number, title in enumerate(['First', 'Second', 'Broken', 'Fourth', 'Fifth'], start=1)
+        ]
+        with mock.patch.object(Job.objects, 'bulk_create', side_effect=fail_on_broken):
+            report = bulk.import_jobs(rows, self.employer, batch_size=2)
+        self.assertEqual((report['rows'], report['created']), (5, 4))
+        self.assertEqual(report['errors'], [{'row': 3, 'errors': {'non_field_errors': ['value too long']}}])
+        self.assertEqual(
+            list(self.employer.jobs.order_by('id').values_list('title', flat=True)),
+            ['First', 'Second', 'Fourth', 'Fifth'],
+        )
+
+    def test_export(self):
+        first = make_job(self.employer, title='Backend engineer, senior', salary_max=None)
+        second = make_job(self.employer, title='Tester', status='DRAFT', deadline=timezone.now().date())
+        make_job(make_employer(), title='Not mine')
+
+        response, content = self.export()
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="jobs.csv"')
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual([row['id'] for row in rows], [str(first.pk), str(second.pk)])
+        self.assertEqual(rows[0]['title'], 'Backend engineer, senior')
+        self.assertEqual(rows[0]['salary_max'], '')
+        self.assertEqual(rows[1]['deadline'], second.deadline.isoformat())
+
+        response, content = self.export(output='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Backend engineer, senior', 'Tester'])
+        self.assertIsNone(rows[0]['salary_max'])
+        self.assertEqual(rows[1]['status'], 'DRAFT')
+
+        self.assertEqual(self.export(output='xml')[0].status_code, 400)
+
+    def test_export_reimports(self):
+        make_job(self.employer, title='Backend engineer', requirements='Python\nDjango')
+        make_job(self.employer, title='Tester', job_type='CONTRACT')
+        other = make_employer()
+        _, content = self.export(output='ndjson')
+        report = bulk.import_jobs(bulk.read_rows(io.BytesIO(content.encode()), 'ndjson'), other)
+        self.assertEqual((report['created'], report['errors']), (2, []))
+        fields = ['title', 'requirements', 'job_type', 'salary_min', 'status']
+        self.assertEqual(
+            list(other.jobs.order_by('id').values_list(*fields)),
+            list(self.employer.jobs.order_by('id').values_list(*fields)),
+        )
+
+    def test_commands(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'jobs.csv'
+            path.write_text(self.csv_rows)
+            out, err = StringIO(), StringIO()
+            call_command('import_jobs', self.employer.user.username, str(path), '--batch-size=2', stdout=out, stderr=err)
+            self.assertIn('Created 2 of 4 jobs (2 rejected)', out.getvalue())
+            self.assertIn('row 2:', err.getvalue())
+
+            with self.assertRaises(CommandError):
+                call_command('import_jobs', 'nobody', str(path), stdout=StringIO())
+            with self.assertRaises(CommandError):
+                call_command('import_jobs', str(self.employer.pk), str(path.with_suffix('.txt')), stdout=StringIO())
+
+            make_job(make_employer(), title='Not mine')
+            out = StringIO()
+            call_command('export_jobs', f'--employer={self.employer.pk}', '--format=ndjson', stdout=out)
+            self.assertEqual(
+                sorted(json.loads(line)['title'] for line in out.getvalue().splitlines()),
+                ['Backend engineer', 'Tester'],
+            )
+            output = Path(directory) / 'all.csv'
+            call_command('export_jobs', f'--output={output}', '--chunk-size=1', stdout=StringIO())
+            with open(output, newline='') as exported:
+                self.assertEqual(len(list(csv.DictReader(exported))), 3)
+
+
+@override_settings(JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.NullCacheBackend'})
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        employer = make_employer()
+        today = timezone.now().date()
+        deadlines = [None, 3, 1, None, 3, 2, None]
+        cls.jobs = [
+            make_job(employer, title=f'Job {n}', salary_min=1000 + 100 * (n % 3),
+                     deadline=today + timedelta(days=days) if days else None)
+            for n, days in enumerate(deadlines)
+        ]
+        make_job(employer, title='Draft', status='DRAFT')
+
+    def get(self, url, status=200, **params):
+        response = APIClient().get(url, params)
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def walk(self, **params):
+        """Follow next links to the end, then previous links back to the start."""
+        pages = [self.get('/api/v1/jobs/', page_size=3, **params)]
+        self.assertIsNone(pages[0]['previous'])
+        while pages[-1]['next']:
+            pages.append(self.get(pages[-1]['next']))
+        backwards = [pages[-1]]
+        while backwards[-1]['previous']:
+            backwards.append(self.get(backwards[-1]['previous']))
+        self.assertEqual(
+            [[job['id'] for job in page['results']] for page in backwards[::-1]],
+            [[job['id'] for job in page['results']] for page in pages],
+        )
+        return [job['id'] for page in pages for job in page['results']]
+
+    def test_default_ordering(self):
+        expected = [job.pk for job in sorted(self.jobs, key=lambda job: (-job.created_at.timestamp(), job.pk))]
+        self.assertEqual(self.walk(), expected)
+
+    def test_orderings(self):
+        salaries = sorted(self.jobs, key=lambda job: (job.salary_min, job.pk))
+        self.assertEqual(self.walk(ordering='salary_min'), [job.pk for job in salaries])
+        self.assertEqual(self.walk(ordering='-salary_min'), [job.pk for job in reversed(salaries)])
+
+    def test_null_values_sort_last(self):
+        deadlines = sorted(self.jobs, key=lambda job: (job.deadline is None, job.deadline, job.pk))
+        self.assertEqual(self.walk(ordering='deadline'), [job.pk for job in deadlines])
+        # Descending is the exact reverse, NULLs first
+        self.assertEqual(self.walk(ordering='-deadline'), [job.pk for job in reversed(deadlines)])
+
+    def test_pages_hold_their_place(self):
+        first = self.get('/api/v1/jobs/', page_size=3, ordering='salary_min')
+        # A job sorting before the boundary does not shift the next page
+        make_job(self.jobs[0].employer, salary_min=1)
+        second = self.get(first['next'])
+        ids = [job['id'] for page in (first, second) for job in page['results']]
+        self.assertEqual(ids, [job.pk for job in sorted(self.jobs, key=lambda job: (job.salary_min, job.pk))][:6])
+
+    def test_walking_past_the_end(self):
+        last = self.get('/api/v1/jobs/', page_size=len(self.jobs))
+        self.assertIsNone(last['next'])
+        pagination = JobKeysetPagination()
+        pagination.base_url = 'http://testserver/api/v1/jobs/'
+        oldest = self.jobs[0]
+        empty = self.get(pagination.encode_cursor((oldest.created_at, oldest.pk), reverse=False))
+        self.assertEqual(empty['results'], [])
+        self.assertIsNone(empty['next'])
+        self.assertEqual(len(self.get(empty['previous'])['results']), len(self.jobs) - 1)
+
+    def test_invalid_cursor(self):
+        def encode(payload):
+            return b64encode(json.dumps(payload).encode()).decode()
+
+        for cursor in [
+            'not base64!',
+            'é',
+            b64encode(b'not json').decode(),
+            encode(['a list']),
+            encode({'p': 5}),
+            encode({'p': ['2024-01-01T00:00:00+00:00']}),
+            encode({'p': ['yesterday', 1]}),
+            encode({'p': ['2024-01-01T00:00:00+00:00', None]}),
+            encode({'p': ['2024-01-01T00:00:00+00:00', 2 ** 70]}),
+            encode({'p': [None, 1]}),
+        ]:
+            with self.subTest(cursor=cursor):
+                response = self.get('/api/v1/jobs/', status=400, cursor=cursor)
+                self.assertEqual(response, {'cursor': 'Invalid cursor'})
+
+    def test_invalid_ordering(self):
+        response = self.get('/api/v1/jobs/', status=400, ordering='title')
+        self.assertIn('ordering', response)
+        self.get('/api/v1/jobs/', status=400, ordering='-id')
+
+    def test_page_size(self):
+        self.assertEqual(len(self.get('/api/v1/jobs/', page_size=2)['results']), 2)
+        with override_settings(JOBS_MAX_PAGE_SIZE=4):
+            self.assertEqual(len(self.get('/api/v1/jobs/', page_size=50)['results']), 4)
+        # Anything else falls back to the default
+        self.assertEqual(len(self.get('/api/v1/jobs/', page_size='x')['results']), len(self.jobs))
+
+
+@override_settings(JOBS_RESPONSE_CACHE={'BACKEND': 'jobs.cache.NullCacheBackend'})
+class ProfileResolutionTests(TestCase):
+    """
+    Views, permissions and serializers all ask for the requesting user's
+    profile; it must be looked up once per request, and with a token in the
+    same query as the user.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = make_employer()
+        cls.job = make_job(cls.employer)
+        cls.applicant = make_applicant()
+        cls.application = Application.objects.create(job=cls.job, applicant=cls.applicant, cover_letter='Hi')
+
+    def setUp(self):
+        revocation_cache.refresh()
+
+    def requests(self, user):
+        if user == self.applicant:
+            return [
+                ('get', '/api/v1/applicant/profile/', None),
+                ('get', '/api/v1/applications/', None),
+                ('patch', f'/api/v1/jobs/{self.job.pk}/applications/{self.application.pk}/', {'cover_letter': 'Hello'}),
+                ('post', f'/api/v1/jobs/{self.job.pk}/applications/', {'cover_letter': 'Again'}),
+            ]
+        return [
+            ('get', '/api/v1/employer/profile/', None),
+            ('get', f'/api/v1/jobs/{self.job.pk}/applications/', None),
+            ('post', f'/api/v1/jobs/{self.job.pk}/applications/bulk-status/',
+             {'updates': [{'id': self.application.pk, 'status': 'REVIEWED'}]}),
+            ('get', '/api/v1/employer/dashboard/', None),
+        ]
+
+    def profile_queries(self, user, authenticate):
+        """Queries of each request that read a profile or the user."""
+        for method, url, data in self.requests(user):
+            client = APIClient()
+            authenticate(client)
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(client, method)(url, data, format='json')
+            self.assertLess(response.status_code, 500, response.content)
+            yield url, [
+                query['sql'] for query in queries
+                if re.search(r'FROM "(auth_user|jobs_employer|jobs_applicant)"', query['sql'])
+            ]
+
+    def test_token_loads_the_profile_with_the_user(self):
+        for user in (self.employer.user, self.applicant):
+            token = f'Bearer {AccessToken.for_user(user)}'
+            for url, queries in self.profile_queries(user, lambda client: client.credentials(HTTP_AUTHORIZATION=token)):
+                with self.subTest(user=user.username, url=url):
+                    self.assertEqual(len(queries), 1, '\n'.join(queries))
+                    self.assertRegex(queries[0], r'FROM "auth_user" LEFT OUTER JOIN "jobs_employer"')
+
+    def test_profile_is_looked_up_once(self):
+        # A user authenticated some other way arrives without its profile;
+        # the applicant's employer profile is looked for first
+        for user, lookups in ((self.employer.user, ['employer']), (self.applicant, ['employer', 'applicant'])):
+            def authenticate(client):
+                client.force_authenticate(User.objects.get(pk=user.pk))
+
+            for url, queries in self.profile_queries(user, authenticate):
+                with self.subTest(user=user.username, url=url):
+                    found = [re.search(r'FROM "jobs_(\w+)"', sql).group(1) for sql in queries]
+                    # Some views only need to know the user is no employer
+                    self.assertEqual(found, lookups[:len(found)], '\n'.join(queries))
+                    self.assertTrue(found, url)
@@ -1,15 +1,33 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+if getattr(settings, 'JOBS_ASYNC_VIEWS', False):
+    employer_public = async_views.EmployerPublic.as_view()
+    job_list = async_views.JobList.as_view()
+    job_detail = async_views.JobDetail.as_view()
+else:
+    employer_public = views.EmployerPublicView.as_view()
+    job_list = views.JobListCreate.as_view()
+    job_detail = views.JobRetrieveUpdateDestroy.as_view()
 
 urlpatterns = [
-    path('employers/<int:pk>/', views.EmployerPublicView.as_view(), name='employer-public'),
+    path('employers/<int:pk>/', employer_public, name='employer-public'),
     path('employer/profile/', views.EmployerRetrieveUpdateDestroy.as_view(), name='employer-profile'),
-    path('jobs/', views.JobListCreate.as_view(), name='job-list'),
-    path('jobs/<int:pk>/', views.JobRetrieveUpdateDestroy.as_view(), name='job-detail'),
+    path('employer/dashboard/', views.EmployerDashboard.as_view(), name='employer-dashboard'),
+    path('jobs/', job_list, name='job-list'),
+    path('jobs/import/', views.JobImport.as_view(), name='job-import'),
+    path('jobs/export/', views.JobExport.as_view(), name='job-export'),
+    path('jobs/<int:pk>/', job_detail, name='job-detail'),
+    path('jobs/<int:job_pk>/recommended-candidates/', views.JobRecommendedCandidates.as_view(), name='job-recommended-candidates'),
     path('applications/', views.UserApplicationList.as_view(), name='user-applications'),
     path('jobs/<int:job_pk>/applications/', views.ApplicationListCreate.as_view(), name='application-list'),
+    path('jobs/<int:job_pk>/applications/bulk-status/', views.ApplicationBulkStatusUpdate.as_view(), name='application-bulk-status'),
     path('jobs/<int:job_pk>/applications/<int:pk>/', views.ApplicationRetrieveUpdateDestroy.as_view(), name='application-detail'),
     path('register/', views.UserRegistrationView.as_view(), name='user-registration'),
     path('applicants/', views.ApplicantListView.as_view(), name='applicant-list'),
     path('applicant/profile/', views.ApplicantProfileView.as_view(), name='applicant-profile'),
+    path('applicant/recommended-jobs/', views.ApplicantRecommendedJobs.as_view(), name='applicant-recommended-jobs'),
+    path('resume-uploads/', views.ResumeUploadCreate.as_view(), name='resume-upload-create'),
+    path('resume-uploads/<uuid:pk>/', views.ResumeUploadDetail.as_view(), name='resume-upload-detail'),
 ]
\ No newline at end of file
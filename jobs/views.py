@@ -1,109 +1,222 @@
-from .serializers import EmployerSerializer, JobSerializer, ApplicationSerializer, UserSerializer, ApplicantSerializer
-from .models import Employer, Job, Application, Applicant
+from .serializers import (
+    EmployerSerializer, JobSerializer, JobListSerializer, EmployerJobSerializer, ApplicationSerializer,
+    ApplicationListSerializer, UserSerializer, ApplicantSerializer, BulkApplicationStatusSerializer,
+    ResumeUploadSerializer, RecommendedJobSerializer, RecommendedApplicantSerializer, LogoutSerializer,
+)
+from .models import Employer, Job, Application, Applicant, ResumeUpload
+from .pagination import JobKeysetPagination, JobSearchPagination
+from .search import get_search_backend
+from .cache import CachedReadMixin
+from .eager_loading import EagerLoadingViewMixin
+from .fieldsets import SparseFieldsetViewMixin
+from .fastpath import FastPathListMixin
+from .facets import FacetedListMixin
+from .roles import get_roles
+from .authentication import StatelessReadAuthenticationMixin
+from .permissions import IsApplicant, IsEmployer
+from .negotiation import IgnoreClientContentNegotiation
+from . import bulk, facets, filters, geo, matching, stats
+from .bulk import guess_format
+from .resumes import take_resume, schedule_resume, parse_content_range, write_chunk, discard
+from .revocation import revoke_token
 from rest_framework import generics, permissions, status
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
 # Create your views here.
-class EmployerPublicView(generics.RetrieveAPIView):
+class EmployerPublicView(StatelessReadAuthenticationMixin, SparseFieldsetViewMixin, EagerLoadingViewMixin, generics.RetrieveAPIView):
     """View for retrieving public employer information"""
     queryset = Employer.objects.all()
     serializer_class = EmployerSerializer
     permission_classes = [permissions.AllowAny]
     
-class EmployerRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class EmployerRetrieveUpdateDestroy(EagerLoadingViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Employer.objects.all()
     serializer_class = EmployerSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     
     def get_object(self):
-        try:
-            return Employer.objects.get(user=self.request.user)
-        except Employer.DoesNotExist:
+        employer = get_roles(self.request).employer
+        if employer is None:
             raise PermissionDenied("Only employers can access this endpoint")
+        return employer
     
 
-class JobListCreate(generics.ListCreateAPIView):
+class EmployerDashboard(generics.GenericAPIView):
+    """Application counts per status for each of the employer's jobs, and in total"""
+    permission_classes = [permissions.IsAuthenticated, IsEmployer]
+    
+    def get(self, request, *args, **kwargs):
+        return Response(stats.employer_dashboard(get_roles(request).employer_id))
+    
+
+class JobListCreate(StatelessReadAuthenticationMixin, CachedReadMixin, FacetedListMixin, FastPathListMixin, SparseFieldsetViewMixin, EagerLoadingViewMixin, generics.ListCreateAPIView):
     serializer_class = JobSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = JobKeysetPagination
+    cache_scope = 'list'
+    # Query parameters narrowing the listing in ways the facet summary
+    # does not record
+    unsummarized_params = ['q', 'near', 'bbox', 'deadline_after', 'salary_gte', 'salary_lte']
+    
+    @property
+    def search_query(self):
+        return self.request.query_params.get('q', '').strip()
+    
+    @property
+    def paginator(self):
+        # Ranked search results are paged by number, plain listings by keyset
+        # (in the ?ordering= chosen)
+        if not hasattr(self, '_paginator'):
+            pagination_class = JobSearchPagination if self.search_query else self.pagination_class
+            self._paginator = pagination_class()
+        return self._paginator
+    
+    def get_serializer_class(self):
+        # Listings are compact; creating a job returns it in full
+        if self.request.method in permissions.SAFE_METHODS:
+            return JobListSerializer
+        return super().get_serializer_class()
     
     def get_queryset(self):
+        # ?job_type=, ?location=, ?salary_gte= and ?salary_lte=
+        return facets.filter_queryset(self.get_facet_queryset(), self.request.query_params)
+    
+    def get_facet_queryset(self, paged=True):
         # Only show published jobs by default
         queryset = Job.objects.filter(status='PUBLISHED')
         
-        job_type = self.request.query_params.get('job_type', None)
-        if job_type:
-            queryset = Job.objects.filter(job_type=job_type)
-
-        location = self.request.query_params.get('location', None)
-        if location:
-            queryset = Job.objects.filter(location=location)
+        # Open jobs only unless ?include_expired=true, and ?deadline_after=
+        queryset = filters.filter_queryset(queryset, self.request.query_params)
+        
+        # ?near=lat,lon (or a place) with ?radius=km, and ?bbox=w,s,e,n
+        queryset = geo.filter_queryset(queryset, self.request.query_params, paged)
+        
+        if self.search_query:
+            queryset = get_search_backend().search(queryset, self.search_query)
             
         return queryset
     
+    def use_facet_summary(self):
+        # The summary counts every published job
+        return not any(self.request.query_params.get(name) for name in self.unsummarized_params)
+    
+    def get_facet_summary_excess(self):
+        # Expired jobs the summary counts until jobs.lifecycle closes them
+        return filters.expired(Job.objects.filter(status='PUBLISHED'), self.request.query_params)
+    
     def perform_create(self, serializer):
-        try:
-            employer = Employer.objects.get(user=self.request.user)
-            serializer.save(employer=employer)
-        except Employer.DoesNotExist:
+        employer = get_roles(self.request).employer
+        if employer is None:
             raise PermissionDenied("Only employer can create job listings")
+        serializer.save(employer=employer)
+        
+
+class JobImport(generics.GenericAPIView):
+    """
+    Create many jobs from a CSV or NDJSON upload, sent either as the raw
+    request body (Content-Type text/csv or application/x-ndjson) or as a
+    multipart ``file``. Rows that fail validation are reported, not fatal.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEmployer]
+    
+    def post(self, request, *args, **kwargs):
+        upload = None
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                raise ValidationError({'file': "No file was submitted"})
+            stream = upload
+        else:
+            stream = request.stream
+        
+        fmt = request.query_params.get('input') or guess_format(
+            name=upload.name if upload else None,
+            content_type=upload.content_type if upload else request.content_type,
+        )
+        if fmt not in bulk.FORMATS:
+            raise ValidationError({'input': f"Send CSV or NDJSON, or set ?input= to one of {', '.join(bulk.FORMATS)}"})
+        
+        report = bulk.import_jobs(bulk.read_rows(stream, fmt), get_roles(request).employer)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
+
+class JobExport(generics.GenericAPIView):
+    """Stream all of the employer's jobs as CSV or NDJSON (?output=csv|ndjson)"""
+    permission_classes = [permissions.IsAuthenticated, IsEmployer]
+    content_negotiation_class = IgnoreClientContentNegotiation
+    content_types = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+    
+    def get(self, request, *args, **kwargs):
+        fmt = request.query_params.get('output', 'csv')
+        if fmt not in bulk.FORMATS:
+            raise ValidationError({'output': f"Must be one of {', '.join(bulk.FORMATS)}"})
         
+        queryset = Job.objects.filter(employer_id=get_roles(request).employer_id)
+        response = StreamingHttpResponse(bulk.export_jobs(queryset, fmt), content_type=self.content_types[fmt])
+        response['Content-Disposition'] = f'attachment; filename="jobs.{fmt}"'
+        return response
 
-class JobRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+
+class JobRetrieveUpdateDestroy(StatelessReadAuthenticationMixin, CachedReadMixin, SparseFieldsetViewMixin, EagerLoadingViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Job.objects.all()
     serializer_class = JobSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cache_scope = 'detail'
     
     def get_queryset(self):
-        if self.request.user.is_authenticated:
-            # Employer can see all their jobs incliding drafts
-            try:
-                employer = Employer.objects.get(user=self.request.user)
-                return Job.objects.filter(employer=employer)
-            except Employer.DoesNotExist:
-                return Job.objects.filter(status='PUBLISHED')
+        # Employer can see all their jobs incliding drafts
+        roles = get_roles(self.request)
+        if roles.is_employer:
+            return Job.objects.filter(employer_id=roles.employer_id)
         return Job.objects.filter(status='PUBLISHED')
     
+    def get_serializer_class(self):
+        # Employers only ever reach their own jobs here, so they get the stats
+        if get_roles(self.request).is_employer:
+            return EmployerJobSerializer
+        return super().get_serializer_class()
+    
     def perform_update(self, serializer):
-        try:
-            employer = Employer.objects.get(user=self.request.user)
-            if serializer.instance.employer == employer:
-                serializer.save()
-            else:
-                raise PermissionDenied("You can only update your own job listings")
-        except Employer.DoesNotExist:
+        roles = get_roles(self.request)
+        if not roles.is_employer:
             raise PermissionDenied("Only employers can update job listings")
+        if serializer.instance.employer_id != roles.employer_id:
+            raise PermissionDenied("You can only update your own job listings")
+        serializer.save()
     
 
-class UserApplicationList(generics.ListAPIView):
-    serializer_class = ApplicationSerializer
+class UserApplicationList(FastPathListMixin, SparseFieldsetViewMixin, EagerLoadingViewMixin, generics.ListAPIView):
+    serializer_class = ApplicationListSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-        try:
-            employer = Employer.objects.get(user=user)
-            return Application.objects.filter(job__employer=employer)
-        except Employer.DoesNotExist:
-            return Application.objects.filter(applicant=user)
+        roles = get_roles(self.request)
+        if roles.is_employer:
+            return Application.objects.filter(job__employer_id=roles.employer_id)
+        return Application.objects.filter(applicant_id=self.request.user.pk)
     
 
-class ApplicationListCreate(generics.ListCreateAPIView):
+class ApplicationListCreate(FastPathListMixin, SparseFieldsetViewMixin, EagerLoadingViewMixin, generics.ListCreateAPIView):
     serializer_class = ApplicationSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
         job_pk = self.kwargs.get('job_pk')
-        user = self.request.user
-        try:
-            # If the user is an employer
-            employer = Employer.objects.get(user=user)
-            return Application.objects.filter(job__employer=employer, job_id=job_pk)
-        except Employer.DoesNotExist:
-            # If the user is an applicant
-            return Application.objects.filter(applicant=user, job_id=job_pk)
+        roles = get_roles(self.request)
+        if roles.is_employer:
+            return Application.objects.filter(job__employer_id=roles.employer_id, job_id=job_pk)
+        # If the user is an applicant
+        return Application.objects.filter(applicant_id=self.request.user.pk, job_id=job_pk)
+    
+    def get_serializer_class(self):
+        if self.request.method in permissions.SAFE_METHODS:
+            return ApplicationListSerializer
+        return super().get_serializer_class()
         
     def perform_create(self, serializer):
         user = self.request.user
@@ -111,7 +224,7 @@ class ApplicationListCreate(generics.ListCreateAPIView):
         job = get_object_or_404(Job, pk=job_pk)
         
         # Check if user is an employer
-        if Employer.objects.filter(user=user).exists():
+        if get_roles(self.request).is_employer:
             raise PermissionDenied("Employers cannot apply to job listings")
         
         # Check if the job is still accepting applications
@@ -124,45 +237,112 @@ class ApplicationListCreate(generics.ListCreateAPIView):
         if Application.objects.filter(job=job, applicant=user).exists():
             raise PermissionDenied("You have already applied for this job")
         
-        serializer.save(applicant=user, job=job)  
+        # The resume is stored and processed by a worker, not in this request
+        with transaction.atomic():
+            upload = take_resume(serializer, user)
+            application = serializer.save(applicant=user, job=job)
+            schedule_resume(application, upload)
         
 
-class ApplicationRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class ApplicationRetrieveUpdateDestroy(SparseFieldsetViewMixin, EagerLoadingViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ApplicationSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
         job_pk = self.kwargs.get('job_pk')
-        try:
-            employer = Employer.objects.get(user=user)
-            return Application.objects.filter(job__employer=employer, job_id=job_pk)
-        except Employer.DoesNotExist:
-            return Application.objects.filter(applicant=user, job_id=job_pk)
+        roles = get_roles(self.request)
+        if roles.is_employer:
+            return Application.objects.filter(job__employer_id=roles.employer_id, job_id=job_pk)
+        return Application.objects.filter(applicant_id=self.request.user.pk, job_id=job_pk)
         
     def perform_update(self, serializer):
         user = self.request.user
+        roles = get_roles(self.request)
         
-        try:
-            # If user is an employer
-            employer = Employer.objects.get(user=user)
-            if serializer.instance.job.employer == employer:
-                if set(serializer.validated_data.keys()) - {'status'}:
-                    raise PermissionDenied("Employers can only update application status")
-                serializer.save()
-            else:
+        if roles.is_employer:
+            if serializer.instance.job.employer_id != roles.employer_id:
                 raise PermissionDenied("You can only update applications for your own jobs")
-        except Employer.DoesNotExist:
-            
+            if set(serializer.validated_data.keys()) - {'status'}:
+                raise PermissionDenied("Employers can only update application status")
+            serializer.save()
+        else:
             # If user is an applicant
-            if serializer.instance.applicant.id != user.id:
+            if serializer.instance.applicant_id != user.pk:
                 raise PermissionDenied("You can only update your own applications")
             
             update_fields = set(serializer.validated_data.keys())
-            allowed_fields = {'cover_letter', 'resume'}
+            allowed_fields = {'cover_letter', 'resume', 'resume_upload'}
             if not update_fields.issubset(allowed_fields):
                 raise PermissionDenied("Applicants can only update their cover letter and resume")
-            serializer.save()
+            with transaction.atomic():
+                upload = take_resume(serializer, user)
+                application = serializer.save()
+                schedule_resume(application, upload)
+
+class ApplicationBulkStatusUpdate(generics.GenericAPIView):
+    """
+    Change the status of many applications for one of the employer's jobs at once.
+    Each of ``updates`` gets a result: ``updated``, ``unchanged``, or
+    ``not_found`` for an id that is no application to this job (one to
+    another job included), which is left alone while the others apply.
+    """
+    serializer_class = BulkApplicationStatusSerializer
+    permission_classes = [permissions.IsAuthenticated, IsEmployer]
+    
+    def get_queryset(self):
+        return Application.objects.filter(
+            job_id=self.kwargs.get('job_pk'),
+            job__employer_id=get_roles(self.request).employer_id,
+        )
+    
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        with transaction.atomic():
+            # Selecting through the employer's own job is the ownership check.
+            # Only the applications are locked, not the job joined for it
+            queryset = self.get_queryset().select_for_update(of=('self',))
+            if 'updates' in data:
+                targets = {update['id']: update['status'] for update in data['updates']}
+                current = dict(queryset.filter(pk__in=targets).values_list('pk', 'status'))
+            else:
+                current = dict(self.filter_applications(queryset, data['filter']).values_list('pk', 'status'))
+                targets = dict.fromkeys(current, data['status'])
+            
+            changed = [
+                Application(pk=pk, status=target)
+                for pk, target in targets.items()
+                if pk in current and current[pk] != target
+            ]
+            if changed:
+                Application.objects.bulk_update(changed, ['status'])
+                # bulk_update sends no signals; keep the job's counters in step
+                stats.apply_transitions(self.kwargs.get('job_pk'), [
+                    (current[application.pk], application.status) for application in changed
+                ])
+        
+        results = []
+        for pk, target in targets.items():
+            if pk not in current:
+                result = 'not_found'
+            elif current[pk] == target:
+                result = 'unchanged'
+            else:
+                result = 'updated'
+            results.append({'id': pk, 'status': target, 'result': result})
+        return Response({'updated': len(changed), 'results': results})
+    
+    def filter_applications(self, queryset, filters):
+        if 'status' in filters:
+            queryset = queryset.filter(status=filters['status'])
+        if 'applied_after' in filters:
+            queryset = queryset.filter(applied_at__gte=filters['applied_after'])
+        if 'applied_before' in filters:
+            queryset = queryset.filter(applied_at__lt=filters['applied_before'])
+        return queryset
+
 
 class UserRegistrationView(generics.CreateAPIView):
     serializer_class = UserSerializer
@@ -184,23 +364,100 @@ class UserRegistrationView(generics.CreateAPIView):
             'profile': profile_serializer.data
         }, status=status.HTTP_201_CREATED)
 
-class ApplicantProfileView(generics.RetrieveUpdateAPIView):
+class LogoutView(generics.GenericAPIView):
+    """Revoke the access token of the request, and blacklist the refresh token sent as ``refresh``, if any"""
+    serializer_class = LogoutSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        refresh = serializer.validated_data.get('refresh')
+        if refresh is not None:
+            refresh.blacklist()
+        if request.auth is not None:
+            revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class ApplicantProfileView(SparseFieldsetViewMixin, EagerLoadingViewMixin, generics.RetrieveUpdateAPIView):
     serializer_class = ApplicantSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        try:
-            return Applicant.objects.get(user=self.request.user)
-        except Applicant.DoesNotExist:
+        applicant = get_roles(self.request).applicant
+        if applicant is None:
             raise PermissionDenied("Only applicants can access this endpoint")
+        return applicant
+    
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            upload = take_resume(serializer, self.request.user)
+            applicant = serializer.save()
+            schedule_resume(applicant, upload)
+
+class ResumeUploadCreate(generics.CreateAPIView):
+    """
+    Start a chunked resume upload by declaring its filename and size. The
+    bytes are then sent with PUT to the upload's URL.
+    """
+    serializer_class = ResumeUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
 
-class ApplicantListView(generics.ListAPIView):
+class ResumeUploadDetail(generics.RetrieveDestroyAPIView):
+    """
+    GET reports how many bytes have arrived, so an interrupted upload can
+    resume from there. PUT sends the next chunk as the raw body with a
+    ``Content-Range: bytes start-end/size`` header. DELETE abandons it.
+    """
+    serializer_class = ResumeUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return ResumeUpload.objects.filter(user_id=self.request.user.pk)
+    
+    def put(self, request, *args, **kwargs):
+        upload = self.get_object()
+        start, end = parse_content_range(request.headers.get('Content-Range'), upload.size)
+        write_chunk(upload, request.stream, start, end)
+        return Response(self.get_serializer(upload).data)
+    
+    def perform_destroy(self, instance):
+        if instance.status == ResumeUpload.ATTACHED:
+            raise PermissionDenied("This upload has already been attached")
+        discard(instance)
+
+class ApplicantListView(SparseFieldsetViewMixin, EagerLoadingViewMixin, generics.ListAPIView):
     serializer_class = ApplicantSerializer
     permission_classes = [permissions.IsAuthenticated]
     queryset = Applicant.objects.all()
     
     def get_queryset(self):
         # Only employers should be able to list all applicants
-        if not Employer.objects.filter(user=self.request.user).exists():
+        if not get_roles(self.request).is_employer:
             raise PermissionDenied("Only employers can view all applicants")
         return super().get_queryset()
+    
+
+class JobRecommendedCandidates(generics.GenericAPIView):
+    """Applicants whose profiles best match one of the employer's jobs, best first (?limit=)"""
+    serializer_class = RecommendedApplicantSerializer
+    permission_classes = [permissions.IsAuthenticated, IsEmployer]
+    
+    def get(self, request, *args, **kwargs):
+        job = get_object_or_404(Job, pk=self.kwargs['job_pk'], employer_id=get_roles(request).employer_id)
+        applicants = matching.recommend_applicants(job, matching.get_limit(request.query_params))
+        return Response(self.get_serializer(applicants, many=True).data)
+    
+
+class ApplicantRecommendedJobs(generics.GenericAPIView):
+    """Published jobs best matching the applicant's profile, best first (?limit=)"""
+    serializer_class = RecommendedJobSerializer
+    permission_classes = [permissions.IsAuthenticated, IsApplicant]
+    
+    def get(self, request, *args, **kwargs):
+        applicant = get_roles(request).applicant
+        jobs = matching.recommend_jobs(applicant, matching.get_limit(request.query_params))
+        return Response(self.get_serializer(jobs, many=True).data)